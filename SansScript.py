@@ -2,9 +2,22 @@ from strings_with_arrows import *
 import string
 import os
 import math
+import hashlib
+import re
+import bisect
+import functools
+import gc
+import pickle
+import time
 from indic_transliteration import sanscript
 from indic_transliteration.sanscript import transliterate
 
+# NumPy is optional and only needed for number arrays
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 TT_INT = "INT"
 TT_FLOAT = "FLOAT"
 TT_STRING_S = "STRING_S"
@@ -78,10 +91,13 @@ class Error:
 
     def as_string(self):
         result = f"{self.error_name}:{self.details}"
-        result += f"\nसंचिका <{self.pos_start.file_name}> , पंक्ति {self.pos_start.line+1} |\nsanchikaa <{self.pos_start.file_name}>, pankti {self.pos_start.line+1} "
-        result += "\n\n" + string_with_arrows(
-            self.pos_start.file_text, self.pos_start, self.pos_end
-        )
+        if self.pos_start is None:
+            return result
+        pos_start, pos_end = source_map.resolve(self.pos_start, self.pos_end)
+        if pos_start.file_text is None:
+            return result + f"\nसंचिका <{pos_start.file_name}> |\nsanchikaa <{pos_start.file_name}>"
+        result += f"\nसंचिका <{pos_start.file_name}> , पंक्ति {pos_start.line+1} |\nsanchikaa <{pos_start.file_name}>, pankti {pos_start.line+1} "
+        result += "\n\n" + string_with_arrows(pos_start.file_text, pos_start, pos_end)
         return result
 
 
@@ -110,19 +126,22 @@ class RTError(Error):
         self.context = context
 
     def as_string(self):
-        result = self.generate_traceback()
+        if self.pos_start is None:
+            return f"{self.error_name}:{self.details}"
+        pos_start, pos_end = source_map.resolve(self.pos_start, self.pos_end)
+        if pos_start.file_text is None:
+            return f"{self.error_name}:{self.details}\nसंचिका <{pos_start.file_name}> |\nsanchikaa <{pos_start.file_name}>"
+        result = self.generate_traceback(pos_start)
         result += f"{self.error_name}:{self.details}"
-        result += "\n\n" + string_with_arrows(
-            self.pos_start.file_text, self.pos_start, self.pos_end
-        )
+        result += "\n\n" + string_with_arrows(pos_start.file_text, pos_start, pos_end)
         return result
 
-    def generate_traceback(self):
+    def generate_traceback(self, pos_start):
         result = ""
         ctx = self.context
         pos = self.pos_start
         while ctx:
-            result = f"      संचिका <{self.pos_start.file_name}> , पंक्ति {self.pos_start.line+1} |\n      sanchikaa <{self.pos_start.file_name}>, pankti {self.pos_start.line+1}\n "
+            result = f"      संचिका <{pos_start.file_name}> , पंक्ति {pos_start.line+1} |\n      sanchikaa <{pos_start.file_name}>, pankti {pos_start.line+1}\n "
             pos = ctx.parent_entry_pos
             ctx = ctx.parent
         return (
@@ -131,8 +150,33 @@ class RTError(Error):
         )
 
 
+# Raised about the right operand of an operation rather than the whole
+# expression, such as a zero divisor or a list index out of range
+class RTOperandError(RTError):
+    pass
+
+
+# Values carry no position or context, so an error raised by an operation or a
+# call is placed on the node being evaluated
+def locate_error(error, node, context):
+    if error.pos_start is None:
+        if type(node) is UnaryOpNode:
+            node = node.node
+        elif type(error) is RTOperandError and type(node) is BinaryOpNode:
+            node = node.right_node
+        error.pos_start = node.pos_start
+        error.pos_end = node.pos_end
+    if error.context is None:
+        error.context = context
+    return error
+
+
 # Position
+# Tokens, nodes and values carry plain integer offsets into the source map.
+# A Position with line and column is only built when an error is rendered.
 class Position:
+    __slots__ = ("index", "line", "column", "file_name", "file_text")
+
     def __init__(self, index, line, column, file_name, file_text):
         self.index = index
         self.line = line
@@ -140,36 +184,109 @@ class Position:
         self.file_name = file_name
         self.file_text = file_text
 
-    def advance(self, current_char=None):
-        self.index += 1
-        self.column += 1
 
-        if current_char == "\n":
-            self.line += 1
-            self.column = 0
-        return self
-
-    def copy(self):
+class Source:
+    def __init__(self, file_name, text, base):
+        self.file_name = file_name
+        self.text = text
+        self.base = base
+        # Room for the EOF token and an unterminated string past the end
+        self.size = len(text) + 2
+        self.line_starts = None
+
+    def position(self, index):
+        if self.text is None:
+            # Dropped from the source map, only the file name is left
+            return Position(index, -1, -1, self.file_name, None)
+        if self.line_starts is None:
+            self.line_starts = [0]
+            self.line_starts.extend(m.end() for m in re.finditer("\n", self.text))
+        line = bisect.bisect_right(self.line_starts, index) - 1
         return Position(
-            self.index, self.line, self.column, self.file_name, self.file_text
+            index, line, index - self.line_starts[line], self.file_name, self.text
         )
 
 
+# Only the texts most recently added or looked up are kept, up to
+# SOURCE_TEXT_LIMIT characters. An older source keeps its range, so offsets in
+# trees still alive never resolve into another text.
+SOURCE_TEXT_LIMIT = 1 << 22
+
+
+class SourceMap:
+    def __init__(self):
+        self.sources = []
+        self.bases = []
+        self.by_text = {}
+        self.text_size = 0
+        self.next_base = 0
+
+    def add(self, file_name, text, base=None):
+        key = (file_name, text)
+        source = self.by_text.pop(key, None)
+        if source is not None:
+            self.by_text[key] = source
+            return source
+        source = Source(file_name, text, base)
+        index = bisect.bisect_right(self.bases, base) if base is not None else 0
+        if (
+            base is None
+            or index > 0
+            and self.bases[index - 1] + self.sources[index - 1].size > base
+            or index < len(self.bases)
+            and base + source.size > self.bases[index]
+        ):
+            source.base = self.next_base
+            index = len(self.bases)
+        self.next_base = max(self.next_base, source.base + source.size)
+        self.sources.insert(index, source)
+        self.bases.insert(index, source.base)
+        self.by_text[key] = source
+        self.text_size += len(text)
+        while self.text_size > SOURCE_TEXT_LIMIT and len(self.by_text) > 1:
+            dropped = self.by_text.pop(next(iter(self.by_text)))
+            self.text_size -= len(dropped.text)
+            dropped.text = None
+            dropped.line_starts = None
+        return source
+
+    def resolve(self, offset_start, offset_end):
+        source = self.sources[bisect.bisect_right(self.bases, offset_start) - 1]
+        pos_start = source.position(offset_start - source.base)
+        if source.text is None:
+            return pos_start, pos_start
+        # End offsets point one past the last character of a span, so they are
+        # resolved on that character's line
+        if offset_end is None or offset_end <= offset_start:
+            offset_end = offset_start + 1
+        pos_end = source.position(offset_end - 1 - source.base)
+        pos_end.index += 1
+        pos_end.column += 1
+        return pos_start, pos_end
+
+    def line(self, offset):
+        source = self.sources[bisect.bisect_right(self.bases, offset) - 1]
+        return source.file_name, source.position(offset - source.base).line + 1
+
+
+source_map = SourceMap()
+
+
 # Token
 class Token:
+    __slots__ = ("type", "value", "pos_start", "pos_end")
+
     def __init__(self, type, value=None, pos_start=None, pos_end=None):
         self.type = type
         self.value = value
-        if pos_start:
-            self.pos_start = pos_start.copy()
-            self.pos_end = pos_start.copy()
-            self.pos_end.advance()
-        if pos_end:
-            self.pos_end = pos_end.copy()
+        self.pos_start = pos_start
+        if pos_end is None and pos_start is not None:
+            pos_end = pos_start + 1
+        self.pos_end = pos_end
 
     def matches(self, type_, value_a, value_b=None):
         if value_b:
-            return self.type == type_ and self.value == value_a or value_b
+            return self.type == type_ and self.value in (value_a, value_b)
         else:
             return self.type == type_ and self.value == value_a
 
@@ -180,226 +297,127 @@ class Token:
 
 
 # Lexer
+TOKEN_RE = re.compile(
+    r"""
+    (?P<SKIP>[ \t]+)
+    |(?P<COMMENT>\#[^\n]*\n?)
+    |(?P<NEWLINE>[;\n])
+    |(?P<IDENTIFIER>[A-Za-z][A-Za-z0-9_]*)
+    |(?P<NUMBER>[0-9०-९]+(?:\.[0-9०-९]*)?)
+    |(?P<STRING_S>'[^']*'?)
+    |(?P<STRING_D>"[^"]*"?)
+    |(?P<DOUBLE>==|!=|>=|<=)
+    |(?P<SINGLE>[-+*/()^=<>:\[\],])
+    |(?P<BANG>!)
+    |(?P<ILLEGAL>.)
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+
+SINGLE_CHAR_TOKENS = {
+    "+": TT_PLUS,
+    "-": TT_MINUS,
+    "*": TT_MUL,
+    "/": TT_DIV,
+    "(": TT_LPAREN,
+    ")": TT_RPAREN,
+    "^": TT_POW,
+    "=": TT_EQ,
+    ">": TT_GT,
+    "<": TT_LT,
+    "[": TT_LSQUARE,
+    "]": TT_RSQUARE,
+    ",": TT_COMMA,
+    ":": TT_KEYWORD,
+}
+
+DOUBLE_CHAR_TOKENS = {
+    "==": TT_EE,
+    "!=": TT_NE,
+    ">=": TT_GTE,
+    "<=": TT_LTE,
+}
+
+KEYWORDS_SET = frozenset(KEYWORDS)
+DIGITS_S_TO_DIGITS = str.maketrans(DIGITS_S, DIGITS)
+
+
 class Lexer:
-    def __init__(self, file_name, text):
+    def __init__(self, file_name, text, strip_debug_info=False):
         self.file_name = file_name
         self.text = text
-        self.pos = Position(-1, 0, -1, file_name, text)
-        self.current_char = None
-        self.advance()
-
-    def advance(self):
-        self.pos.advance(self.current_char)
-        self.current_char = (
-            self.text[self.pos.index] if self.pos.index < len(self.text) else None
-        )
+        self.strip_debug_info = strip_debug_info
 
     def make_tokens(self):
+        text = self.text
         tokens = []
-        while self.current_char is not None:
-            if self.current_char in " \t":
-                self.advance()  # Skip whitespace
-            elif self.current_char in "#":
-                self.skip_comment()
-            elif self.current_char in ";\n":
-                tokens.append(Token(TT_NEWLINE, pos_start=self.pos))
-                self.advance()
-            elif self.current_char in LETTERS:
-                tokens.append(self.make_identifier())
-            elif self.current_char in DIGITS + DIGITS_S:
-                tokens.append(self.make_number())
-            elif self.current_char == "+":
-                tokens.append(Token(TT_PLUS, pos_start=self.pos))
-                self.advance()
-            elif self.current_char == "-":
-                tokens.append(Token(TT_MINUS, pos_start=self.pos))
-                self.advance()
-            elif self.current_char == "*":
-                tokens.append(Token(TT_MUL, pos_start=self.pos))
-                self.advance()
-            elif self.current_char == "/":
-                tokens.append(Token(TT_DIV, pos_start=self.pos))
-                self.advance()
-            elif self.current_char == "(":
-                tokens.append(Token(TT_LPAREN, pos_start=self.pos))
-                self.advance()
-            elif self.current_char == ")":
-                tokens.append(Token(TT_RPAREN, pos_start=self.pos))
-                self.advance()
-            elif self.current_char == "^":
-                tokens.append(Token(TT_POW, pos_start=self.pos))
-                self.advance()
-            elif self.current_char == "=":
-                tokens.append(self.make_equals())
-            elif self.current_char == "!":
-                tok, error = self.make_not_equals()
-                if error:
-                    return [], None
-                tokens.append(tok)
-            elif self.current_char == ">":
-                tokens.append(self.make_greater_than())
-            elif self.current_char == "<":
-                tokens.append(self.make_less_than())
-            elif self.current_char == ":":
-                tokens.append(Token(TT_KEYWORD, ":", pos_start=self.pos))
-                self.advance()
-            elif self.current_char == "[":
-                tokens.append(Token(TT_LSQUARE, pos_start=self.pos))
-                self.advance()
-            elif self.current_char == "]":
-                tokens.append(Token(TT_RSQUARE, pos_start=self.pos))
-                self.advance()
-            elif self.current_char == ",":
-                tokens.append(Token(TT_COMMA, pos_start=self.pos))
-                self.advance()
-            elif self.current_char == "'":
-                tokens.append(self.make_string())
-
-            elif self.current_char == '"':
-                tokens.append(self.make_string())
-
-            else:
-                pos_start = self.pos.copy()
-                character = self.current_char
-                self.advance()
-                return [], Illegal_Character_Error(
-                    pos_start, self.pos, ("'" + character + "'")
-                )  # Handle invalid characters
-        tokens.append(Token(TT_EOF, pos_start=self.pos))
-        return tokens, None  # Return tokens and no error
-    def skip_comment(self):
-        self.advance()
-        while self.current_char != "\n":
-            self.advance()
-        self.advance()
-    def make_string(self):
-        string_ = ""
-        pos_start = self.pos.copy()
-        str_type = self.current_char
-        escape_character = False
-        escape_characters = {
-            "n": "\n",
-            "t": "\t",
-        }
-        self.advance()
-        if str_type == "'":
-            while self.current_char != None and (
-                self.current_char != "'" or escape_character
-            ):
-                if escape_character:
-                    string_ += escape_characters.get(
-                        self.current_char, self.current_char
-                    )
+        append = tokens.append
+        base = source_map.add(self.file_name, text).base
+        eof = len(text)
+        for match in TOKEN_RE.finditer(text):
+            kind = match.lastgroup
+            if kind == "SKIP" or kind == "COMMENT":
+                continue
+            start, end = match.span()
+            if kind == "IDENTIFIER":
+                lexeme = match.group()
+                tok_type = TT_KEYWORD if lexeme in KEYWORDS_SET else TT_IDENTIFIER
+                append(Token(tok_type, lexeme, base + start, base + end))
+            elif kind == "SINGLE":
+                tok_type = SINGLE_CHAR_TOKENS[match.group()]
+                value = ":" if tok_type == TT_KEYWORD else None
+                append(Token(tok_type, value, base + start, base + end))
+            elif kind == "NEWLINE":
+                append(Token(TT_NEWLINE, None, base + start, base + end))
+            elif kind == "NUMBER":
+                n_str = match.group().translate(DIGITS_S_TO_DIGITS)
+                if "." in n_str:
+                    append(Token(TT_FLOAT, float(n_str), base + start, base + end))
                 else:
-                    if self.current_char == "\\":
-                        escape_character = True
-                    else:
-                        string_ += self.current_char
-                self.advance()
-                escape_character = False
-            self.advance()
-            return Token(TT_STRING_S, string_, pos_start, self.pos)
-        elif str_type == '"':
-            while self.current_char != None and (
-                self.current_char != '"' or escape_character
-            ):
-                if escape_character:
-                    string_ += escape_characters.get(
-                        self.current_char, self.current_char
-                    )
+                    append(Token(TT_INT, int(n_str), base + start, base + end))
+            elif kind == "DOUBLE":
+                tok_type = DOUBLE_CHAR_TOKENS[match.group()]
+                append(Token(tok_type, None, base + start, base + end))
+            elif kind == "STRING_S" or kind == "STRING_D":
+                lexeme = match.group()
+                if len(lexeme) == 1 or lexeme[-1] != lexeme[0]:
+                    # An unterminated string ends one past the end of the text
+                    end += 1
+                    eof = end
+                    value = lexeme[1:]
                 else:
-                    if self.current_char == "\\":
-                        escape_character = True
-                    else:
-                        string_ += self.current_char
-
-                self.advance()
-                escape_character = False
-            self.advance()
-            return Token(TT_STRING_D, string_, pos_start, self.pos)
-
-    def make_number(self):
-        # print("Make Number was called")
-        n_str = ""
-        dot = 0
-        pos_start = self.pos.copy()
-        while self.current_char != None and (
-            self.current_char in DIGITS + "." + DIGITS_S
-        ):
-            # print(self.current_char)
-            # print(n_str)
-            if self.current_char in DIGITS_S:
-                dl = list(DIGITS_S)
-                n = str(dl.index(self.current_char))
-                n_str += n
-            elif self.current_char in DIGITS:
-                n_str += self.current_char
-            elif self.current_char == ".":
-                if dot == 1:
-                    break
-                dot += 1
-                n_str += "."
-            self.advance()
-
-        if dot == 0:
-            return Token(TT_INT, int(n_str), pos_start, self.pos)
-        else:
-            return Token(TT_FLOAT, float(n_str), pos_start, self.pos)
-
-    def make_identifier(self):
-        id_str = ""
-        pos_start = self.pos.copy()
-        # print(self.current_char)
-        while self.current_char != None and self.current_char in LETTERS_DIGITS + "_":
-            id_str += self.current_char
-            self.advance()
-
-        tok_type = TT_KEYWORD if id_str in KEYWORDS else TT_IDENTIFIER
-        return Token(tok_type, id_str, pos_start, self.pos)
-
-    def make_not_equals(self):
-        pos_start = self.pos.copy()
-        self.advance()
-        if self.current_char == "=":
-            self.advance()
-            return Token(TT_NE, pos_start=pos_start, pos_end=self.pos), None
-        self.advance()
-        return None, Expected_Char_Error(
-            pos_start, self.pos, " '=' अनन्तरम्‌ '!' | '=' anantaram '!'"
-        )
-
-    def make_equals(self):
-        pos_start = self.pos.copy()
-        tok_type = TT_EQ
-        self.advance()
-        if self.current_char == "=":
-            self.advance()
-            tok_type = TT_EE
-        return Token(tok_type, pos_start=pos_start, pos_end=self.pos)
-
-    def make_greater_than(self):
-        pos_start = self.pos.copy()
-        tok_type = TT_GT
-        self.advance()
-        if self.current_char == "=":
-            self.advance()
-            tok_type = TT_GTE
-        return Token(tok_type, pos_start=pos_start, pos_end=self.pos)
-
-    def make_less_than(self):
-        pos_start = self.pos.copy()
-        tok_type = TT_LT
-        self.advance()
-        if self.current_char == "=":
-            self.advance()
-            tok_type = TT_LTE
-        return Token(tok_type, pos_start=pos_start, pos_end=self.pos)
+                    value = lexeme[1:-1]
+                # Backslashes are dropped without escaping the next character
+                value = value.replace("\\", "")
+                tok_type = TT_STRING_S if kind == "STRING_S" else TT_STRING_D
+                append(Token(tok_type, value, base + start, base + end))
+            elif kind == "BANG":
+                return [], Expected_Char_Error(
+                    base + start,
+                    base + start + 2,
+                    " '=' अनन्तरम्‌ '!' | '=' anantaram '!'",
+                )
+            else:
+                return [], Illegal_Character_Error(
+                    base + start,
+                    base + end,
+                    f"'{match.group()}'",
+                )
+        append(Token(TT_EOF, None, base + eof, base + eof + 1))
+        if self.strip_debug_info:
+            for token in tokens:
+                token.pos_start = token.pos_end = None
+        return tokens, None
 
 
 # Number
 class NumberNode:
+    __slots__ = ("tok", "value", "pos_start", "pos_end")
+
     def __init__(self, tok):
         self.tok = tok
+        # The literal's Number is made once here and shared by every evaluation
+        self.value = make_number(tok.value)
         self.pos_start = self.tok.pos_start
         self.pos_end = self.tok.pos_end
 
@@ -408,6 +426,8 @@ class NumberNode:
 
 
 class StringNode:
+    __slots__ = ("tok", "pos_start", "pos_end")
+
     def __init__(self, tok):
         self.tok = tok
         self.pos_start = self.tok.pos_start
@@ -418,6 +438,8 @@ class StringNode:
 
 
 class BinaryOpNode:
+    __slots__ = ("left_node", "right_node", "op_tok", "pos_start", "pos_end")
+
     def __init__(self, left_node, op_tok, right_node):
         self.left_node = left_node
         self.right_node = right_node
@@ -431,6 +453,8 @@ class BinaryOpNode:
 
 
 class UnaryOpNode:
+    __slots__ = ("op_tok", "node", "pos_start", "pos_end")
+
     def __init__(self, op_tok, node):
         self.op_tok = op_tok
         self.node = node
@@ -442,6 +466,8 @@ class UnaryOpNode:
 
 
 class VarAccessNode:
+    __slots__ = ("var_name_tok", "pos_start", "pos_end")
+
     def __init__(self, var_name_tok):
         self.var_name_tok = var_name_tok
         self.pos_start = self.var_name_tok.pos_start
@@ -449,6 +475,8 @@ class VarAccessNode:
 
 
 class VarAssignNode:
+    __slots__ = ("var_name_tok", "value_node", "pos_start", "pos_end")
+
     def __init__(self, var_name_tok, value_node):
         self.var_name_tok = var_name_tok
         self.value_node = value_node
@@ -458,6 +486,8 @@ class VarAssignNode:
 
 
 class ifNode:
+    __slots__ = ("cases", "else_case", "pos_start", "pos_end")
+
     def __init__(self, cases, else_case):
         self.cases = cases
         self.else_case = else_case
@@ -467,6 +497,17 @@ class ifNode:
 
 
 class ForNode:
+    __slots__ = (
+        "var_name_tok",
+        "start_value_node",
+        "end_value_node",
+        "step_value_node",
+        "body_node",
+        "pos_start",
+        "pos_end",
+        "should_return_null",
+    )
+
     def __init__(
         self,
         var_name_tok,
@@ -487,6 +528,14 @@ class ForNode:
 
 
 class WhileNode:
+    __slots__ = (
+        "condition_node",
+        "body_node",
+        "pos_start",
+        "pos_end",
+        "should_return_null",
+    )
+
     def __init__(self, condition_node, body_node, should_return_null):
         self.condition_node = condition_node
         self.body_node = body_node
@@ -496,6 +545,15 @@ class WhileNode:
 
 
 class FuncDefNode:
+    __slots__ = (
+        "var_name_tok",
+        "arg_name_tok",
+        "body_node",
+        "should_auto_return",
+        "pos_start",
+        "pos_end",
+    )
+
     def __init__(self, var_name_tok, arg_name_tok, body_node, should_auto_return):
 
         self.var_name_tok = var_name_tok
@@ -512,6 +570,8 @@ class FuncDefNode:
 
 
 class CallNode:
+    __slots__ = ("node_to_call", "arg_nodes", "pos_start", "pos_end")
+
     def __init__(self, node_to_call, arg_nodes):
         self.node_to_call = node_to_call
         self.arg_nodes = arg_nodes
@@ -523,6 +583,8 @@ class CallNode:
 
 
 class ReturnNode:
+    __slots__ = ("node_to_return", "pos_start", "pos_end")
+
     def __init__(self, node_to_return, pos_start, pos_end):
         self.node_to_return = node_to_return
         self.pos_start = pos_start
@@ -530,1056 +592,783 @@ class ReturnNode:
 
 
 class BreakNode:
+    __slots__ = ("pos_start", "pos_end")
+
     def __init__(self, pos_start, pos_end):
         self.pos_start = pos_start
         self.pos_end = pos_end
 
 
 class ContinueNode:
+    __slots__ = ("pos_start", "pos_end")
+
     def __init__(self, pos_start, pos_end):
         self.pos_start = pos_start
         self.pos_end = pos_end
 
 
 class ListNode:
+    __slots__ = ("element_nodes", "pos_start", "pos_end")
+
     def __init__(self, element_nodes, pos_start, pos_end):
         self.element_nodes = element_nodes
         self.pos_start = pos_start
         self.pos_end = pos_end
 
 
+NODE_CLASSES = (
+    NumberNode,
+    StringNode,
+    BinaryOpNode,
+    UnaryOpNode,
+    VarAccessNode,
+    VarAssignNode,
+    ifNode,
+    ForNode,
+    WhileNode,
+    FuncDefNode,
+    CallNode,
+    ReturnNode,
+    BreakNode,
+    ContinueNode,
+    ListNode,
+)
+
+
 # Parse Result
 class ParseResult:
     def __init__(self):
         self.error = None
         self.node = None
-        self.last_registered_advance_count = 0
-        self.advance_count = 0
-        self.to_reverse_count = 0
-
-    def register_advancement(self):
-        self.last_registered_advance_count = 1
-        self.advance_count += 1
-
-    def register(self, res):
-        self.last_registered_advance_count = res.advance_count
-        self.advance_count += res.advance_count
-        if res.error:
-            self.error = res.error
-        return res.node
-
-    def try_register(self, res):
-        if res.error:
-            self.to_reverse_count = res.advance_count
-            return None
-        return self.register(res)
 
     def success(self, node):
         self.node = node
         return self
 
     def failure(self, error):
-        if not self.error or self.last_registered_advance_count == 0:
-            self.error = error
+        self.error = error
         return self
 
 
+class ParseErrorSignal(Exception):
+    def __init__(self, error):
+        super().__init__(error.details)
+        self.error = error
+
+
 # Parser
+# Binary operators are keyed by token type, keyword operators by their value
+LOGIC_LEVEL = 0
+COMPARISON_LEVEL = 1
+ARITH_LEVEL = 2
+TERM_LEVEL = 3
+FACTOR_LEVEL = 4
+BINARY_LEVELS = {
+    "tathA": LOGIC_LEVEL,
+    "tatha": LOGIC_LEVEL,
+    "vA": LOGIC_LEVEL,
+    "va": LOGIC_LEVEL,
+    TT_EE: COMPARISON_LEVEL,
+    TT_NE: COMPARISON_LEVEL,
+    TT_LT: COMPARISON_LEVEL,
+    TT_GT: COMPARISON_LEVEL,
+    TT_LTE: COMPARISON_LEVEL,
+    TT_GTE: COMPARISON_LEVEL,
+    TT_PLUS: ARITH_LEVEL,
+    TT_MINUS: ARITH_LEVEL,
+    TT_MUL: TERM_LEVEL,
+    TT_DIV: TERM_LEVEL,
+}
+# Tokens that can begin each kind of construct
+FACTOR_START = frozenset(
+    (
+        TT_INT,
+        TT_FLOAT,
+        TT_STRING_S,
+        TT_STRING_D,
+        TT_IDENTIFIER,
+        TT_LPAREN,
+        TT_LSQUARE,
+        TT_PLUS,
+        TT_MINUS,
+        "yadi",
+        "krrite",
+        "sopanah",
+        "niyoga",
+    )
+)
+COMPARISON_START = FACTOR_START | {"nahi"}
+EXPR_START = COMPARISON_START | {"charaH", "charah"}
+STATEMENT_START = EXPR_START | {
+    "pratyAvartanam",
+    "pratyavartanam",
+    "virAmaH",
+    "viramah",
+    "anuvartanam",
+}
+OPERAND_ERRORS = {
+    COMPARISON_LEVEL: "अपेक्षितं INT,FLOAT,+,-,परिचयकः अथवा ( | apekchhit INT,FLOAT,+,-,nahi parichayakah athva (",
+    ARITH_LEVEL: "Invalid binary operation",
+    TERM_LEVEL: "Invalid binary operation",
+    FACTOR_LEVEL: "Invalid binary operation",
+}
+
+
 class Parser:
     def __init__(self, tokens):
         self.tokens = tokens
+        self.keys = [
+            tok.value if tok.type == TT_KEYWORD else tok.type for tok in tokens
+        ]
         self.tok_index = -1
         self.advance()
 
     def parse(self):
-        res = self.statements()
-        if not res.error and self.current_token.type != TT_EOF:
-            return res.failure(
-                Invalid_Syntax_Error(
-                    self.current_token.pos_start,
-                    self.current_token.pos_end,
+        res = ParseResult()
+        try:
+            node = self.statements()
+            if self.current_token.type != TT_EOF:
+                raise self.failure(
+                    Invalid_Syntax_Error,
                     "अपेक्षितं * , + , - or / | apekchhit * , + , - or /",
                 )
+        except ParseErrorSignal as signal:
+            return res.failure(signal.error)
+        return res.success(node)
+
+    def advance(self):
+        if self.tok_index < len(self.tokens) - 1:
+            self.tok_index += 1
+            self.current_token = self.tokens[self.tok_index]
+            self.current_key = self.keys[self.tok_index]
+        return self.current_token
+
+    def failure(self, error_class, details):
+        return ParseErrorSignal(
+            error_class(
+                self.current_token.pos_start, self.current_token.pos_end, details
             )
-        return res
+        )
+
+    def expect(self, start, details):
+        if self.current_key not in start:
+            raise self.failure(Invalid_Syntax_Error, details)
 
     def statements(self):
-        res = ParseResult()
         statements = []
-
-        pos_start = self.current_token.pos_start.copy()
-
+        pos_start = self.current_token.pos_start
         while self.current_token.type == TT_NEWLINE:
-            res.register_advancement()
             self.advance()
-
-        statement = res.register(self.statement())
-        if res.error:
-            return res
-        statements.append(statement)
-
-        more_statements = True
-
-        while True:
-            newline_count = 0
+        statements.append(self.statement())
+        while self.current_token.type == TT_NEWLINE:
             while self.current_token.type == TT_NEWLINE:
-                res.register_advancement()
                 self.advance()
-                newline_count += 1
-            if newline_count == 0:
-                more_statements = False
-
-            if not more_statements:
+            if self.current_key not in STATEMENT_START:
                 break
-            statement = res.try_register(self.statement())
-            if not statement:
+            statements.append(self.statement())
+        return ListNode(statements, pos_start, self.current_token.pos_end)
 
-                self.reverse(res.to_reverse_count)
-                more_statements = False
-                continue
-            statements.append(statement)
+    def statement(self):
+        pos_start = self.current_token.pos_start
+        key = self.current_key
+        if key == "pratyAvartanam" or key == "pratyavartanam":
+            self.advance()
+            expr = self.expr() if self.current_key in EXPR_START else None
+            return ReturnNode(expr, pos_start, self.current_token.pos_end)
+        if key == "virAmaH" or key == "viramah":
+            self.advance()
+            return BreakNode(pos_start, self.current_token.pos_end)
+        if key == "anuvartanam":
+            self.advance()
+            return ContinueNode(pos_start, self.current_token.pos_end)
+        return self.expr("अपेक्षितं वाक्यम् | apekchhitam vakhyam")
+
+    def expr(
+        self,
+        details="अपेक्षितं INT,FLOAT,+,-,परिचयकः अथवा ( | apekchhit charah ,INT,FLOAT,+,-,nahi,parichayakah athva (",
+    ):
+        self.expect(EXPR_START, details)
+        if self.current_key == "charaH" or self.current_key == "charah":
+            self.advance()
+            if self.current_token.type != TT_IDENTIFIER:
+                raise self.failure(
+                    Invalid_Syntax_Error, "अपेक्षितं परिचयकः | apekchhit parichayakah"
+                )
+            var_name = self.current_token
+            self.advance()
+            if self.current_token.type != TT_EQ:
+                raise self.failure(Invalid_Syntax_Error, "अपेक्षितं '=' | apekchhit '=")
+            self.advance()
+            return VarAssignNode(var_name, self.expr())
+        return self.binary_expr(LOGIC_LEVEL)
 
-        return res.success(
-            ListNode(statements, pos_start, self.current_token.pos_end.copy())
+    def operand(self, level):
+        self.expect(
+            COMPARISON_START if level == COMPARISON_LEVEL else FACTOR_START,
+            OPERAND_ERRORS[level],
         )
+        return self.binary_expr(level)
 
-    def statement(self):
-        res = ParseResult()
-        pos_start = self.current_token.pos_start.copy()
-        if self.current_token.matches(
-            TT_KEYWORD, "pratyAvartanam"
-        ) or self.current_token.matches(TT_KEYWORD, "pratyavartanam"):
+    def binary_expr(self, min_level):
+        if self.current_key == "nahi":
+            op_tok = self.current_token
+            self.advance()
+            left = UnaryOpNode(op_tok, self.operand(COMPARISON_LEVEL))
+        else:
+            left = self.factor()
+        level = BINARY_LEVELS.get(self.current_key)
+        while level is not None and level >= min_level:
+            op_tok = self.current_token
+            self.advance()
+            left = BinaryOpNode(left, op_tok, self.operand(level + 1))
+            level = BINARY_LEVELS.get(self.current_key)
+        return left
 
-            res.register_advancement()
+    def factor(self):
+        tok = self.current_token
+        if tok.type == TT_PLUS or tok.type == TT_MINUS:
+            self.advance()
+            return UnaryOpNode(tok, self.operand(FACTOR_LEVEL))
+        node = self.call()
+        if self.current_token.type == TT_POW:
+            op_tok = self.current_token
             self.advance()
+            return BinaryOpNode(node, op_tok, self.operand(FACTOR_LEVEL))
+        return node
 
-            expr = res.try_register(self.expr())
-            if not expr:
-                return self.reverse(res.to_reverse_count)
-            return res.success(
-                ReturnNode(expr, pos_start, self.current_token.pos_end.copy())
+    def call(self):
+        atom = self.atom()
+        if self.current_token.type != TT_LPAREN:
+            return atom
+        self.advance()
+        arg_nodes = []
+        if self.current_token.type == TT_RPAREN:
+            self.advance()
+            return CallNode(atom, arg_nodes)
+        arg_nodes.append(
+            self.expr(
+                "अपेक्षितं INT,FLOAT,+,-,परिचयकः अथवा ( | apekchhit INT,FLOAT,+,-,parichayakah athva ("
             )
+        )
+        while self.current_token.type == TT_COMMA:
+            self.advance()
+            arg_nodes.append(self.expr())
+        if self.current_token.type != TT_RPAREN:
+            raise self.failure(Expected_Char_Error, "apekchhit ',' or ')'")
+        self.advance()
+        return CallNode(atom, arg_nodes)
 
-        if self.current_token.matches(
-            TT_KEYWORD, "virAmaH"
-        ) or self.current_token.matches(TT_KEYWORD, "viramah"):
-            res.register_advancement()
+    def atom(self):
+        tok = self.current_token
+        key = self.current_key
+        if key == TT_INT or key == TT_FLOAT:
             self.advance()
-            return res.success(BreakNode(pos_start, self.current_token.pos_end.copy()))
-        if self.current_token.matches(TT_KEYWORD, "anuvartanam"):
-            res.register_advancement()
+            return NumberNode(tok)
+        if key == TT_IDENTIFIER:
             self.advance()
-            return res.success(
-                ContinueNode(pos_start, self.current_token.pos_end.copy())
-            )
+            return VarAccessNode(tok)
+        if key == TT_STRING_S or key == TT_STRING_D:
+            self.advance()
+            return StringNode(tok)
+        if key == TT_LPAREN:
+            self.advance()
+            expr = self.expr()
+            if self.current_token.type != TT_RPAREN:
+                raise self.failure(Invalid_Syntax_Error, "अपेक्षितं ')' | apekchhit ')'")
+            self.advance()
+            return expr
+        if key == TT_LSQUARE:
+            return self.list_expr()
+        if key == "yadi":
+            return self.if_expr()
+        if key == "krrite":
+            return self.for_expr()
+        if key == "sopanah":
+            return self.while_expr()
+        if key == "niyoga":
+            return self.func_def()
+        raise self.failure(
+            Invalid_Syntax_Error,
+            "अपेक्षितं INT,FLOAT,+,-,परिचयकः अथवा ( | apekchhit INT,FLOAT,+,-,parichayakah athva (",
+        )
 
-        expr = res.register(self.expr())
-        if res.error:
-            return res.failure(
-                Invalid_Syntax_Error(
-                    self.current_token.pos_start,
-                    self.current_token.pos_end,
-                    "अपेक्षितं वाक्यम् | apekchhitam vakhyam",
-                )
+    def list_expr(self):
+        list_element_nodes = []
+        pos_start = self.current_token.pos_start
+        self.advance()
+        if self.current_token.type == TT_RSQUARE:
+            self.advance()
+            return ListNode(list_element_nodes, pos_start, self.current_token.pos_end)
+        list_element_nodes.append(
+            self.expr(
+                "अपेक्षितं INT,FLOAT,+,-,परिचयकः अथवा ] | apekchhit INT,FLOAT,+,-,parichayakah athva ("
             )
-        return res.success(expr)
-
-    def advance(self):
-        self.tok_index += 1
-        self.update_current_tok()
-        return self.current_token
-
-    def reverse(self, amount=1):
-        self.tok_index -= amount
-        self.update_current_tok()
-        return self.current_token
-
-    def update_current_tok(self):
-        if self.tok_index >= 0 and self.tok_index < len(self.tokens):
-            self.current_token = self.tokens[self.tok_index]
+        )
+        while self.current_token.type == TT_COMMA:
+            self.advance()
+            list_element_nodes.append(self.expr())
+        if self.current_token.type != TT_RSQUARE:
+            raise self.failure(Expected_Char_Error, "apekchhit ',' or ')'")
+        self.advance()
+        return ListNode(list_element_nodes, pos_start, self.current_token.pos_end)
 
     def if_expr(self):
-        res = ParseResult()
-        all_cases = res.register(self.check_if_cases("yadi"))
-        if res.error:
-            return res
-        cases, else_case = all_cases
-        return res.success(ifNode(cases, else_case))
-
-    def check_if_cases(self, case):
-        res = ParseResult()
         cases = []
-        else_case = None
-
-        if not self.current_token.matches(TT_KEYWORD, case):
-            return res.failure(
-                Invalid_Syntax_Error(
-                    self.current_token.pos_start,
-                    self.current_token.pos_end,
-                    f"Expected '{case}'",
-                )
-            )
+        while True:
+            self.advance()
+            condition = self.expr()
+            if not self.current_token.matches(TT_KEYWORD, ":"):
+                raise self.failure(Invalid_Syntax_Error, "Expected ':'")
+            self.advance()
+            if self.current_token.type == TT_NEWLINE:
+                self.advance()
+                cases.append((condition, self.statements(), True))
+                if self.current_key == "aMta":
+                    self.advance()
+                    return ifNode(cases, None)
+            else:
+                cases.append((condition, self.statement(), False))
+            if self.current_key != "anyadi":
+                break
+        else_case = self.else_case() if self.current_key == "uta" else None
+        return ifNode(cases, else_case)
 
-        res.register_advancement()
+    def else_case(self):
         self.advance()
-        condition = res.register(self.expr())
-        if res.error:
-            return res
+        if self.current_token.type != TT_KEYWORD:
+            raise self.failure(Invalid_Syntax_Error, "Expected ':' after 'uta'")
+        self.advance()
+        if self.current_token.type != TT_NEWLINE:
+            return (self.statement(), False)
+        self.advance()
+        statements = self.statements()
+        if self.current_key != "anta":
+            raise self.failure(Invalid_Syntax_Error, "Expected 'anta'")
+        self.advance()
+        return (statements, True)
 
+    def block_or_statement(self):
         if not self.current_token.matches(TT_KEYWORD, ":"):
-            return res.failure(
-                Invalid_Syntax_Error(
-                    self.current_token.pos_start,
-                    self.current_token.pos_end,
-                    "Expected ':'",
-                )
+            raise self.failure(Expected_Char_Error, "apekchhit ':'")
+        self.advance()
+        if self.current_token.type != TT_NEWLINE:
+            return self.statement(), False
+        self.advance()
+        body = self.statements()
+        if self.current_key != "aMta":
+            raise self.failure(
+                Invalid_Syntax_Error, "अपेक्षितं 'anta' | apekchhit 'anta'"
             )
-
-        res.register_advancement()
         self.advance()
+        return body, True
 
-        # CORRECTED: Get the actual expression node
-        if self.current_token.type == TT_NEWLINE:
-            res.register_advancement()
+    def for_expr(self):
+        self.advance()
+        if self.current_token.type != TT_IDENTIFIER:
+            raise self.failure(Expected_Char_Error, "apekchhit 'Identifier'")
+        var_name = self.current_token
+        self.advance()
+        if self.current_token.type != TT_EQ:
+            raise self.failure(Expected_Char_Error, "apekchhit '='")
+        self.advance()
+        start_value = self.expr()
+        if self.current_key != "ityasmai":
+            raise self.failure(Expected_Char_Error, "apekchhit 'ityasmai'")
+        self.advance()
+        end_value = self.expr()
+        step_value = None
+        if self.current_key == "charana":
             self.advance()
-            statements = res.register(self.statements())
-            if res.error:
-                return res
-            cases.append((condition, statements, True))
-
-            if self.current_token.matches(TT_KEYWORD, "aMta"):
-                res.register_advancement()
-                self.advance()
-            else:
-                all_cases = res.register(self.check_if_BCCASE())
-                if res.error:
-                    return res
-                new_cases, else_case = all_cases
-                cases.extend(new_cases)
-        else:
-            # FIX: Register the expression and get the node
-            expr = res.register(self.statement())
-            if res.error:
-                return res
-            cases.append((condition, expr, False))  # Store the node, not ParseResult
-
-            all_cases = res.register(self.check_if_BCCASE())
-            if res.error:
-                return res
-            new_cases, else_case = all_cases
-            cases.extend(new_cases)
-
-        return res.success((cases, else_case))
-
-    def check_if_elif(self):
-        return self.check_if_cases("anyadi")
+            step_value = self.expr()
+        body, should_return_null = self.block_or_statement()
+        return ForNode(
+            var_name, start_value, end_value, step_value, body, should_return_null
+        )
 
-    def check_if_else(self):
-        res = ParseResult()
-        else_case = None
+    def while_expr(self):
+        self.advance()
+        condition = self.expr()
+        body, should_return_null = self.block_or_statement()
+        return WhileNode(condition, body, should_return_null)
 
-        if self.current_token.matches(TT_KEYWORD, "uta"):
-            res.register_advancement()
+    def func_def(self):
+        self.advance()
+        var_name_tok = None
+        if self.current_token.type == TT_IDENTIFIER:
+            var_name_tok = self.current_token
             self.advance()
+            if self.current_token.type != TT_LPAREN:
+                raise self.failure(Expected_Char_Error, "apekchhit '('")
+        elif self.current_token.type != TT_LPAREN:
+            raise self.failure(Expected_Char_Error, "apekchhit 'identifier' , '('")
+        self.advance()
+        arg_name_tok = []
+        if self.current_token.type == TT_IDENTIFIER:
+            arg_name_tok.append(self.current_token)
+            self.advance()
+            while self.current_token.type == TT_COMMA:
+                self.advance()
+                if self.current_token.type != TT_IDENTIFIER:
+                    raise self.failure(Expected_Char_Error, "apekchhit 'identifier'")
+                arg_name_tok.append(self.current_token)
+                self.advance()
+            if self.current_token.type != TT_RPAREN:
+                raise self.failure(Expected_Char_Error, "apekchhit ',' or ')'")
+        elif self.current_token.type != TT_RPAREN:
+            raise self.failure(Expected_Char_Error, "apekchhit 'identifier' , ')'")
+        self.advance()
+        if not self.current_token.matches(TT_KEYWORD, ":"):
+            raise self.failure(Expected_Char_Error, "apekchhit ':'")
+        self.advance()
+        if self.current_token.type != TT_NEWLINE:
+            return FuncDefNode(var_name_tok, arg_name_tok, self.expr(), True)
+        self.advance()
+        body = self.statements()
+        while self.current_token.type == TT_NEWLINE:
+            self.advance()
+        if self.current_key != "anta" and self.current_key != "aMta":
+            raise self.failure(
+                Invalid_Syntax_Error, "अपेक्षितं 'anta' | apekchhit 'anta'"
+            )
+        self.advance()
+        return FuncDefNode(var_name_tok, arg_name_tok, body, False)
 
-            if self.current_token.type != TT_KEYWORD:  # Missing colon check
-                return res.failure(
-                    Invalid_Syntax_Error(
-                        self.current_token.pos_start,
-                        self.current_token.pos_end,
-                        "Expected ':' after 'uta'",
-                    )
-                )
 
-            res.register_advancement()
-            self.advance()
+# Runtime Result
+class RTresult:
+    __slots__ = (
+        "value",
+        "error",
+        "func_return_value",
+        "loop_should_continue",
+        "loop_should_break",
+    )
 
-            if self.current_token.type == TT_NEWLINE:
-                res.register_advancement()
-                self.advance()
+    def __init__(self):
+        self.reset()
 
-                statements = res.register(self.statements())
-                if res.error:
-                    return res
-                else_case = (statements, True)
-
-                if not self.current_token.matches(TT_KEYWORD, "anta"):
-                    return res.failure(
-                        Invalid_Syntax_Error(
-                            self.current_token.pos_start,
-                            self.current_token.pos_end,
-                            "Expected 'anta'",
-                        )
-                    )
-                res.register_advancement()
-                self.advance()
-            else:
-                expr = res.register(self.statement())
-                if res.error:
-                    return res
-                else_case = (expr, False)
+    def reset(self):
+        self.value = None
+        self.error = None
+        self.func_return_value = None
+        self.loop_should_continue = False
+        self.loop_should_break = False
 
-        return res.success(else_case)
+    def register(self, res):
 
-    def check_if_BCCASE(self):
-        res = ParseResult()
-        cases = []
-        else_case = None
+        self.error = res.error
+        self.func_return_value = res.func_return_value
+        self.loop_should_continue = res.loop_should_continue
+        self.loop_should_break = res.loop_should_break
+        return res.value
 
-        # Handle anyadi (elif) cases
-        while self.current_token.matches(TT_KEYWORD, "anyadi"):
-            cases_res = res.register(self.check_if_cases("anyadi"))
-            if res.error:
-                return res
-            cases.extend(cases_res[0])
+    def success(self, value):
+        self.reset()
+        self.value = value
+        return self
 
-        # Handle uta (else) case
-        if self.current_token.matches(TT_KEYWORD, "uta"):
-            else_res = res.register(self.check_if_else())
-            if res.error:
-                return res
-            else_case = else_res
+    def succes_return(self, value):
+        self.reset()
+        self.func_return_value = value
+        return self
 
-        return res.success((cases, else_case))
+    def success_continue(self):
+        self.reset()
+        self.loop_should_continue = True
+        return self
 
-    def for_expr(self):
-        res = ParseResult()
+    def success_break(self):
+        self.reset()
+        self.loop_should_break = True
+        return self
 
-        if not self.current_token.matches(TT_KEYWORD, "krrite"):
-            return res.failure(
-                Expected_Char_Error(
-                    self.current_token.pos_start,
-                    self.current_token.pos_end,
-                    "apekchhit 'krrite'",
-                )
-            )
-        res.register_advancement()
-        self.advance()
-        if self.current_token.type != TT_IDENTIFIER:
-            return res.failure(
-                Expected_Char_Error(
-                    self.current_token.pos_start,
-                    self.current_token.pos_end,
-                    "apekchhit 'Identifier'",
-                )
-            )
-        var_name = self.current_token
-        res.register_advancement()
-        self.advance()
-        if self.current_token.type != TT_EQ:
-            return res.failure(
-                Expected_Char_Error(
-                    self.current_token.pos_start,
-                    self.current_token.pos_end,
-                    "apekchhit '='",
-                )
-            )
-        res.register_advancement()
-        self.advance()
-        start_value = res.register(self.expr())
-        if res.error:
-            return res
+    def failure(self, error):
+        self.reset()
+        self.error = error
+        return self
 
-        if not self.current_token.matches(TT_KEYWORD, "ityasmai"):
-            return res.failure(
-                Expected_Char_Error(
-                    self.current_token.pos_start,
-                    self.current_token.pos_end,
-                    "apekchhit 'ityasmai'",
-                )
-            )
-        res.register_advancement()
-        self.advance()
-        end_value = res.register(self.expr())
-        if res.error:
-            return res
-        if self.current_token.matches(TT_KEYWORD, "charana"):
-            res.register_advancement()
-            self.advance()
-            step_value = res.register(self.expr())
-            if res.error:
-                return res
-        else:
-            step_value = None
-        if not self.current_token.matches(TT_KEYWORD, ":"):
-            return res.failure(
-                Expected_Char_Error(
-                    self.current_token.pos_start,
-                    self.current_token.pos_end,
-                    "apekchhit ':'",
-                )
-            )
-        res.register_advancement()
-        self.advance()
-        if self.current_token.type == TT_NEWLINE:
-            res.register_advancement()
-            self.advance()
+    def should_return(self):
+        return (
+            self.error
+            or self.func_return_value
+            or self.loop_should_continue
+            or self.loop_should_break
+        )
 
-            body = res.register(self.statements())
 
-            if res.error:
-                return res
+# Values
+# Values are shared between every variable and list that holds them, so they
+# carry no position or context. Errors are placed by the evaluator instead,
+# see locate_error.
+class Value:
+    __slots__ = ()
 
-            if not self.current_token.matches(TT_KEYWORD, "aMta"):
+    def added_to(self, other):
+        return None, self.illegal_operation(other)
 
-                return res.failure(
-                    Invalid_Syntax_Error(
-                        self.current_token.pos_start,
-                        self.current_token.pos_end,
-                        "अपेक्षितं 'anta' | apekchhit 'anta'",
-                    )
-                )
-            res.register_advancement()
-            self.advance()
+    def subtracted_from(self, other):
+        return None, self.illegal_operation(other)
 
-            return res.success(
-                ForNode(var_name, start_value, end_value, step_value, body, True)
-            )
+    def multiplied_by(self, other):
+        return None, self.illegal_operation(other)
 
-        body = res.register(self.statement())
-        if res.error:
-            return res
+    def divided_by(self, other):
+        return None, self.illegal_operation(other)
 
-        return res.success(
-            ForNode(var_name, start_value, end_value, step_value, body, False)
-        )
+    def to_power(self, other):
+        return None, self.illegal_operation(other)
 
-    def while_expr(self):
-        res = ParseResult()
+    def get_comp_eq(self, other):
+        return None, self.illegal_operation(other)
 
-        if not self.current_token.matches(TT_KEYWORD, "sopanah"):
+    def get_comp_ne(self, other):
+        return None, self.illegal_operation(other)
 
-            return res.failure(
-                Expected_Char_Error(
-                    self.current_token.pos_start,
-                    self.current_token.pos_end,
-                    "apekchhit 'sopanah'",
-                )
-            )
-        res.register_advancement()
-        self.advance()
+    def get_comp_lt(self, other):
+        return None, self.illegal_operation(other)
 
-        condition = res.register(self.expr())
-        if res.error:
-            return res
-        if not self.current_token.matches(TT_KEYWORD, ":"):
-            return res.failure(
-                Expected_Char_Error(
-                    self.current_token.pos_start,
-                    self.current_token.pos_end,
-                    "apekchhit ':'",
-                )
-            )
-        res.register_advancement()
-        self.advance()
-        if self.current_token.type == TT_NEWLINE:
-            res.register_advancement()
-            self.advance()
+    def get_comp_gt(self, other):
+        return None, self.illegal_operation(other)
 
-            body = res.register(self.statements())
-            if res.error:
-                return res
+    def get_comp_gte(self, other):
+        return None, self.illegal_operation(other)
 
-            if not self.current_token.matches(TT_KEYWORD, "aMta"):
-                return res.failure(
-                    Invalid_Syntax_Error(
-                        self.current_token.pos_start,
-                        self.current_token.pos_end,
-                        "अपेक्षितं 'anta' | apekchhit 'anta'",
-                    )
-                )
-            res.register_advancement()
-            self.advance()
-            return res.success(WhileNode(condition, body, True))
+    def get_comp_lte(self, other):
+        return None, self.illegal_operation(other)
 
-        body = res.register(self.statement())
-        if res.error:
-            return res
-        return res.success(WhileNode(condition, body, False))
+    def anded_by(self, other):
+        return None, self.illegal_operation(other)
 
-    def func_def(self):
-        res = ParseResult()
-        arg_name_tok = []
-        if not self.current_token.matches(TT_KEYWORD, "niyoga"):
-            return res.failure(
-                Expected_Char_Error(
-                    self.current_token.pos_start,
-                    self.current_token.pos_end,
-                    "apekchhit 'niyoga'",
-                )
-            )
+    def ored_by(self, other):
+        return None, self.illegal_operation(other)
 
-        res.register_advancement()
-        self.advance()
-        if self.current_token.type == TT_IDENTIFIER:
-            var_name_tok = self.current_token
-            res.register_advancement()
-            self.advance()
-            if self.current_token.type != TT_LPAREN:
-                return res.failure(
-                    Expected_Char_Error(
-                        self.current_token.pos_start,
-                        self.current_token.pos_end,
-                        "apekchhit '('",
-                    )
-                )
-            res.register_advancement()
-            self.advance()
+    def notted(self):
+        return None, self.illegal_operation()
+
+    def is_true(self):
+        return False
+
+    def execute(self, args, context, pos_start):
+        return RTresult().failure(self.illegal_operation())
+
+    def copy(self):
+        raise Exception("No copy method defined")
+
+    def illegal_operation(self, other=None):
+        return RTError(None, None, "अवैध क्रिया | avaidh kriya", None)
+
+
+# Persistent Vector
+# A 32-way trie with the last chunk kept apart as the tail, so appending,
+# popping and indexing copy at most one path of nodes. Vectors are never
+# changed in place; every update returns a new vector that shares the rest.
+VECTOR_BITS = 5
+VECTOR_WIDTH = 1 << VECTOR_BITS
+VECTOR_MASK = VECTOR_WIDTH - 1
+
+
+class Vector:
+    __slots__ = ("count", "shift", "root", "tail")
+
+    def __init__(self, count, shift, root, tail):
+        self.count = count
+        self.shift = shift
+        self.root = root
+        self.tail = tail
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        for start in range(0, self.tail_offset(), VECTOR_WIDTH):
+            yield from self.leaf_for(start)
+        yield from self.tail
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("vector index out of range")
+        return self.leaf_for(index)[index & VECTOR_MASK]
+
+    def tail_offset(self):
+        return self.count - len(self.tail)
+
+    def leaf_for(self, index):
+        if index >= self.tail_offset():
+            return self.tail
+        node = self.root
+        for level in range(self.shift, 0, -VECTOR_BITS):
+            node = node[(index >> level) & VECTOR_MASK]
+        return node
+
+    def appended(self, value):
+        if len(self.tail) < VECTOR_WIDTH:
+            return Vector(self.count + 1, self.shift, self.root, self.tail + [value])
+        shift = self.shift
+        if (self.count >> VECTOR_BITS) > (1 << shift):
+            root = [self.root, new_vector_path(shift, self.tail)]
+            shift += VECTOR_BITS
         else:
-            var_name_tok = None
-            if self.current_token.type != TT_LPAREN:
-                return res.failure(
-                    Expected_Char_Error(
-                        self.current_token.pos_start,
-                        self.current_token.pos_end,
-                        "apekchhit 'identifier' , '('",
-                    )
-                )
-            res.register_advancement()
-            self.advance()
-            arg_name_tok = []
-        if self.current_token.type == TT_IDENTIFIER:
-            arg_name_tok.append(self.current_token)
-            res.register_advancement()
-            self.advance()
-            while self.current_token.type == TT_COMMA:
-                res.register_advancement()
-                self.advance()
-                if self.current_token.type != TT_IDENTIFIER:
-                    return res.failure(
-                        Expected_Char_Error(
-                            self.current_token.pos_start,
-                            self.current_token.pos_end,
-                            "apekchhit 'identifier'",
-                        )
-                    )
-                arg_name_tok.append(self.current_token)
-                res.register_advancement()
-                self.advance()
-            if self.current_token.type != TT_RPAREN:
-                return res.failure(
-                    Expected_Char_Error(
-                        self.current_token.pos_start,
-                        self.current_token.pos_end,
-                        "apekchhit ',' or ')'",
-                    )
-                )
+            root = self.push_tail(shift, self.root, self.tail)
+        return Vector(self.count + 1, shift, root, [value])
+
+    def push_tail(self, level, parent, tail):
+        index = ((self.count - 1) >> level) & VECTOR_MASK
+        node = parent[:]
+        if level == VECTOR_BITS:
+            node.append(tail)
+        elif index < len(parent):
+            node[index] = self.push_tail(level - VECTOR_BITS, parent[index], tail)
         else:
-            if self.current_token.type != TT_RPAREN:
-                return res.failure(
-                    Expected_Char_Error(
-                        self.current_token.pos_start,
-                        self.current_token.pos_end,
-                        "apekchhit 'identifier' , ')'",
-                    )
-                )
+            node.append(new_vector_path(level - VECTOR_BITS, tail))
+        return node
+
+    def popped(self):
+        if self.count == 0:
+            raise IndexError("pop from empty vector")
+        if self.count == 1:
+            return EMPTY_VECTOR
+        if len(self.tail) > 1:
+            return Vector(self.count - 1, self.shift, self.root, self.tail[:-1])
+        tail = self.leaf_for(self.count - 2)
+        root = self.pop_tail(self.shift, self.root)
+        shift = self.shift
+        if root is None:
+            root = []
+        elif shift > VECTOR_BITS and len(root) == 1:
+            root = root[0]
+            shift -= VECTOR_BITS
+        return Vector(self.count - 1, shift, root, tail)
+
+    def pop_tail(self, level, node):
+        index = ((self.count - 2) >> level) & VECTOR_MASK
+        if level > VECTOR_BITS:
+            child = self.pop_tail(level - VECTOR_BITS, node[index])
+            if child is None:
+                return node[:index] or None
+            return node[:index] + [child]
+        return node[:index] or None
+
+    def updated(self, index, value):
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("vector index out of range")
+        if index >= self.tail_offset():
+            tail = self.tail[:]
+            tail[index & VECTOR_MASK] = value
+            return Vector(self.count, self.shift, self.root, tail)
+        root = self.update_node(self.shift, self.root, index, value)
+        return Vector(self.count, self.shift, root, self.tail)
+
+    def update_node(self, level, node, index, value):
+        node = node[:]
+        position = (index >> level) & VECTOR_MASK
+        if level == 0:
+            node[position] = value
+        else:
+            node[position] = self.update_node(
+                level - VECTOR_BITS, node[position], index, value
+            )
+        return node
+
+    def removed(self, index):
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("vector index out of range")
+        if index == self.count - 1:
+            return self.popped()
+        # Everything after the removed element moves down, so rebuild from there
+        values = list(self)
+        del values[index]
+        return make_vector(values)
+
+    def extended(self, values):
+        vector = self
+        for value in values:
+            vector = vector.appended(value)
+        return vector
+
+
+def new_vector_path(level, node):
+    while level > 0:
+        node = [node]
+        level -= VECTOR_BITS
+    return node
+
+
+def make_vector(values):
+    values = list(values)
+    if not values:
+        return EMPTY_VECTOR
+    if len(values) <= VECTOR_WIDTH:
+        # Fits in the tail, like most lists and every loop body's statements
+        return Vector(len(values), VECTOR_BITS, [], values)
+    tail_offset = (len(values) - 1) >> VECTOR_BITS << VECTOR_BITS
+    nodes = [
+        values[start : start + VECTOR_WIDTH]
+        for start in range(0, tail_offset, VECTOR_WIDTH)
+    ]
+    shift = VECTOR_BITS
+    while len(nodes) > VECTOR_WIDTH:
+        nodes = [
+            nodes[start : start + VECTOR_WIDTH]
+            for start in range(0, len(nodes), VECTOR_WIDTH)
+        ]
+        shift += VECTOR_BITS
+    return Vector(len(values), shift, nodes, values[tail_offset:])
+
+
+EMPTY_VECTOR = Vector(0, VECTOR_BITS, [], [])
 
-        res.register_advancement()
-        self.advance()
-        if self.current_token.matches(TT_KEYWORD, ":"):
-            res.register_advancement()
-            self.advance()
-            if self.current_token.type != TT_NEWLINE:
-                body = res.register(self.expr())
-                if res.error:
-                    return res
-                return res.success(FuncDefNode(var_name_tok, arg_name_tok, body, True))
-            if self.current_token.type == TT_NEWLINE:
-                res.register_advancement()
-                self.advance()
-                body = res.register(self.statements())
-                if res.error:
-                    return res
-                while self.current_token.type == TT_NEWLINE:
-                    res.register_advancement()
-                    self.advance()
-                if not (
-                    self.current_token.matches(TT_KEYWORD, "anta")
-                    or self.current_token.matches(TT_KEYWORD, "aMta")
-                ):
-                    return res.failure(
-                        Invalid_Syntax_Error(
-                            self.current_token.pos_start,
-                            self.current_token.pos_end,
-                            "अपेक्षितं 'anta' | apekchhit 'anta'",
-                        )
-                    )
-                res.register_advancement()
-                self.advance()
-                return res.success(FuncDefNode(var_name_tok, arg_name_tok, body, False))
 
-    def call(self):
-        res = ParseResult()
-        atom = res.register(self.atom())
-        if res.error:
-            return res
-        if self.current_token.type == TT_LPAREN:
-            res.register_advancement()
-            self.advance()
-            arg_nodes = []
-            if self.current_token.type == TT_RPAREN:
-                res.register_advancement()
-                self.advance()
-            else:
-                arg_nodes.append(res.register(self.expr()))
-                if res.error:
-                    return res.failure(
-                        Invalid_Syntax_Error(
-                            self.current_token.pos_start,
-                            self.current_token.pos_end,
-                            "अपेक्षितं INT,FLOAT,+,-,परिचयकः अथवा ( | apekchhit INT,FLOAT,+,-,parichayakah athva (",
-                        )
-                    )
+class List(Value):
+    __slots__ = ("elements",)
 
-                while self.current_token.type == TT_COMMA:
-                    res.register_advancement()
-                    self.advance()
-                    arg_nodes.append(res.register(self.expr()))
-                    if res.error:
-                        return res
-                if self.current_token.type != TT_RPAREN:
-                    return res.failure(
-                        Expected_Char_Error(
-                            self.current_token.pos_start,
-                            self.current_token.pos_end,
-                            "apekchhit ',' or ')'",
-                        )
-                    )
-                res.register_advancement()
-                self.advance()
-            return res.success(CallNode(atom, arg_nodes))
-        return res.success(atom)
+    def __init__(self, elements):
+        self.elements = elements if type(elements) is Vector else make_vector(elements)
 
-    def list_expr(self):
-        res = ParseResult()
-        list_element_nodes = []
-        pos_start = self.current_token.pos_start
+    def added_to(self, other):
+        return List(self.elements.appended(other)), None
 
-        if self.current_token.type != TT_LSQUARE:
-            return res.failure(
-                Invalid_Syntax_Error(
-                    self.current_token.pos_start,
-                    self.current_token.pos_end,
-                    "अपेक्षितं '[' | apekchhit '['",
-                )
-            )
-        res.register_advancement()
-        self.advance()
-        if self.current_token.type == TT_RSQUARE:
-            res.register_advancement()
-            self.advance()
-        else:
-            list_element_nodes.append(res.register(self.expr()))
-            if res.error:
-                return res.failure(
-                    Invalid_Syntax_Error(
-                        self.current_token.pos_start,
-                        self.current_token.pos_end,
-                        "अपेक्षितं INT,FLOAT,+,-,परिचयकः अथवा ] | apekchhit INT,FLOAT,+,-,parichayakah athva (",
-                    )
-                )
-            while self.current_token.type == TT_COMMA:
-                res.register_advancement()
-                self.advance()
-                list_element_nodes.append(res.register(self.expr()))
-                if res.error:
-                    return res
-            if self.current_token.type != TT_RSQUARE:
-                return res.failure(
-                    Expected_Char_Error(
-                        self.current_token.pos_start,
-                        self.current_token.pos_end,
-                        "apekchhit ',' or ')'",
-                    )
-                )
-            res.register_advancement()
-            self.advance()
-        return res.success(
-            ListNode(list_element_nodes, pos_start, self.current_token.pos_end.copy())
-        )
-
-    def atom(self):
-        res = ParseResult()
-        tok = self.current_token
-        if tok.type in (TT_INT, TT_FLOAT):
-            res.register_advancement()
-            self.advance()
-            return res.success(NumberNode(tok))
-        if tok.type in (TT_STRING_S, TT_STRING_D):
-            res.register_advancement()
-            self.advance()
-            return res.success(StringNode(tok))
-        elif tok.type == TT_IDENTIFIER:
-            res.register_advancement()
-            self.advance()
-            return res.success(VarAccessNode(tok))
-        elif tok.type == TT_LPAREN:
-            res.register_advancement()
-            self.advance()
-            expr = res.register(self.expr())
-            if res.error:
-                return res
-            if self.current_token.type == TT_RPAREN:
-                res.register_advancement()
-                self.advance()
-                return res.success(expr)
-            else:
-                return res.failure(
-                    Invalid_Syntax_Error(
-                        self.current_token.pos_start,
-                        self.current_token.pos_end,
-                        "अपेक्षितं ')' | apekchhit ')'",
-                    )
-                )
-        elif tok.matches(TT_KEYWORD, "yadi"):
-            if_expr = res.register(self.if_expr())
-            if res.error:
-                return res
-            return res.success(if_expr)
-        elif tok.matches(TT_KEYWORD, "kRRite") or tok.matches(TT_KEYWORD, "krrite"):
-            for_expr = res.register(self.for_expr())
-            if res.error:
-                return res.failure(
-                    Invalid_Syntax_Error(
-                        self.current_token.pos_start,
-                        self.current_token.pos_end,
-                        "Invalid for-loop syntax",
-                    )
-                )
-            return res.success(for_expr)
-        elif tok.matches(TT_KEYWORD, "sopAnaH") or tok.matches(TT_KEYWORD, "sopanah"):
-            while_expr = res.register(self.while_expr())
-            if res.error:
-                return res
-            return res.success(while_expr)
-        elif tok.matches(TT_KEYWORD, "niyoga"):
-            func_expr = res.register(self.func_def())
-            if res.error:
-                return res
-            return res.success(func_expr)
-        elif tok.type == TT_LSQUARE:
-            list_expr = res.register(self.list_expr())
-            if res.error:
-                return res
-            return res.success(list_expr)
-
-        return res.failure(
-            Invalid_Syntax_Error(
-                tok.pos_start,
-                tok.pos_end,
-                "अपेक्षितं INT,FLOAT,+,-,परिचयकः अथवा ( | apekchhit INT,FLOAT,+,-,parichayakah athva (",
-            )
-        )
-
-    def power(self):
-        return self.bin_op(self.call, (TT_POW,), self.factor)
-
-    def factor(self):
-        res = ParseResult()
-        tok = self.current_token
-        if tok.type in (TT_PLUS, TT_MINUS):
-            res.register_advancement()
-            self.advance()
-            factor = res.register(self.factor())
-            if res.error:
-                return res
-            return res.success(UnaryOpNode(tok, factor))
-
-        return self.power()
-
-    def term(self):
-        return self.bin_op(self.factor, (TT_MUL, TT_DIV))
-
-    def arith_expr(self):
-        return self.bin_op(self.term, (TT_PLUS, TT_MINUS))
-
-    def comp_expr(self):
-        res = ParseResult()
-        if self.current_token.matches(TT_KEYWORD, "nahi"):
-            op_tok = self.current_token
-            res.register_advancement()
-            self.advance()
-            node = res.register(self.comp_expr())
-            if res.error:
-                return res
-            return res.success(UnaryOpNode(op_tok, node))
-        node = res.register(
-            self.bin_op(self.arith_expr, (TT_EE, TT_NE, TT_LT, TT_GT, TT_LTE, TT_GTE))
-        )
-        if res.error:
-            return res.failure(
-                Invalid_Syntax_Error(
-                    self.current_token.pos_start,
-                    self.current_token.pos_end,
-                    "अपेक्षितं INT,FLOAT,+,-,परिचयकः अथवा ( | apekchhit INT,FLOAT,+,-,nahi parichayakah athva (",
-                )
-            )
-        return res.success(node)
-
-    def expr(self):
-        res = ParseResult()
-        if self.current_token.matches(
-            TT_KEYWORD, "charaH"
-        ) or self.current_token.matches(TT_KEYWORD, "charah"):
-            res.register_advancement()
-            self.advance()
-            if self.current_token.type != TT_IDENTIFIER:
-                return res.failure(
-                    Invalid_Syntax_Error(
-                        self.current_token.pos_start,
-                        self.current_token.pos_end,
-                        "अपेक्षितं परिचयकः | apekchhit parichayakah",
-                    )
-                )
-            var_name = self.current_token
-            res.register_advancement()
-            self.advance()
-            if self.current_token.type != TT_EQ:
-                return res.failure(
-                    Invalid_Syntax_Error(
-                        self.current_token.pos_start,
-                        self.current_token.pos_end,
-                        "अपेक्षितं '=' | apekchhit '=",
-                    )
-                )
-            res.register_advancement()
-            self.advance()
-
-            expr = res.register(self.expr())
-            if res.error:
-                return res
-            return res.success(VarAssignNode(var_name, expr))
-        node = res.register(
-            self.bin_op(
-                self.comp_expr,
-                (
-                    (TT_KEYWORD, "tathA"),
-                    (TT_KEYWORD, "tatha"),
-                    (TT_KEYWORD, "vA"),
-                    (TT_KEYWORD, "va"),
-                ),
-            )
-        )
-        if res.error:
-            return res.failure(
-                Invalid_Syntax_Error(
-                    self.current_token.pos_start,
-                    self.current_token.pos_end,
-                    "अपेक्षितं INT,FLOAT,+,-,परिचयकः अथवा ( | apekchhit charah ,INT,FLOAT,+,-,nahi,parichayakah athva (",
-                )
-            )
-        return res.success(node)
-
-    def bin_op(self, func_a, ops, func_b=None):
-        res = ParseResult()
-        if func_b == None:
-            func_b = func_a
-        left = res.register(func_a())
-
-        if res.error:
-            return res.failure(
-                Invalid_Syntax_Error(
-                    self.current_token.pos_start,
-                    self.current_token.pos_end,
-                    "Invalid binary operation",
-                )
-            )
-        # self.advance()
-        while (
-            self.current_token.type in ops
-            or (self.current_token.type, self.current_token.value) in ops
-        ):
-            op_tok = self.current_token
-            res.register_advancement()
-            self.advance()
-            right = res.register(func_b())
-
-            if res.error:
-                return res
-            left = BinaryOpNode(left, op_tok, right)
-        return res.success(left)
-
-
-# Runtime Result
-class RTresult:
-    def __init__(self):
-        self.reset()
-
-    def reset(self):
-        self.value = None
-        self.error = None
-        self.func_return_value = None
-        self.loop_should_continue = False
-        self.loop_should_break = False
-
-    def register(self, res):
-
-        self.error = res.error
-        self.func_return_value = res.func_return_value
-        self.loop_should_continue = res.loop_should_continue
-        self.loop_should_break = res.loop_should_break
-        return res.value
-
-    def success(self, value):
-        self.reset()
-        self.value = value
-        return self
-
-    def succes_return(self, value):
-        self.reset()
-        self.func_return_value = value
-        return self
-
-    def success_continue(self):
-        self.reset()
-        self.loop_should_continue = True
-        return self
-
-    def success_break(self):
-        self.reset()
-        self.loop_should_break = True
-        return self
-
-    def failure(self, error):
-        self.reset()
-        self.error = error
-        return self
-
-    def should_return(self):
-        return (
-            self.error
-            or self.func_return_value
-            or self.loop_should_continue
-            or self.loop_should_break
-        )
-
-
-# Values
-class Value:
-    def __init__(self):
-        self.set_pos()
-        self.set_context()
-
-    def set_pos(self, pos_start=None, pos_end=None):
-        self.pos_start = pos_start
-        self.pos_end = pos_end
-        return self
-
-    def set_context(self, context=None):
-        self.context = context
-        return self
-
-    def added_to(self, other):
-        return None, self.illegal_operation(other)
-
-    def subtracted_from(self, other):
-        return None, self.illegal_operation(other)
-
-    def multiplied_by(self, other):
-        return None, self.illegal_operation(other)
-
-    def divided_by(self, other):
-        return None, self.illegal_operation(other)
-
-    def to_power(self, other):
-        return None, self.illegal_operation(other)
-
-    def get_comp_eq(self, other):
-        return None, self.illegal_operation(other)
-
-    def get_comp_ne(self, other):
-        return None, self.illegal_operation(other)
-
-    def get_comp_lt(self, other):
-        return None, self.illegal_operation(other)
-
-    def get_comp_gt(self, other):
-        return None, self.illegal_operation(other)
-
-    def get_comp_gte(self, other):
-        return None, self.illegal_operation(other)
-
-    def get_comp_lte(self, other):
-        return None, self.illegal_operation(other)
-
-    def anded_by(self, other):
-        return None, self.illegal_operation(other)
-
-    def ored_by(self, other):
-        return None, self.illegal_operation(other)
-
-    def notted(self):
-        return None, self.illegal_operation()
-
-    def is_true(self):
-        return False
-
-    def execute(self, args):
-        return RTresult().failure(self.illegal_operation())
-
-    def copy(self):
-        raise Exception("No copy method defined")
-
-    def illegal_operation(self, other=None):
-        if not other:
-            other = self
-            return RTError(
-                self.pos_start, self.pos_end, "अवैध क्रिया | avaidh kriya", self.context
-            )
-
-
-class List(Value):
-    def __init__(self, elements):
-        super().__init__()
-        self.elements = elements
-
-    def added_to(self, other):
-        newlist = self.copy()
-        newlist.elements.append(other)
-        return newlist, None
-
-    def subtracted_from(self, other):
-        if isinstance(other, Number):
-            newlist = self.copy()
-            try:
-                newlist.elements.pop(other.value)
-                return newlist, None
-            except:
-                return None, RTError(
-                    other.pos_start,
-                    other.pos_end,
-                    "अवैध स्थानम् | avaidh sthanam",
-                    self.context,
+    def subtracted_from(self, other):
+        if isinstance(other, Number):
+            try:
+                # Floats are not indexes, as they are not for /
+                if type(other.value) is not int:
+                    raise TypeError(other.value)
+                return List(self.elements.removed(other.value)), None
+            except:
+                return None, RTOperandError(
+                    None, None, "अवैध स्थानम् | avaidh sthanam", None
                 )
         else:
             return None, Value.illegal_operation(self, other)
 
     def multiplied_by(self, other):
         if isinstance(other, Number):
-            newlist = self.copy()
-            newlist.elements.append(other)
-            return newlist, None
+            return List(self.elements.appended(other)), None
         elif isinstance(other, List):
-            list_1 = self.copy()
-            list_2 = other.copy()
-            length_1 = len(list_1.elements)
-            length_2 = len(list_2.elements)
+            elements_1 = list(self.elements)
+            elements_2 = list(other.elements)
+            length_1 = len(elements_1)
+            length_2 = len(elements_2)
             newlist = []
             max_len = max(length_1, length_2)
-            print(max_len)
-
 
-            list_1.elements += [Number(0)] * (max_len - length_1)
-            list_2.elements += [Number(0)] * (max_len - length_2)
+            elements_1 += [Number(0)] * (max_len - length_1)
+            elements_2 += [Number(0)] * (max_len - length_2)
             for i in range(max_len):
-                elem1 = list_1.elements[i]
-                elem2 = list_2.elements[i]
+                elem1 = elements_1[i]
+                elem2 = elements_2[i]
                 product, error = elem1.multiplied_by(elem2)
                 if error:
                     return None, error
                 newlist.append(product)
             return List(newlist), None
-                
+
         else:
             return None, Value.illegal_operation(self, other)
 
@@ -1588,141 +1377,134 @@ class List(Value):
             try:
                 return self.elements[other.value], None
             except:
-                return None, RTError(
-                    other.pos_start,
-                    other.pos_end,
-                    "अवैध स्थानम् | avaidh sthanam",
-                    self.context,
+                return None, RTOperandError(
+                    None, None, "अवैध स्थानम् | avaidh sthanam", None
                 )
         else:
             return None, Value.illegal_operation(self, other)
 
     def copy(self):
-        copy = List(self.elements)
-        copy.set_pos(self.pos_start, self.pos_end)
-        copy.set_context(self.context)
-        return copy
+        return List(self.elements)
 
     def __repr__(self):
         return f'[{", ".join([repr(x) for x in self.elements])}]'
 
 
 class Number(Value):
+    __slots__ = ("value",)
+
     def __init__(self, value):
-        super().__init__()
         self.value = value
 
     def added_to(self, other):
         if isinstance(other, Number):
-            return Number(self.value + other.value).set_context(self.context), None
+            return make_number(self.value + other.value), None
+        elif isinstance(other, Array):
+            return other.combined(numpy.add, self, True)
         else:
             return None, Value.illegal_operation(self, other)
 
     def subtracted_from(self, other):
         if isinstance(other, Number):
-            return Number(self.value - other.value).set_context(self.context), None
+            return make_number(self.value - other.value), None
+        elif isinstance(other, Array):
+            return other.combined(numpy.subtract, self, True)
         else:
             return None, Value.illegal_operation(self, other)
 
     def multiplied_by(self, other):
         if isinstance(other, Number):
-            return Number(self.value * other.value).set_context(self.context), None
+            return make_number(self.value * other.value), None
+        elif isinstance(other, Array):
+            return other.combined(numpy.multiply, self, True)
         else:
             return None, Value.illegal_operation(self, other)
 
     def copy(self):
-        copy = Number(self.value)
-        copy.set_pos(self.pos_start, self.pos_end)
-        copy.set_context(self.context)
-        return copy
+        return self
 
     def to_power(self, other):
         if isinstance(other, Number):
-            return Number(self.value**other.value).set_context(self.context), None
+            return make_number(self.value**other.value), None
+        elif isinstance(other, Array):
+            return other.combined(numpy.power, self, True)
         else:
             return None, Value.illegal_operation(self, other)
 
     def divided_by(self, other):
         if isinstance(other, Number):
             if other.value == 0:
-                return None, RTError(
-                    other.pos_start,
-                    other.pos_end,
-                    "शून्येन विभागः | shunyen vibhagah",
-                    self.context,
+                return None, RTOperandError(
+                    None, None, "शून्येन विभागः | shunyen vibhagah", None
                 )
-            return Number(self.value / other.value).set_context(self.context), None
+            return make_number(self.value / other.value), None
+        elif isinstance(other, Array):
+            return other.combined(numpy.true_divide, self, True)
         else:
             return None, Value.illegal_operation(self, other)
 
     def get_comp_eq(self, other):
         if isinstance(other, Number):
-            return (
-                Number(int(self.value == other.value)).set_context(self.context),
-                None,
-            )
+            return (Number.true if self.value == other.value else Number.false), None
+        elif isinstance(other, Array):
+            return other.combined(numpy.equal, self, True)
         else:
             return None, Value.illegal_operation(self, other)
 
     def get_comp_ne(self, other):
         if isinstance(other, Number):
-            return (
-                Number(int(self.value != other.value)).set_context(self.context),
-                None,
-            )
+            return (Number.true if self.value != other.value else Number.false), None
+        elif isinstance(other, Array):
+            return other.combined(numpy.not_equal, self, True)
         else:
             return None, Value.illegal_operation(self, other)
 
     def get_comp_lt(self, other):
         if isinstance(other, Number):
-            return Number(int(self.value < other.value)).set_context(self.context), None
+            return (Number.true if self.value < other.value else Number.false), None
+        elif isinstance(other, Array):
+            return other.combined(numpy.less, self, True)
         else:
             return None, Value.illegal_operation(self, other)
 
     def get_comp_gt(self, other):
         if isinstance(other, Number):
-            return Number(int(self.value > other.value)).set_context(self.context), None
+            return (Number.true if self.value > other.value else Number.false), None
+        elif isinstance(other, Array):
+            return other.combined(numpy.greater, self, True)
         else:
             return None, Value.illegal_operation(self, other)
 
     def get_comp_gte(self, other):
         if isinstance(other, Number):
-            return (
-                Number(int(self.value >= other.value)).set_context(self.context),
-                None,
-            )
+            return (Number.true if self.value >= other.value else Number.false), None
+        elif isinstance(other, Array):
+            return other.combined(numpy.greater_equal, self, True)
         else:
             return None, Value.illegal_operation(self, other)
 
     def get_comp_lte(self, other):
         if isinstance(other, Number):
-            return (
-                Number(int(self.value <= other.value)).set_context(self.context),
-                None,
-            )
+            return (Number.true if self.value <= other.value else Number.false), None
+        elif isinstance(other, Array):
+            return other.combined(numpy.less_equal, self, True)
         else:
             return None, Value.illegal_operation(self, other)
 
     def anded_by(self, other):
         if isinstance(other, Number):
-            return (
-                Number(int(self.value and other.value)).set_context(self.context),
-                None,
-            )
+            return make_number(int(self.value and other.value)), None
         else:
             return None, Value.illegal_operation(self, other)
 
     def ored_by(self, other):
         if isinstance(other, Number):
-            return (
-                Number(int(self.value or other.value)).set_context(self.context),
-                None,
-            )
+            return make_number(int(self.value or other.value)), None
         else:
             return None, Value.illegal_operation(self, other)
 
     def notted(self):
-        return Number(int(1 if self.value == 0 else 0)).set_context(self.context), None
+        return (Number.true if self.value == 0 else Number.false), None
 
     def is_true(self):
         return self.value != 0
@@ -1731,35 +1513,208 @@ class Number(Value):
         return str(self.value)
 
 
-Number.null = Number(0)
-Number.false = Number(0)
-Number.true = Number(1)
+# Small integers are created once and shared, like Python's own int cache
+SMALL_NUMBERS = [Number(i) for i in range(-5, 257)]
+
+
+def make_number(value):
+    if type(value) is int and -5 <= value <= 256:
+        return SMALL_NUMBERS[value + 5]
+    return Number(value)
+
+
+Number.null = make_number(0)
+Number.false = make_number(0)
+Number.true = make_number(1)
 Number.math_pi = Number(math.pi)
 
 
-class String(Value):
-    def __init__(self, value, type):
-        super().__init__()
-        self.value = value
-        self.type = type
+# Number Array
+# A homogeneous array of numbers held in a NumPy array, so arithmetic and
+# comparisons run as one vectorized kernel instead of one Number per element
+# Integer arrays are int64. A result that may not fit, judged from the
+# largest magnitudes of the operands, is computed on Python ints instead,
+# which never overflow.
+ARRAY_INT_BOUND = 2**63
 
-    def added_to(self, other):
-        if isinstance(other, String):
-            return (
-                String(self.value + str(other.value), TT_STRING_D).set_context(
-                    self.context
-                ),
-                None,
+
+def is_int_operand(operand):
+    if type(operand) is int:
+        return True
+    return type(operand) is numpy.ndarray and operand.dtype.kind == "i"
+
+
+def magnitude(operand):
+    if type(operand) is int:
+        return abs(operand)
+    if len(operand) == 0:
+        return 0
+    return max(int(operand.max()), -int(operand.min()))
+
+
+def fits_int64(kernel, left, right):
+    a, b = magnitude(left), magnitude(right)
+    if kernel is numpy.multiply:
+        return a * b < ARRAY_INT_BOUND
+    if kernel is numpy.power:
+        return a <= 1 or b * a.bit_length() < 63
+    return a + b < ARRAY_INT_BOUND
+
+
+def exact_array(operand):
+    if type(operand) is numpy.ndarray:
+        return operand.astype(object)
+    return operand
+
+
+class Array(Value):
+    __slots__ = ("array",)
+
+    def __init__(self, array):
+        self.array = array
+
+    def combined(self, kernel, other, reflected=False):
+        if isinstance(other, Array):
+            if len(other.array) != len(self.array):
+                return None, RTError(
+                    None, None, "अवैध परिमाणम् | avaidh parimanam", None
+                )
+            operand = other.array
+        elif isinstance(other, Number):
+            operand = other.value
+        else:
+            return None, Value.illegal_operation(self, other)
+        left, right = (operand, self.array) if reflected else (self.array, operand)
+        if kernel is numpy.true_divide and numpy.any(numpy.equal(right, 0)):
+            return None, RTOperandError(
+                None, None, "शून्येन विभागः | shunyen vibhagah", None
+            )
+        if kernel is numpy.power and numpy.any(numpy.less(right, 0)):
+            # Integers to negative powers give fractions, as they do for Number
+            left = numpy.asarray(left, dtype=float)
+        elif (
+            kernel in (numpy.add, numpy.subtract, numpy.multiply, numpy.power)
+            and is_int_operand(left)
+            and is_int_operand(right)
+            and not fits_int64(kernel, left, right)
+        ):
+            left, right = exact_array(left), exact_array(right)
+        result = kernel(left, right)
+        if kernel is numpy.logical_and or kernel is numpy.logical_or:
+            result = result.astype(bool)
+        if result.dtype.kind == "b":
+            result = result.astype(numpy.int64)
+        return Array(result), None
+
+    def added_to(self, other):
+        return self.combined(numpy.add, other)
+
+    def subtracted_from(self, other):
+        return self.combined(numpy.subtract, other)
+
+    def multiplied_by(self, other):
+        return self.combined(numpy.multiply, other)
+
+    def divided_by(self, other):
+        return self.combined(numpy.true_divide, other)
+
+    def to_power(self, other):
+        return self.combined(numpy.power, other)
+
+    def get_comp_eq(self, other):
+        return self.combined(numpy.equal, other)
+
+    def get_comp_ne(self, other):
+        return self.combined(numpy.not_equal, other)
+
+    def get_comp_lt(self, other):
+        return self.combined(numpy.less, other)
+
+    def get_comp_gt(self, other):
+        return self.combined(numpy.greater, other)
+
+    def get_comp_gte(self, other):
+        return self.combined(numpy.greater_equal, other)
+
+    def get_comp_lte(self, other):
+        return self.combined(numpy.less_equal, other)
+
+    def anded_by(self, other):
+        return self.combined(numpy.logical_and, other)
+
+    def ored_by(self, other):
+        return self.combined(numpy.logical_or, other)
+
+    def notted(self):
+        return Array(numpy.logical_not(self.array).astype(numpy.int64)), None
+
+    def is_true(self):
+        return len(self.array) > 0
+
+    def copy(self):
+        return Array(self.array)
+
+    def __repr__(self):
+        return f'[{", ".join([str(x) for x in self.array.tolist()])}]'
+
+
+def make_array(value):
+    if isinstance(value, Array):
+        return value
+    if not isinstance(value, List):
+        return None
+    numbers = []
+    for element in value.elements:
+        if type(element) is not Number:
+            return None
+        numbers.append(element.value)
+    # Integers past the range of int64 are kept as Python ints
+    array = numpy.array(numbers)
+    if array.dtype.kind not in "ifO":
+        return None
+    return Array(array)
+
+
+# String
+# A string built with + keeps its pieces in a list and joins them the first
+# time its text is read, so a loop that grows a string runs in linear time.
+# Values are shared, so only the string that owns the end of the list appends
+# to it in place. Any other string starts a new list from its own text.
+class String(Value):
+    __slots__ = ("text", "pieces", "count", "type")
+
+    def __init__(self, value, type):
+        self.text = value
+        self.pieces = None
+        self.count = 0
+        self.type = type
+
+    @property
+    def value(self):
+        if self.text is None:
+            pieces = self.pieces
+            self.text = "".join(
+                pieces if len(pieces) == self.count else pieces[: self.count]
             )
+            self.pieces = None
+        return self.text
+
+    def added_to(self, other):
+        if isinstance(other, String):
+            pieces = self.pieces
+            if pieces is None or len(pieces) != self.count:
+                text = self.value
+                if len(text) < STRING_PIECE_LENGTH:
+                    return String(text + other.value, TT_STRING_D), None
+                pieces = [text]
+            pieces.append(other.value)
+            return make_rope(pieces), None
         else:
             return None, Value.illegal_operation(self, other)
 
     def multiplied_by(self, other):
         if isinstance(other, Number):
-            return (
-                String(self.value * other.value, TT_STRING_D).set_context(self.context),
-                None,
-            )
+            return String(self.value * other.value, TT_STRING_D), None
         else:
             return None, Value.illegal_operation(self, other)
 
@@ -1767,10 +1722,7 @@ class String(Value):
         return len(self.value) > 0
 
     def copy(self):
-        copy = String(self.value, TT_STRING_D)
-        copy.set_pos(self.pos_start, self.pos_end)
-        copy.set_context(self.context)
-        return copy
+        return String(self.value, TT_STRING_D)
 
     def __repr__(self):
         if self.value == "":
@@ -1781,444 +1733,1889 @@ class String(Value):
             return f'"{self.value}"'
 
 
+# Shorter strings are still joined by every +, which is cheaper than a list
+STRING_PIECE_LENGTH = 256
+
+
+def make_rope(pieces):
+    string = String(None, TT_STRING_D)
+    string.pieces = pieces
+    string.count = len(pieces)
+    return string
+
+
 class BaseFunction(Value):
+    __slots__ = ("name",)
+
     def __init__(self, name):
-        super().__init__()
         self.name = name or "<अज्ञातम्>"
 
-    def generate_new_context(self):
-        new_context = Context(self.name, self.context, self.pos_start)
-        new_context.symbol_table = SymbolTable(new_context.parent.symbol_table)
-        return new_context
-
     def check_args(self, arg_names, args):
         res = RTresult()
         if len(args) > len(arg_names):
             return res.failure(
                 RTError(
-                    self.pos_start,
-                    self.pos_end,
+                    None,
+                    None,
                     f"{len(args) - len(arg_names)} अधिक प्राप्ताः | {len(args) - len(arg_names)} adhik praptaah",
-                    self.context,
+                    None,
                 )
             )
         if len(args) < len(arg_names):
             return res.failure(
                 RTError(
-                    self.pos_start,
-                    self.pos_end,
+                    None,
+                    None,
                     f"{len(arg_names) - len(args)} अभावाः | {len(arg_names) - len(args)} abhavah",
-                    self.context,
+                    None,
                 )
             )
         return res.success(None)
 
-    def populate_args(self, arg_names, args, exec_ctx):
-        for i in range(len(args)):
-            arg_name = arg_names[i]
-            arg_value = args[i]
-            arg_value.set_context(exec_ctx)
-            exec_ctx.symbol_table.set(arg_name, arg_value)
 
-    def check_and_populate_args(self, arg_names, args, exec_ctx):
+class Function(BaseFunction):
+    __slots__ = (
+        "body_node",
+        "arg_names",
+        "should_auto_return",
+        "code",
+        "closure",
+        "pyfunc",
+    )
+
+    def __init__(self, name, body_node, arg_names, should_auto_return):
+        super().__init__(name)
+        self.body_node = body_node
+        self.arg_names = arg_names
+        self.should_auto_return = should_auto_return
+        self.code = None
+        self.closure = None
+        self.pyfunc = None
+
+    def execute(self, args, context, pos_start):
+        arg_names = self.arg_names
+        if len(args) != len(arg_names):
+            return self.check_args(arg_names, args)
+        symbols = dict(zip(arg_names, args))
+        exec_ctx = CallContext(self.name, context, pos_start, symbols)
+        visit = Interpreter.shared.visit
+        if self.should_auto_return:
+            res = visit(self.body_node, exec_ctx)
+            if res.func_return_value is None and res.should_return():
+                return res
+            return res.success(res.value or res.func_return_value or Number.null)
+        # The body's own list value is never used, so run its statements
+        # one by one rather than building it
+        for statement in self.body_node.element_nodes:
+            res = visit(statement, exec_ctx)
+            if res.should_return():
+                if res.func_return_value is None:
+                    return res
+                return res.success(res.func_return_value)
+        return RTresult().success(Number.null)
+
+    def copy(self):
+        copy = Function(
+            self.name, self.body_node, self.arg_names, self.should_auto_return
+        )
+        copy.code = self.code
+        copy.closure = self.closure
+        copy.pyfunc = self.pyfunc
+        return copy
+
+    def __repr__(self):
+        return f"<function {self.name}>"
+
+
+class BuiltinFunction(BaseFunction):
+    __slots__ = ("function",)
+
+    def __init__(self, name):
+        super().__init__(name)
+        # Resolved once, so a call is a single call of the execute_ function
+        self.function = getattr(BuiltinFunction, f"execute_{name}", None)
+
+    def execute(self, args, context, pos_start):
+        function = self.function
+        if function is None:
+            raise Exception(f"No execute_{self.name} method defined")
+        if len(args) != len(function.arg_names):
+            return self.check_args(function.arg_names, args)
+        value, error = function(self, *args)
+        if error:
+            return RTresult().failure(error)
+        return RTresult().success(value)
+
+    def copy(self):
+        return BuiltinFunction(self.name)
+
+    def __repr__(self):
+        return f"<built-in function {self.name}>"
+
+    def execute_print(self, value):
+        print(str(value))
+        return Number.null, None
+
+    execute_print.arg_names = ["value"]
+
+    def execute_print_rt(self, value):
+        return String(str(value), TT_STRING_D), None
+
+    execute_print_rt.arg_names = ["value"]
+
+    def execute_input(self):
+        text = input()
+        return String(text, TT_STRING_D), None
+
+    execute_input.arg_names = []
+
+    def execute_input_int(self):
+        text = input()
+        try:
+            number = int(text)
+        except ValueError:
+            return None, RTError(None, None, "अवैध अंकः | avaidh ankah", None)
+        return make_number(number), None
+
+    execute_input_int.arg_names = []
+
+    def execute_clear(self):
+        os.system("cls" if os.name == "nt" else "clear")
+        return Number.null, None
+
+    execute_clear.arg_names = []
+
+    def execute_is_number(self, value):
+        return (Number.true if isinstance(value, Number) else Number.false), None
+
+    execute_is_number.arg_names = ["value"]
+
+    def execute_is_string(self, value):
+        return (Number.true if isinstance(value, String) else Number.false), None
+
+    execute_is_string.arg_names = ["value"]
+
+    def execute_is_list(self, value):
+        return (Number.true if isinstance(value, List) else Number.false), None
+
+    execute_is_list.arg_names = ["value"]
+
+    def execute_is_function(self, value):
+        is_function = isinstance(value, BaseFunction)
+        return (Number.true if is_function else Number.false), None
+
+    execute_is_function.arg_names = ["value"]
+
+    def execute_append(self, list_, value):
+        if not isinstance(list_, List):
+            return None, RTError(None, None, "अवैध सूची | avaidh suchi", None)
+        list_.elements = list_.elements.appended(value)
+        return Number.null, None
+
+    execute_append.arg_names = ["list", "value"]
+
+    def execute_pop(self, list_, index):
+        if not isinstance(list_, List):
+            return None, RTError(None, None, "अवैध सूची | avaidh suchi", None)
+        if not isinstance(index, Number):
+            return None, RTError(None, None, "अवैध स्थानम् | avaidh sthanam", None)
+        try:
+            element = list_.elements[index.value]
+            list_.elements = list_.elements.removed(index.value)
+        except:
+            return None, RTError(None, None, "अवैध स्थानम् | avaidh sthanam", None)
+        return element, None
+
+    execute_pop.arg_names = ["list", "index"]
+
+    def execute_extend(self, list1, list2):
+        if not isinstance(list1, List) or not isinstance(list2, List):
+            return None, RTError(None, None, "अवैध सूची | avaidh suchi", None)
+        list1.elements = list1.elements.extended(list2.elements)
+        return Number.null, None
+
+    execute_extend.arg_names = ["list1", "list2"]
+
+    def execute_len(self, list_):
+        if not isinstance(list_, List):
+            return None, RTError(None, None, "अवैध सूची | avaidh suchi", None)
+        return make_number(len(list_.elements)), None
+
+    execute_len.arg_names = ["list"]
+
+    def execute_run(self, fn):
+        if not isinstance(fn, String):
+            return None, RTError(None, None, "अवैध स्थानम् | avaidh sthanam", None)
+        try:
+            ast, error = load_module(fn.value)
+        except Exception as e:
+            return None, RTError(None, None, f"अवैध फ़ाइलः {e}", None)
+        if not error:
+            context = Context("<कार्यक्रम> | <karyakram>")
+            context.symbol_table = global_symbol_table
+            _, error = run_ast(ast, context)
+        if error:
+            return None, RTError(None, None, f"अवैध फ़ाइलः {error}", None)
+        return Number.null, None
+
+    execute_run.arg_names = ["fn"]
+
+    def execute_run_cache(self):
+        paths = [String(path, TT_STRING_D) for path in module_cache]
+        return List(paths), None
+
+    execute_run_cache.arg_names = []
+
+    def execute_clear_run_cache(self):
+        count = len(module_cache)
+        module_cache.clear()
+        return make_number(count), None
+
+    execute_clear_run_cache.arg_names = []
+
+    def execute_array(self, list_):
+        if numpy is None:
+            return None, RTError(
+                None, None, "numpy अनुपलब्धम् | numpy anupalabdham", None
+            )
+        array = make_array(list_)
+        if array is None:
+            return None, RTError(None, None, "अवैध सूची | avaidh suchi", None)
+        return array, None
+
+    execute_array.arg_names = ["list"]
+
+    def execute_range(self, start, end):
+        if numpy is None:
+            return None, RTError(
+                None, None, "numpy अनुपलब्धम् | numpy anupalabdham", None
+            )
+        if not isinstance(start, Number) or not isinstance(end, Number):
+            return None, RTError(None, None, "अवैध अंकः | avaidh ankah", None)
+        return Array(numpy.arange(start.value, end.value)), None
+
+    execute_range.arg_names = ["start", "end"]
+
+    def reduce_array(self, list_, name):
+        if numpy is None:
+            return None, RTError(
+                None, None, "numpy अनुपलब्धम् | numpy anupalabdham", None
+            )
+        array = make_array(list_)
+        if array is None or (len(array.array) == 0 and name != "sum"):
+            return None, RTError(None, None, "अवैध सूची | avaidh suchi", None)
+        values = array.array
+        if name == "sum" and values.dtype.kind == "i":
+            if magnitude(values) * len(values) >= ARRAY_INT_BOUND:
+                values = values.astype(object)
+        value = getattr(numpy, name)(values)
+        if isinstance(value, numpy.generic):
+            value = value.item()
+        return make_number(value), None
+
+    def execute_sum(self, list_):
+        return self.reduce_array(list_, "sum")
+
+    execute_sum.arg_names = ["list"]
+
+    def execute_min(self, list_):
+        return self.reduce_array(list_, "min")
+
+    execute_min.arg_names = ["list"]
+
+    def execute_max(self, list_):
+        return self.reduce_array(list_, "max")
+
+    execute_max.arg_names = ["list"]
+
+    def execute_mean(self, list_):
+        return self.reduce_array(list_, "mean")
+
+    execute_mean.arg_names = ["list"]
+
+
+BuiltinFunction.print = BuiltinFunction("print")
+BuiltinFunction.print_rt = BuiltinFunction("print_rt")
+BuiltinFunction.input = BuiltinFunction("input")
+BuiltinFunction.input_int = BuiltinFunction("input_int")
+BuiltinFunction.clear = BuiltinFunction("clear")
+BuiltinFunction.is_number = BuiltinFunction("is_number")
+BuiltinFunction.is_string = BuiltinFunction("is_string")
+BuiltinFunction.is_list = BuiltinFunction("is_list")
+BuiltinFunction.is_function = BuiltinFunction("is_function")
+BuiltinFunction.append = BuiltinFunction("append")
+BuiltinFunction.pop = BuiltinFunction("pop")
+BuiltinFunction.extend = BuiltinFunction("extend")
+BuiltinFunction.len = BuiltinFunction("len")
+BuiltinFunction.run = BuiltinFunction("run")
+BuiltinFunction.run_cache = BuiltinFunction("run_cache")
+BuiltinFunction.clear_run_cache = BuiltinFunction("clear_run_cache")
+BuiltinFunction.array = BuiltinFunction("array")
+BuiltinFunction.range = BuiltinFunction("range")
+BuiltinFunction.sum = BuiltinFunction("sum")
+BuiltinFunction.min = BuiltinFunction("min")
+BuiltinFunction.max = BuiltinFunction("max")
+BuiltinFunction.mean = BuiltinFunction("mean")
+
+# Context
+class Context:
+    __slots__ = ("display_name", "parent", "parent_entry_pos", "symbol_table")
+
+    def __init__(self, display_name, parent=None, parent_entry_pos=None):
+        self.display_name = display_name
+        self.parent = parent
+        self.parent_entry_pos = parent_entry_pos
+        self.symbol_table = None
+
+
+# The context of a user function call, which is also the call's symbol table,
+# so a call allocates one object and the dict of its arguments and variables
+class CallContext(Context):
+    __slots__ = ("symbols", "parent_table")
+
+    def __init__(self, display_name, parent, parent_entry_pos, symbols):
+        self.display_name = display_name
+        self.parent = parent
+        self.parent_entry_pos = parent_entry_pos
+        self.symbols = symbols
+        self.parent_table = parent.symbol_table
+
+    @property
+    def symbol_table(self):
+        return self
+
+    def get(self, name):
+        value = self.symbols.get(name)
+        if value is None:
+            return self.parent_table.get(name)
+        return value
+
+    def set(self, name, value):
+        self.symbols[name] = value
+
+    def remove(self, name):
+        del self.symbols[name]
+
+
+# Symbol Table
+class SymbolTable:
+    __slots__ = ("symbols", "parent")
+
+    def __init__(self, parent=None):
+        self.symbols = {}
+        self.parent = parent
+
+    def get(self, name):
+        value = self.symbols.get(name)
+        if value is None and self.parent:
+            return self.parent.get(name)
+        return value
+
+    def set(self, name, value):
+        self.symbols[name] = value
+
+    def remove(self, name):
+        del self.symbols[name]
+
+
+# Frame
+# The symbol table of a compiled function call. Its locals live in a list at
+# the indexes resolve_locals gave them. Scoping is dynamic, so any other name
+# is still looked up by name through the caller's table.
+class Frame(SymbolTable):
+    __slots__ = ("layout", "slots", "globals")
+
+    def __init__(self, layout, slots, parent):
+        self.symbols = None
+        self.parent = parent
+        self.layout = layout
+        self.slots = slots
+        # The table of the program that made the outermost call
+        self.globals = parent.globals if type(parent) is Frame else parent
+
+    def get(self, name):
+        index = self.layout.get(name)
+        value = self.slots[index] if index is not None else None
+        if value is None and self.symbols:
+            value = self.symbols.get(name)
+        if value is None:
+            return self.parent.get(name)
+        return value
+
+    def set(self, name, value):
+        index = self.layout.get(name)
+        if index is not None:
+            self.slots[index] = value
+            return
+        if self.symbols is None:
+            self.symbols = {}
+        self.symbols[name] = value
+
+    def remove(self, name):
+        index = self.layout.get(name)
+        if index is None:
+            del self.symbols[name]
+        elif self.slots[index] is None:
+            raise KeyError(name)
+        else:
+            self.slots[index] = None
+
+
+# Every name some function keeps in a frame slot or, under the python engine,
+# in its call's table. Only these can be hidden from the program's table by a
+# caller, so any other name skips the callers' tables.
+FRAME_LOCAL_NAMES = set()
+
+
+# Gives each parameter, variable, loop variable and named function assigned in
+# a function body a slot, not counting the bodies of functions defined in it
+def resolve_locals(body_node, arg_names):
+    layout = {}
+    for arg_name in arg_names:
+        layout.setdefault(arg_name, len(layout))
+    stack = [body_node]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, (list, tuple)):
+            stack.extend(item)
+        elif type(item) in NODE_CLASSES:
+            if type(item) in (VarAssignNode, ForNode, FuncDefNode):
+                if item.var_name_tok:
+                    layout.setdefault(item.var_name_tok.value, len(layout))
+            if type(item) is not FuncDefNode:
+                slots = type(item).__slots__
+                stack.extend(getattr(item, name, None) for name in slots)
+    FRAME_LOCAL_NAMES.update(layout)
+    return layout
+
+
+# Loop counters
+# The values a krrite loop's variable takes. Integer bounds count with range,
+# so the loop runs at the speed of a Python for loop. Floats and a zero step
+# are stepped by hand, as loops always have been.
+def loop_counter(start, end, step):
+    if type(start) is int and type(end) is int and type(step) is int and step:
+        return range(start, end, step)
+    return step_counter(start, end, step)
+
+
+def step_counter(i, end, step):
+    if step >= 0:
+        while i < end:
+            yield i
+            i += step
+    else:
+        while i > end:
+            yield i
+            i += step
+
+
+# Interpreter
+class Interpreter:
+    def __init__(self):
+        # Handlers are looked up once per node class instead of once per visit
+        self.handlers = {
+            node_class: getattr(self, f"visit_{node_class.__name__}")
+            for node_class in NODE_CLASSES
+        }
+
+    def visit(self, node, context):
+        handler = self.handlers.get(type(node))
+        if handler is None:
+            method_name = f"visit_{type(node).__name__}"
+            handler = getattr(self, method_name, self.no_visit_method)
+        return handler(node, context)
+
+    def no_visit_method(self, node, context):
+        raise Exception(f"No visit_{type(node).__name__} method defined")
+
+    def visit_ifNode(self, node, context):
         res = RTresult()
-        res.register(self.check_args(arg_names, args))
+        i = 0
+        for condition, expr, should_return_null in node.cases:
+            i += 1
+
+            condition_value = res.register(self.visit(condition, context))
+            if res.should_return():
+                return res
+            if condition_value.is_true():
+                expr_value = res.register(self.visit(expr, context))
+                if res.should_return():
+                    return res
+                return res.success(Number.null if should_return_null else expr_value)
+        if node.else_case:
+            expr, should_return_null = node.else_case
+            else_value = res.register(self.visit(expr, context))
+            if res.should_return():
+                return res
+            return res.success(Number.null if should_return_null else else_value)
+        return res.success(Number.null)
+
+    def visit_ForNode(self, node, context):
+        res = RTresult()
+        elements = []
+        start_value = res.register(self.visit(node.start_value_node, context))
         if res.should_return():
             return res
-        self.populate_args(arg_names, args, exec_ctx)
-        return res.success(None)
+        end_value = res.register(self.visit(node.end_value_node, context))
+        if node.step_value_node:
+            step_value = res.register(self.visit(node.step_value_node, context))
+            if res.should_return():
+                return res
+        else:
+            step_value = make_number(1)
+        counter = loop_counter(start_value.value, end_value.value, step_value.value)
+        # A loop whose value is unused keeps none of its body's values
+        collect = not node.should_return_null
+        symbols = context.symbol_table.symbols
+        var_name = node.var_name_tok.value
+        body_node = node.body_node
+        visit = self.visit
+        if type(self).visit is Interpreter.visit:
+            # Subclasses that override visit see the body through it
+            visit = self.handlers.get(type(body_node)) or visit
+        for i in counter:
+            symbols[var_name] = make_number(i)
+            body = visit(body_node, context)
+            if body.loop_should_continue:
+                continue
+            if body.loop_should_break:
+                break
+            if body.error or body.func_return_value:
+                res.register(body)
+                return res
+            if collect:
+                elements.append(body.value)
+
+        return res.success(List(elements) if collect else Number.null)
+
+    def visit_WhileNode(self, node, context):
+        res = RTresult()
+        elements = []
+        collect = not node.should_return_null
+        while True:
+            condition = res.register(self.visit(node.condition_node, context))
+            if res.should_return():
+                return res
+            if not condition.is_true():
+                break
+            value = res.register(self.visit(node.body_node, context))
+            if (
+                res.should_return()
+                and res.loop_should_continue == False
+                and res.loop_should_break == False
+            ):
+                return res
+            if res.loop_should_continue:
+                continue
+            if res.loop_should_break:
+                break
+            if collect:
+                elements.append(value)
+        return res.success(List(elements) if collect else Number.null)
+
+    def visit_ListNode(self, node, context):
+        res = RTresult()
+        elements = []
+        for element_node in node.element_nodes:
+            elements.append(res.register(self.visit(element_node, context)))
+            if res.should_return():
+                return res
+        return res.success(List(elements))
+
+    def visit_VarAccessNode(self, node, context):
+        res = RTresult()
+        var_name = node.var_name_tok.value
+        value = context.symbol_table.get(var_name)
+
+        if not value:
+            return res.failure(
+                RTError(
+                    node.pos_start,
+                    node.pos_end,
+                    f"'{var_name}' न विवक्षितम् | {var_name} na vivakshitam",
+                    context,
+                )
+            )
+        if type(value) is String and value.type != TT_STRING_D:
+            # Reading a variable always yields a double quoted string
+            value = value.copy()
+        return res.success(value)
+
+    def visit_VarAssignNode(self, node, context):
+        res = RTresult()
+        var_name = node.var_name_tok.value
+        value = res.register(self.visit(node.value_node, context))
+        if res.should_return():
+            return res
+        context.symbol_table.set(var_name, value)
+        return res.success(value)
+
+    def visit_NumberNode(self, node, context):
+        return RTresult().success(node.value)
+
+    def visit_StringNode(self, node, context):
+        return RTresult().success(String(node.tok.value, node.tok.type))
+
+    def visit_BinaryOpNode(self, node, context):
+        res = RTresult()
+        left = res.register(self.visit(node.left_node, context))
+        if res.should_return():
+            return res
+        right = res.register(self.visit(node.right_node, context))
+        if res.should_return():
+            return res
+
+        result, error = None, None
+        if node.op_tok.type == TT_PLUS:
+            result, error = left.added_to(right)
+        elif node.op_tok.type == TT_MINUS:
+            result, error = left.subtracted_from(right)
+        elif node.op_tok.type == TT_MUL:
+            result, error = left.multiplied_by(right)
+        elif node.op_tok.type == TT_DIV:
+            result, error = left.divided_by(right)
+        elif node.op_tok.type == TT_POW:
+            result, error = left.to_power(right)
+        elif node.op_tok.type == TT_EE:
+            result, error = left.get_comp_eq(right)
+        elif node.op_tok.type == TT_NE:
+            result, error = left.get_comp_ne(right)
+        elif node.op_tok.type == TT_LT:
+            result, error = left.get_comp_lt(right)
+        elif node.op_tok.type == TT_GT:
+            result, error = left.get_comp_gt(right)
+        elif node.op_tok.type == TT_LTE:
+            result, error = left.get_comp_lte(right)
+        elif node.op_tok.type == TT_GTE:
+            result, error = left.get_comp_gte(right)
+        elif node.op_tok.matches(TT_KEYWORD, "tatha", "tathA"):
+            result, error = left.anded_by(right)
+        elif node.op_tok.matches(TT_KEYWORD, "va", "vA"):
+            result, error = left.ored_by(right)
+        if error:
+            return res.failure(locate_error(error, node, context))
+        else:
+            return res.success(result)
+
+    def visit_UnaryOpNode(self, node, context):
+        res = RTresult()
+        number = res.register(self.visit(node.node, context))
+        if res.should_return():
+            return res
+        error = None
+        if node.op_tok.type == TT_MINUS:
+            number, error = number.multiplied_by(make_number(-1))
+        elif node.op_tok.matches(TT_KEYWORD, "nahi"):
+            number, error = number.notted()
+        if error:
+            return res.failure(locate_error(error, node, context))
+        else:
+            return res.success(number)
+
+    def visit_FuncDefNode(self, node, context):
+        res = RTresult()
+        func_name = node.var_name_tok.value if node.var_name_tok else None
+        body_node = node.body_node
+        arg_names = [arg_names.value for arg_names in node.arg_name_tok]
+        func_value = Function(func_name, body_node, arg_names, node.should_auto_return)
+        if node.var_name_tok:
+            context.symbol_table.set(func_name, func_value)
+        return res.success(func_value)
+
+    def visit_CallNode(self, node, context):
+        res = RTresult()
+
+        args = []
+        value_to_call = res.register(self.visit(node.node_to_call, context))
+        if res.should_return():
+            return res
+        for arg_node in node.arg_nodes:
+            args.append(res.register(self.visit(arg_node, context)))
+            if res.should_return():
+                return res
+        return_value = res.register(
+            value_to_call.execute(args, context, node.pos_start)
+        )
+        if res.should_return():
+            if res.error:
+                locate_error(res.error, node, context)
+            return res
+        if type(return_value) is String and return_value.type != TT_STRING_D:
+            return_value = return_value.copy()
+        return res.success(return_value)
+
+    def visit_ReturnNode(self, node, context):
+        res = RTresult()
+        if node.node_to_return:
+            value = res.register(self.visit(node.node_to_return, context))
+            if res.should_return():
+                return res
+        else:
+            value = Number.null
+        return res.succes_return(value)
+
+    def visit_ContinueNode(self, node, context):
+        return RTresult().success_continue()
+
+    def visit_BreakNode(self, node, context):
+        return RTresult().success_break()
+
+
+Interpreter.shared = Interpreter()
+Interpreter.untraced = Interpreter.shared
+
+
+# An interpreter that sees every call through its call method. Interpreter
+# itself calls execute inline, because one more Python frame per call slows
+# deep recursion down noticeably.
+class WatchingInterpreter(Interpreter):
+    def visit_CallNode(self, node, context):
+        res = RTresult()
+
+        args = []
+        value_to_call = res.register(self.visit(node.node_to_call, context))
+        if res.should_return():
+            return res
+        for arg_node in node.arg_nodes:
+            args.append(res.register(self.visit(arg_node, context)))
+            if res.should_return():
+                return res
+        return_value = res.register(self.call(value_to_call, args, node, context))
+        if res.should_return():
+            if res.error:
+                locate_error(res.error, node, context)
+            return res
+        if type(return_value) is String and return_value.type != TT_STRING_D:
+            return_value = return_value.copy()
+        return res.success(return_value)
+
+    def call(self, value_to_call, args, node, context):
+        return value_to_call.execute(args, context, node.pos_start)
+
+
+# Profiler
+# Counts and times every call of a SansScript function and every source line
+# the interpreter runs. Inclusive time counts a recursive function or line
+# only once, at its outermost run. Self time leaves out the functions or lines
+# run inside it. Function self times are also kept by call stack, in the
+# folded format flame graph tools read.
+class Profiler:
+    def __init__(self):
+        # Each entry is [count, inclusive seconds, self seconds, active runs]
+        self.functions = {}
+        self.lines = {}
+        self.stacks = {}
+        self.function_stack = []
+        self.line_stack = []
+        self.line_keys = {}
+
+    def run(self, ast, context):
+        interpreter = Interpreter.shared
+        Interpreter.shared = ProfilingInterpreter(self)
+        self.enter(self.functions, self.function_stack, context.display_name)
+        try:
+            result = Interpreter.shared.visit(ast, context)
+        finally:
+            self.leave_function()
+            Interpreter.shared = interpreter
+        return result.value, result.error
+
+    def line_key(self, offset):
+        key = self.line_keys.get(offset)
+        if key is None:
+            key = self.line_keys[offset] = source_map.line(offset)
+        return key
+
+    def enter(self, table, stack, key):
+        entry = table.get(key)
+        if entry is None:
+            entry = table[key] = [0, 0.0, 0.0, 0]
+        entry[3] += 1
+        path = f"{stack[-1][1]};{key}" if stack else key
+        stack.append([entry, path, 0.0, time.perf_counter()])
+
+    def leave(self, stack):
+        entry, path, children, start = stack.pop()
+        elapsed = time.perf_counter() - start
+        entry[0] += 1
+        entry[3] -= 1
+        if entry[3] == 0:
+            entry[1] += elapsed
+        entry[2] += elapsed - children
+        if stack:
+            stack[-1][2] += elapsed
+        return path, elapsed - children
+
+    def leave_function(self):
+        path, self_time = self.leave(self.function_stack)
+        self.stacks[path] = self.stacks.get(path, 0.0) + self_time
+
+    def report(self):
+        lines = [f"{'function':<40} {'calls':>10} {'total ms':>10} {'self ms':>10}"]
+        lines.extend(self.rows(self.functions, str))
+        lines.append("")
+        lines.append(f"{'line':<40} {'hits':>10} {'total ms':>10} {'self ms':>10}")
+        lines.extend(self.rows(self.lines, lambda key: f"{key[0]}:{key[1]}"))
+        return "\n".join(lines)
+
+    def rows(self, table, name):
+        entries = sorted(table.items(), key=lambda item: item[1][2], reverse=True)
+        for key, (count, inclusive, self_time, _) in entries:
+            yield (
+                f"{name(key):<40} {count:>10} {inclusive * 1000:>10.3f}"
+                f" {self_time * 1000:>10.3f}"
+            )
+
+    # Self times are written in whole microseconds
+    def write_folded(self, path):
+        with open(path, "w", encoding="utf8") as f:
+            for stack, self_time in sorted(self.stacks.items()):
+                f.write(f"{stack} {round(self_time * 1e6)}\n")
+
+
+# Opens a line entry whenever a node starts on a different line than the one
+# running. A called function's body always starts a new entry, so every line
+# of a recursive call is counted.
+class ProfilingInterpreter(WatchingInterpreter):
+    def __init__(self, profiler):
+        super().__init__()
+        self.profiler = profiler
+        self.line = None
+
+    def visit(self, node, context):
+        # A block is not a line of its own, its statements are
+        if type(node) is ListNode or node.pos_start is None:
+            return super().visit(node, context)
+        profiler = self.profiler
+        line = profiler.line_key(node.pos_start)
+        if line == self.line:
+            return super().visit(node, context)
+        outer_line = self.line
+        self.line = line
+        profiler.enter(profiler.lines, profiler.line_stack, line)
+        try:
+            return super().visit(node, context)
+        finally:
+            profiler.leave(profiler.line_stack)
+            self.line = outer_line
+
+    def call(self, value_to_call, args, node, context):
+        if type(value_to_call) is not Function:
+            return value_to_call.execute(args, context, node.pos_start)
+        profiler = self.profiler
+        outer_line = self.line
+        self.line = None
+        profiler.enter(profiler.functions, profiler.function_stack, value_to_call.name)
+        try:
+            return value_to_call.execute(args, context, node.pos_start)
+        finally:
+            profiler.leave_function()
+            self.line = outer_line
+
+
+# Tracing
+# A hook set with settrace is called as hook(event, name, position, arg) while
+# the interpreter runs, where name is the running function's name and position
+# is where the event happened, or None if the program has no debug info.
+#   "line"       a node on a new line is about to run, arg is None
+#   "call"       a SansScript function is called, arg is the list of arguments
+#   "return"     the call finished, arg is its value, or None if it failed
+#   "exception"  an error left the running function or program, arg is it
+# Setting a hook swaps Interpreter.shared for a TracingInterpreter, so without
+# one the interpreter runs exactly as before. Only the interpreter is traced,
+# so run_ast refuses the other engines while a hook is set. As with
+# sys.settrace, a hook that raises is removed and its exception propagates.
+def settrace(hook):
+    if hook is None:
+        Interpreter.shared = Interpreter.untraced
+    else:
+        Interpreter.shared = TracingInterpreter(hook)
+
+
+def gettrace():
+    interpreter = Interpreter.shared
+    return interpreter.hook if type(interpreter) is TracingInterpreter else None
+
+
+class TracingInterpreter(WatchingInterpreter):
+    def __init__(self, hook):
+        super().__init__()
+        self.hook = hook
+        self.line = None
+        self.line_keys = {}
+
+    def position(self, pos_start, pos_end):
+        if pos_start is None:
+            return None
+        return source_map.resolve(pos_start, pos_end)[0]
+
+    def report(self, event, name, position, arg):
+        try:
+            self.hook(event, name, position, arg)
+        except BaseException:
+            settrace(None)
+            raise
+
+    def visit(self, node, context):
+        # A block is not a line of its own, its statements are. Once the hook
+        # is unset, a run already under way stops reporting too.
+        offset = node.pos_start
+        if type(node) is ListNode or offset is None or Interpreter.shared is not self:
+            return super().visit(node, context)
+        line = self.line_keys.get(offset)
+        if line is None:
+            line = self.line_keys[offset] = source_map.line(offset)
+        if line == self.line:
+            return super().visit(node, context)
+        outer_line = self.line
+        self.line = line
+        try:
+            self.report("line", context.display_name, self.position(offset, None), None)
+            res = super().visit(node, context)
+        finally:
+            self.line = outer_line
+        # Only the outermost line of a call reports, so an error is reported
+        # once for each function it leaves
+        if res.error and outer_line is None and Interpreter.shared is self:
+            error = res.error
+            if error.pos_start is None:
+                position = self.position(node.pos_start, node.pos_end)
+            else:
+                position = self.position(error.pos_start, error.pos_end)
+            self.report("exception", context.display_name, position, error)
+        return res
+
+    def call(self, value_to_call, args, node, context):
+        if type(value_to_call) is not Function or Interpreter.shared is not self:
+            return value_to_call.execute(args, context, node.pos_start)
+        name = value_to_call.name
+        position = self.position(node.pos_start, node.pos_end)
+        self.report("call", name, position, args)
+        outer_line = self.line
+        self.line = None
+        try:
+            res = value_to_call.execute(args, context, node.pos_start)
+        finally:
+            self.line = outer_line
+        if Interpreter.shared is self:
+            self.report("return", name, position, None if res.error else res.value)
+        return res
 
+# Bytecode
+OP_LOAD_CONST = "LOAD_CONST"
+OP_LOAD_NAME = "LOAD_NAME"
+OP_STORE_NAME = "STORE_NAME"
+OP_DUP = "DUP"
+OP_POP = "POP"
+OP_ADD = "ADD"
+OP_SUB = "SUB"
+OP_MUL = "MUL"
+OP_DIV = "DIV"
+OP_POW = "POW"
+OP_EE = "EE"
+OP_NE = "NE"
+OP_LT = "LT"
+OP_GT = "GT"
+OP_LTE = "LTE"
+OP_GTE = "GTE"
+OP_AND = "AND"
+OP_OR = "OR"
+OP_NEG = "NEG"
+OP_NOT = "NOT"
+OP_JUMP = "JUMP"
+OP_JUMP_IF_FALSE = "JUMP_IF_FALSE"
+OP_JUMP_TRUNC = "JUMP_TRUNC"
+OP_BUILD_LIST = "BUILD_LIST"
+OP_BUILD_ACC = "BUILD_ACC"
+OP_ACC_APPEND = "ACC_APPEND"
+OP_END_ACC = "END_ACC"
+OP_FOR_PREP = "FOR_PREP"
+OP_FOR_ITER = "FOR_ITER"
+OP_MAKE_FUNCTION = "MAKE_FUNCTION"
+OP_CALL = "CALL"
+OP_RETURN = "RETURN"
+OP_EXIT_LOOP = "EXIT_LOOP"
+
+BINARY_OPS = {
+    TT_PLUS: OP_ADD,
+    TT_MINUS: OP_SUB,
+    TT_MUL: OP_MUL,
+    TT_DIV: OP_DIV,
+    TT_POW: OP_POW,
+    TT_EE: OP_EE,
+    TT_NE: OP_NE,
+    TT_LT: OP_LT,
+    TT_GT: OP_GT,
+    TT_LTE: OP_LTE,
+    TT_GTE: OP_GTE,
+}
+
+# Value methods used when an operand is not a Number
+BINARY_OP_METHODS = {
+    OP_ADD: "added_to",
+    OP_SUB: "subtracted_from",
+    OP_MUL: "multiplied_by",
+    OP_DIV: "divided_by",
+    OP_POW: "to_power",
+    OP_EE: "get_comp_eq",
+    OP_NE: "get_comp_ne",
+    OP_LT: "get_comp_lt",
+    OP_GT: "get_comp_gt",
+    OP_LTE: "get_comp_lte",
+    OP_GTE: "get_comp_gte",
+    OP_AND: "anded_by",
+    OP_OR: "ored_by",
+}
+
+# Number-only kernels for the operators without a dedicated fast path
+NUMBER_OPS = {
+    OP_POW: lambda a, b: a**b,
+    OP_NE: lambda a, b: int(a != b),
+    OP_LTE: lambda a, b: int(a <= b),
+    OP_GTE: lambda a, b: int(a >= b),
+    OP_AND: lambda a, b: int(a and b),
+    OP_OR: lambda a, b: int(a or b),
+}
+
+STACK_EFFECTS = {
+    OP_LOAD_CONST: 1,
+    OP_LOAD_NAME: 1,
+    OP_STORE_NAME: -1,
+    OP_DUP: 1,
+    OP_POP: -1,
+    OP_NEG: 0,
+    OP_NOT: 0,
+    OP_JUMP: 0,
+    OP_JUMP_IF_FALSE: -1,
+    OP_JUMP_TRUNC: 0,
+    OP_BUILD_ACC: 1,
+    OP_ACC_APPEND: -1,
+    OP_END_ACC: 0,
+    OP_FOR_PREP: -2,
+    OP_FOR_ITER: 0,
+    OP_MAKE_FUNCTION: 1,
+    OP_RETURN: -1,
+    OP_EXIT_LOOP: 0,
+}
+for op in BINARY_OP_METHODS:
+    STACK_EFFECTS[op] = -1
+
+
+class Code:
+    def __init__(self, name, instructions, handlers):
+        self.name = name
+        self.instructions = instructions
+        # CALL index -> (exit, exit depth, head, head depth) of its loop, for
+        # a virAmaH/anuvartanam that leaves the called function
+        self.handlers = handlers
 
-class Function(BaseFunction):
-    def __init__(self, name, body_node, arg_names, should_auto_return):
-        super().__init__(name)
-        self.body_node = body_node
-        self.arg_names = arg_names
-        self.should_auto_return = should_auto_return
+    def __repr__(self):
+        lines = [f"<code {self.name}>"]
+        for index, (op, arg, _) in enumerate(self.instructions):
+            arg = "" if arg is None else repr(arg)
+            lines.append(f"{index:>5} {op:<14} {arg}")
+        return "\n".join(lines)
 
-    def execute(self, args):
-        res = RTresult()
-        interpreter = Interpreter()
-        exec_ctx = self.generate_new_context()
-        res.register(self.check_and_populate_args(self.arg_names, args, exec_ctx))
-        if res.should_return():
-            return res
-        value = res.register(interpreter.visit(self.body_node, exec_ctx))
-        if res.should_return() and res.func_return_value == None:
-            return res
 
-        ret_value = (
-            (value if self.should_auto_return else None)
-            or res.func_return_value
-            or Number.null
-        )
-        return res.success(ret_value)
+class RTErrorSignal(Exception):
+    def __init__(self, error):
+        super().__init__(error.details)
+        self.error = error
 
-    def copy(self):
-        copy = Function(
-            self.name, self.body_node, self.arg_names, self.should_auto_return
-        )
-        copy.set_context(self.context)
-        copy.set_pos(self.pos_start, self.pos_end)
-        return copy
 
-    def __repr__(self):
-        return f"<function {self.name}>"
+class ReturnSignal(Exception):
+    def __init__(self, value):
+        super().__init__()
+        self.value = value
 
 
-class BuiltinFunction(BaseFunction):
-    def __init__(self, name):
-        super().__init__(name)
+class BreakSignal(Exception):
+    pass
 
-    def execute(self, args):
-        res = RTresult()
-        exec_ctx = self.generate_new_context()
-        method_name = f"execute_{self.name}"
-        method = getattr(self, method_name, self.no_visit_method)
-        res.register(self.check_and_populate_args(method.arg_names, args, exec_ctx))
-        if res.should_return():
-            return res
 
-        return_value = res.register(method(exec_ctx))
-        if res.should_return():
-            return res
-        return res.success(return_value)
+class ContinueSignal(Exception):
+    pass
 
-    def no_visit_method(self, args, exec_ctx):
-        raise Exception(f"No execute_{self.name} method defined")
 
-    def copy(self):
-        copy = BuiltinFunction(self.name)
-        copy.set_context(self.context)
-        copy.set_pos(self.pos_start, self.pos_end)
-        return copy
+# Slow paths shared by the compiled engines. Errors are placed on the node
+# being run so they match the ones the Interpreter reports.
+def binary_op(op, left, right, node, context):
+    return check(getattr(left, BINARY_OP_METHODS[op])(right), node, context)
 
-    def __repr__(self):
-        return f"<built-in function {self.name}>"
 
-    def execute_print(self, exec_ctx):
-        print(str(exec_ctx.symbol_table.get("value")))
-        return RTresult().success(Number.null)
+def check(result, node, context):
+    value, error = result
+    if error:
+        raise RTErrorSignal(locate_error(error, node, context))
+    return value
+
+
+def check_arity(arg_names, args, node, context):
+    if len(args) > len(arg_names):
+        count = len(args) - len(arg_names)
+        details = f"{count} अधिक प्राप्ताः | {count} adhik praptaah"
+    elif len(args) < len(arg_names):
+        count = len(arg_names) - len(args)
+        details = f"{count} अभावाः | {count} abhavah"
+    else:
+        return
+    raise RTErrorSignal(RTError(node.pos_start, node.pos_end, details, context))
+
+
+def call_value(value_to_call, args, node, context):
+    if type(value_to_call) is BuiltinFunction and value_to_call.function:
+        function = value_to_call.function
+        if len(args) != len(function.arg_names):
+            check_arity(function.arg_names, args, node, context)
+        return check(function(value_to_call, *args), node, context)
+    res = value_to_call.execute(args, context, node.pos_start)
+    if res.error:
+        raise RTErrorSignal(locate_error(res.error, node, context))
+    return res.value
+
+
+# Signal Interpreter
+# Walks the same tree as Interpreter, but visit methods return plain values.
+# Errors, returns, breaks and continues are raised as signals instead of
+# being threaded through an RTresult at every node.
+class SignalInterpreter:
+    def __init__(self):
+        self.handlers = {
+            node_class: getattr(self, f"visit_{node_class.__name__}")
+            for node_class in NODE_CLASSES
+        }
 
-    execute_print.arg_names = ["value"]
+    def run(self, node, context):
+        try:
+            return self.visit(node, context), None
+        except RTErrorSignal as signal:
+            return None, signal.error
+        except (ReturnSignal, BreakSignal, ContinueSignal):
+            return None, None
 
-    def execute_print_rt(self, exec_ctx):
-        return RTresult().success(
-            String(str(exec_ctx.symbol_table.get("value")), TT_STRING_D)
-        )
+    def visit(self, node, context):
+        handler = self.handlers.get(type(node))
+        if handler is None:
+            method_name = f"visit_{type(node).__name__}"
+            handler = getattr(self, method_name, self.no_visit_method)
+        return handler(node, context)
 
-    execute_print_rt.arg_names = ["value"]
+    def no_visit_method(self, node, context):
+        raise Exception(f"No visit_{type(node).__name__} method defined")
 
-    def execute_input(self, exec_ctx):
-        text = input()
-        return RTresult().success(String(text, TT_STRING_D))
+    def visit_ifNode(self, node, context):
+        for condition, expr, should_return_null in node.cases:
+            if self.visit(condition, context).is_true():
+                expr_value = self.visit(expr, context)
+                return Number.null if should_return_null else expr_value
+        if node.else_case:
+            expr, should_return_null = node.else_case
+            else_value = self.visit(expr, context)
+            return Number.null if should_return_null else else_value
+        return Number.null
 
-    execute_input.arg_names = []
+    def visit_ForNode(self, node, context):
+        elements = []
+        start_value = self.visit(node.start_value_node, context)
+        end_value = self.visit(node.end_value_node, context)
+        if node.step_value_node:
+            step_value = self.visit(node.step_value_node, context)
+        else:
+            step_value = make_number(1)
+        counter = loop_counter(start_value.value, end_value.value, step_value.value)
+        var_name = node.var_name_tok.value
+        symbols = context.symbol_table.symbols
+        visit = self.visit
+        body_node = node.body_node
+        collect = not node.should_return_null
+        for i in counter:
+            symbols[var_name] = make_number(i)
+            try:
+                value = visit(body_node, context)
+            except ContinueSignal:
+                continue
+            except BreakSignal:
+                break
+            if collect:
+                elements.append(value)
+        return List(elements) if collect else Number.null
 
-    def execute_input_int(self, exec_ctx):
-        text = input()
-        while True:
+    def visit_WhileNode(self, node, context):
+        elements = []
+        visit = self.visit
+        condition_node = node.condition_node
+        body_node = node.body_node
+        collect = not node.should_return_null
+        while visit(condition_node, context).is_true():
             try:
-                number = int(text)
+                value = visit(body_node, context)
+            except ContinueSignal:
+                continue
+            except BreakSignal:
                 break
-            except ValueError:
-                return RTresult().failure(
-                    RTError(
-                        self.pos_start,
-                        self.pos_end,
-                        "अवैध अंकः | avaidh ankah",
-                        self.context,
-                    )
+            if collect:
+                elements.append(value)
+        return List(elements) if collect else Number.null
+
+    def visit_ListNode(self, node, context):
+        elements = [
+            self.visit(element_node, context) for element_node in node.element_nodes
+        ]
+        return List(elements)
+
+    def visit_VarAccessNode(self, node, context):
+        var_name = node.var_name_tok.value
+        value = context.symbol_table.get(var_name)
+        if not value:
+            raise RTErrorSignal(
+                RTError(
+                    node.pos_start,
+                    node.pos_end,
+                    f"'{var_name}' न विवक्षितम् | {var_name} na vivakshitam",
+                    context,
                 )
-        return RTresult().success(Number(number))
+            )
+        if type(value) is String and value.type != TT_STRING_D:
+            # Reading a variable always yields a double quoted string
+            return value.copy()
+        return value
 
-    execute_input_int.arg_names = []
+    def visit_VarAssignNode(self, node, context):
+        value = self.visit(node.value_node, context)
+        context.symbol_table.set(node.var_name_tok.value, value)
+        return value
 
-    def execute_clear(self, exec_ctx):
-        os.system("cls" if os.name == "nt" else "clear")
-        return RTresult().success(Number.null)
+    def visit_NumberNode(self, node, context):
+        return node.value
 
-    execute_clear.arg_names = []
+    def visit_StringNode(self, node, context):
+        return String(node.tok.value, node.tok.type)
 
-    def execute_is_number(self, exec_ctx):
-        is_number = isinstance(exec_ctx.symbol_table.get("value"), Number)
-        return RTresult().success(Number(int(is_number)))
+    def visit_BinaryOpNode(self, node, context):
+        left = self.visit(node.left_node, context)
+        right = self.visit(node.right_node, context)
+        op_tok = node.op_tok
+        if op_tok.type == TT_KEYWORD:
+            op = OP_AND if op_tok.value in ("tatha", "tathA") else OP_OR
+        else:
+            op = BINARY_OPS[op_tok.type]
+        return check(getattr(left, BINARY_OP_METHODS[op])(right), node, context)
 
-    execute_is_number.arg_names = ["value"]
+    def visit_UnaryOpNode(self, node, context):
+        number = self.visit(node.node, context)
+        if node.op_tok.type == TT_MINUS:
+            number = check(number.multiplied_by(make_number(-1)), node, context)
+        elif node.op_tok.matches(TT_KEYWORD, "nahi"):
+            number = check(number.notted(), node, context)
+        return number
 
-    def execute_is_string(self, exec_ctx):
-        is_string = isinstance(exec_ctx.symbol_table.get("value"), String)
-        return RTresult().success(Number(int(is_string)))
+    def visit_FuncDefNode(self, node, context):
+        func_name = node.var_name_tok.value if node.var_name_tok else None
+        arg_names = [arg_name.value for arg_name in node.arg_name_tok]
+        func_value = Function(
+            func_name, node.body_node, arg_names, node.should_auto_return
+        )
+        if node.var_name_tok:
+            context.symbol_table.set(func_name, func_value)
+        return func_value
 
-    execute_is_string.arg_names = ["value"]
+    def visit_CallNode(self, node, context):
+        value_to_call = self.visit(node.node_to_call, context)
+        args = [self.visit(arg_node, context) for arg_node in node.arg_nodes]
+        if type(value_to_call) is Function:
+            return_value = self.call_function(value_to_call, args, node, context)
+        else:
+            return_value = call_value(value_to_call, args, node, context)
+        if type(return_value) is String and return_value.type != TT_STRING_D:
+            return return_value.copy()
+        return return_value
+
+    def call_function(self, function, args, node, context):
+        arg_names = function.arg_names
+        if len(args) != len(arg_names):
+            check_arity(arg_names, args, node, context)
+        symbols = dict(zip(arg_names, args))
+        exec_ctx = CallContext(function.name, context, node.pos_start, symbols)
+        body_node = function.body_node
+        try:
+            if function.should_auto_return:
+                return self.visit(body_node, exec_ctx)
+            # The body's own list value is never used, and a return at its top
+            # level can hand back its value without raising
+            for statement in body_node.element_nodes:
+                if type(statement) is ReturnNode:
+                    if statement.node_to_return:
+                        return self.visit(statement.node_to_return, exec_ctx)
+                    return Number.null
+                self.visit(statement, exec_ctx)
+        except ReturnSignal as signal:
+            return signal.value
+        return Number.null
 
-    def execute_is_list(self, exec_ctx):
-        is_list = isinstance(exec_ctx.symbol_table.get("value"), List)
-        return RTresult().success(Number(int(is_list)))
+    def visit_ReturnNode(self, node, context):
+        if node.node_to_return:
+            raise ReturnSignal(self.visit(node.node_to_return, context))
+        raise ReturnSignal(Number.null)
 
-    execute_is_list.arg_names = ["value"]
+    def visit_ContinueNode(self, node, context):
+        raise ContinueSignal()
 
-    def execute_is_function(self, exec_ctx):
-        is_function = isinstance(exec_ctx.symbol_table.get("value"), BaseFunction)
-        return RTresult().success(Number(int(is_function)))
+    def visit_BreakNode(self, node, context):
+        raise BreakSignal()
 
-    execute_is_function.arg_names = ["value"]
 
-    def execute_append(self, exec_ctx):
-        list_ = exec_ctx.symbol_table.get("list")
-        value = exec_ctx.symbol_table.get("value")
-        if not isinstance(list_, List):
-            return RTresult().failure(
-                RTError(
-                    self.pos_start, self.pos_end, "अवैध सूची | avaidh suchi", self.context
-                )
-            )
-        list_.elements.append(value)
-        return RTresult().success(Number.null)
+SignalInterpreter.shared = SignalInterpreter()
 
-    execute_append.arg_names = ["list", "value"]
 
-    def execute_pop(self, exec_ctx):
-        list_ = exec_ctx.symbol_table.get("list")
-        index = exec_ctx.symbol_table.get("index")
-        if not isinstance(list_, List):
-            return RTresult().failure(
-                RTError(
-                    self.pos_start, self.pos_end, "अवैध सूची | avaidh suchi", self.context
-                )
-            )
-        if not isinstance(index, Number):
-            return RTresult().failure(
-                RTError(
-                    self.pos_start,
-                    self.pos_end,
-                    "अवैध स्थानम् | avaidh sthanam",
-                    self.context,
-                )
-            )
-        try:
-            element = list_.elements.pop(index.value)
-        except:
-            return RTresult().failure(
-                RTError(
-                    self.pos_start,
-                    self.pos_end,
-                    "अवैध स्थानम् | avaidh sthanam",
-                    self.context,
-                )
-            )
-        return RTresult().success(element)
+# Compiler
+class Compiler:
+    def __init__(self, in_function=False):
+        self.instructions = []
+        self.depth = 0
+        self.loops = []
+        self.handlers = {}
+        self.in_function = in_function
 
-    execute_pop.arg_names = ["list", "index"]
+    def compile_program(self, node):
+        self.compile(node, True)
+        self.emit(OP_RETURN)
+        return Code("<कार्यक्रम> | <karyakram>", self.instructions, self.handlers)
 
-    def execute_extend(self, exec_ctx):
-        list1 = exec_ctx.symbol_table.get("list1")
-        list2 = exec_ctx.symbol_table.get("list2")
-        if not isinstance(list1, List) or not isinstance(list2, List):
-            return RTresult().failure(
-                RTError(
-                    self.pos_start, self.pos_end, "अवैध सूची | avaidh suchi", self.context
-                )
-            )
-        list1.elements.extend(list2.elements)
-        return RTresult().success(Number.null)
+    def compile_function(self, name, body_node, should_auto_return):
+        if should_auto_return:
+            self.compile(body_node, True)
+        else:
+            self.compile(body_node, False)
+            self.emit(OP_LOAD_CONST, Number.null)
+        self.emit(OP_RETURN)
+        return Code(name, self.instructions, self.handlers)
+
+    def emit(self, op, arg=None, node=None):
+        if op == OP_BUILD_LIST:
+            self.depth += 1 - arg
+        elif op == OP_CALL:
+            self.depth -= arg
+        else:
+            self.depth += STACK_EFFECTS[op]
+        self.instructions.append((op, arg, node))
+        return len(self.instructions) - 1
+
+    def patch(self, index, target=None):
+        op, arg, node = self.instructions[index]
+        if target is None:
+            target = len(self.instructions)
+        if op == OP_JUMP_TRUNC:
+            arg = (target, arg[1])
+        elif op == OP_FOR_ITER:
+            arg = (arg[0], target)
+        else:
+            arg = target
+        self.instructions[index] = (op, arg, node)
 
-    execute_extend.arg_names = ["list1", "list2"]
-    def execute_run(self,exec_ctx):
-        list_ = exec_ctx.symbol_table.get("list")
-        if not isinstance(list_, List):
-            return RTresult().failure(
-                RTError(self.pos_start, self.pos_end, "अवैध सूची | avaidh suchi", self.context)
-            )
-        return RTresult().success(Number(len(list_.elements)))
-    execute_run.arg_names = ["list"]
-    def execute_run(self,exec_ctx):
-        fn = exec_ctx.symbol_table.get("fn")
-        if not isinstance(fn, String):
-            return RTresult().failure(
-                RTError(self.pos_start, self.pos_end, "अवैध स्थानम् | avaidh sthanam", self.context)
-            )
-        fn = fn.value
-        try:
-            with open(fn, "r",encoding= 'utf8') as f:
-                script = f.read()
-        except Exception as e:
-            return RTresult().failure(
-                RTError(self.pos_start, self.pos_end, f"अवैध फ़ाइलः {e}", self.context)
-            )
-        _ , error = Run(script,fn)
-        if error:
-            return RTresult().failure(
-                RTError(self.pos_start, self.pos_end, f"अवैध फ़ाइलः {error}", self.context)
-            )
-        return RTresult().success(Number.null)
-    execute_run.arg_names = ["fn"]
+    def compile(self, node, want_value):
+        method_name = f"compile_{type(node).__name__}"
+        method = getattr(self, method_name, self.no_compile_method)
+        method(node, want_value)
 
+    def no_compile_method(self, node, want_value):
+        raise Exception(f"No compile_{type(node).__name__} method defined")
 
-BuiltinFunction.print = BuiltinFunction("print")
-BuiltinFunction.print_rt = BuiltinFunction("print_rt")
-BuiltinFunction.input = BuiltinFunction("input")
-BuiltinFunction.input_int = BuiltinFunction("input_int")
-BuiltinFunction.clear = BuiltinFunction("clear")
-BuiltinFunction.is_number = BuiltinFunction("is_number")
-BuiltinFunction.is_string = BuiltinFunction("is_string")
-BuiltinFunction.is_list = BuiltinFunction("is_list")
-BuiltinFunction.is_function = BuiltinFunction("is_function")
-BuiltinFunction.append = BuiltinFunction("append")
-BuiltinFunction.pop = BuiltinFunction("pop")
-BuiltinFunction.extend = BuiltinFunction("extend")
-BuiltinFunction.len = BuiltinFunction("len")
-BuiltinFunction.run = BuiltinFunction("run")
+    def compile_NumberNode(self, node, want_value):
+        if want_value:
+            self.emit(OP_LOAD_CONST, node.value, node)
 
-# Context
-class Context:
-    def __init__(self, display_name, parent=None, parent_entry_pos=None):
-        self.display_name = display_name
-        self.parent = parent
-        self.parent_entry_pos = parent_entry_pos
-        self.symbol_table = None
+    def compile_StringNode(self, node, want_value):
+        if want_value:
+            value = String(node.tok.value, node.tok.type)
+            self.emit(OP_LOAD_CONST, value, node)
 
+    def compile_ListNode(self, node, want_value):
+        for element_node in node.element_nodes:
+            self.compile(element_node, want_value)
+        if want_value:
+            self.emit(OP_BUILD_LIST, len(node.element_nodes), node)
+
+    def compile_VarAccessNode(self, node, want_value):
+        self.emit(OP_LOAD_NAME, node.var_name_tok.value, node)
+        if not want_value:
+            self.emit(OP_POP)
+
+    def compile_VarAssignNode(self, node, want_value):
+        self.compile(node.value_node, True)
+        if want_value:
+            self.emit(OP_DUP)
+        self.emit(OP_STORE_NAME, node.var_name_tok.value, node)
+
+    def compile_BinaryOpNode(self, node, want_value):
+        self.compile(node.left_node, True)
+        self.compile(node.right_node, True)
+        op_tok = node.op_tok
+        if op_tok.matches(TT_KEYWORD, "tatha", "tathA"):
+            op = OP_AND
+        elif op_tok.matches(TT_KEYWORD, "va", "vA"):
+            op = OP_OR
+        else:
+            op = BINARY_OPS[op_tok.type]
+        self.emit(op, None, node)
+        if not want_value:
+            self.emit(OP_POP)
 
-# Symbol Table
-class SymbolTable:
-    def __init__(self, parent=None):
-        self.symbols = {}
-        self.parent = parent
+    def compile_UnaryOpNode(self, node, want_value):
+        self.compile(node.node, True)
+        if node.op_tok.type == TT_MINUS:
+            self.emit(OP_NEG, None, node)
+        elif node.op_tok.matches(TT_KEYWORD, "nahi"):
+            self.emit(OP_NOT, None, node)
+        if not want_value:
+            self.emit(OP_POP)
 
-    def get(self, name):
-        value = self.symbols.get(name, None)
-        if value == None and self.parent:
-            return self.parent.get(name)
-        return value
+    def compile_ifNode(self, node, want_value):
+        end_jumps = []
+        base_depth = self.depth
+        for condition, expr, should_return_null in node.cases:
+            self.compile(condition, True)
+            next_jump = self.emit(OP_JUMP_IF_FALSE, None, condition)
+            self.compile_branch(expr, should_return_null, want_value)
+            end_jumps.append(self.emit(OP_JUMP))
+            self.patch(next_jump)
+            self.depth = base_depth
+        if node.else_case:
+            expr, should_return_null = node.else_case
+            self.compile_branch(expr, should_return_null, want_value)
+        elif want_value:
+            self.emit(OP_LOAD_CONST, Number.null)
+        for index in end_jumps:
+            self.patch(index)
+
+    def compile_branch(self, expr, should_return_null, want_value):
+        if should_return_null:
+            self.compile(expr, False)
+            if want_value:
+                self.emit(OP_LOAD_CONST, Number.null)
+        else:
+            self.compile(expr, want_value)
+
+    def compile_ForNode(self, node, want_value):
+        collect = want_value and not node.should_return_null
+        if collect:
+            self.emit(OP_BUILD_ACC)
+        self.compile(node.start_value_node, True)
+        self.compile(node.end_value_node, True)
+        if node.step_value_node:
+            self.compile(node.step_value_node, True)
+        else:
+            self.emit(OP_LOAD_CONST, make_number(1))
+        self.emit(OP_FOR_PREP)
+        head = len(self.instructions)
+        head_depth = self.depth
+        loop_exit = self.emit(OP_FOR_ITER, (node.var_name_tok.value, None), node)
+        self.loops.append((head, head_depth, head_depth - 1, [loop_exit], []))
+        self.compile(node.body_node, collect)
+        if collect:
+            self.emit(OP_ACC_APPEND, 2)
+        self.emit(OP_JUMP, head)
+        self.end_loop(node, want_value, collect, head_depth - 1)
+
+    def compile_WhileNode(self, node, want_value):
+        collect = want_value and not node.should_return_null
+        if collect:
+            self.emit(OP_BUILD_ACC)
+        head = len(self.instructions)
+        head_depth = self.depth
+        self.compile(node.condition_node, True)
+        loop_exit = self.emit(OP_JUMP_IF_FALSE, None, node.condition_node)
+        self.loops.append((head, head_depth, head_depth, [loop_exit], []))
+        self.compile(node.body_node, collect)
+        if collect:
+            self.emit(OP_ACC_APPEND, 1)
+        self.emit(OP_JUMP, head)
+        self.end_loop(node, want_value, collect, head_depth)
+
+    def end_loop(self, node, want_value, collect, exit_depth):
+        head, head_depth, break_depth, exits, calls = self.loops.pop()
+        for index in exits:
+            self.patch(index)
+        target = len(self.instructions)
+        for index in calls:
+            self.handlers[index] = (target, break_depth, head, head_depth)
+        self.depth = exit_depth
+        if collect:
+            self.emit(OP_END_ACC, None, node)
+        elif want_value:
+            self.emit(OP_LOAD_CONST, Number.null)
+
+    def compile_BreakNode(self, node, want_value):
+        if not self.loops:
+            return self.compile_stray_exit(BreakSignal, want_value)
+        _, _, break_depth, exits, _ = self.loops[-1]
+        exits.append(self.emit(OP_JUMP_TRUNC, (None, break_depth)))
+        if want_value:
+            self.depth += 1
+
+    def compile_ContinueNode(self, node, want_value):
+        if not self.loops:
+            return self.compile_stray_exit(ContinueSignal, want_value)
+        head, head_depth, _, _, _ = self.loops[-1]
+        self.emit(OP_JUMP_TRUNC, (head, head_depth))
+        if want_value:
+            self.depth += 1
+
+    def compile_stray_exit(self, signal, want_value):
+        if self.in_function:
+            # Outside of a loop it ends the loop around the call instead
+            self.emit(OP_EXIT_LOOP, signal)
+        else:
+            # A virAmaH/anuvartanam outside of a loop ends the program
+            self.emit(OP_LOAD_CONST, None)
+            self.emit(OP_RETURN)
+        if want_value:
+            self.depth += 1
 
-    def set(self, name, value):
-        self.symbols[name] = value
+    def compile_ReturnNode(self, node, want_value):
+        if node.node_to_return:
+            self.compile(node.node_to_return, True)
+        else:
+            self.emit(OP_LOAD_CONST, Number.null)
+        if not self.in_function:
+            # The interpreter yields no program value after a top level return
+            self.emit(OP_POP)
+            self.emit(OP_LOAD_CONST, None)
+        self.emit(OP_RETURN)
+        if want_value:
+            self.depth += 1
+
+    def compile_FuncDefNode(self, node, want_value):
+        func_name = node.var_name_tok.value if node.var_name_tok else None
+        arg_names = [arg_name.value for arg_name in node.arg_name_tok]
+        code = Compiler(True).compile_function(
+            func_name or "<अज्ञातम्>", node.body_node, node.should_auto_return
+        )
+        self.emit(
+            OP_MAKE_FUNCTION,
+            (func_name, arg_names, node.should_auto_return, code),
+            node,
+        )
+        if func_name:
+            self.emit(OP_DUP)
+            self.emit(OP_STORE_NAME, func_name, node)
+        if not want_value:
+            self.emit(OP_POP)
+
+    def compile_CallNode(self, node, want_value):
+        self.compile(node.node_to_call, True)
+        for arg_node in node.arg_nodes:
+            self.compile(arg_node, True)
+        index = self.emit(OP_CALL, len(node.arg_nodes), node)
+        if self.loops:
+            self.loops[-1][4].append(index)
+        if not want_value:
+            self.emit(OP_POP)
 
-    def remove(self, name):
-        del self.symbols[name]
+
+# VM
+class VM:
+    def run(self, code, context):
+        try:
+            return self.execute(code, context), None
+        except RTErrorSignal as signal:
+            return None, signal.error
+        except (BreakSignal, ContinueSignal):
+            # The interpreter yields no program value when these escape
+            return None, None
+
+    def execute(self, code, context):
+        instructions = code.instructions
+        table = context.symbol_table
+        symbols = table.symbols
+        stack = []
+        push = stack.append
+        pop = stack.pop
+        pc = 0
+        while True:
+            op, arg, node = instructions[pc]
+            pc += 1
+            if op == OP_LOAD_NAME:
+                value = symbols.get(arg)
+                if value is None:
+                    value = table.get(arg)
+                    if value is None:
+                        raise RTErrorSignal(
+                            RTError(
+                                node.pos_start,
+                                node.pos_end,
+                                f"'{arg}' न विवक्षितम् | {arg} na vivakshitam",
+                                context,
+                            )
+                        )
+                if type(value) is String and value.type != TT_STRING_D:
+                    # Reading a variable always yields a double quoted string
+                    value = value.copy()
+                push(value)
+            elif op == OP_LOAD_CONST:
+                push(arg)
+            elif op == OP_STORE_NAME:
+                symbols[arg] = pop()
+            elif op == OP_FOR_ITER:
+                i = next(stack[-1], None)
+                if i is not None:
+                    symbols[arg[0]] = make_number(i)
+                else:
+                    pop()
+                    pc = arg[1]
+            elif op == OP_JUMP:
+                pc = arg
+            elif op == OP_JUMP_IF_FALSE:
+                value = pop()
+                if type(value) is Number:
+                    if value.value == 0:
+                        pc = arg
+                elif not value.is_true():
+                    pc = arg
+            elif op == OP_POP:
+                pop()
+            elif op == OP_DUP:
+                push(stack[-1])
+            elif op == OP_ADD:
+                right = pop()
+                left = stack[-1]
+                if type(left) is Number and type(right) is Number:
+                    stack[-1] = make_number(left.value + right.value)
+                else:
+                    stack[-1] = binary_op(op, left, right, node, context)
+            elif op == OP_SUB:
+                right = pop()
+                left = stack[-1]
+                if type(left) is Number and type(right) is Number:
+                    stack[-1] = make_number(left.value - right.value)
+                else:
+                    stack[-1] = binary_op(op, left, right, node, context)
+            elif op == OP_MUL:
+                right = pop()
+                left = stack[-1]
+                if type(left) is Number and type(right) is Number:
+                    stack[-1] = make_number(left.value * right.value)
+                else:
+                    stack[-1] = binary_op(op, left, right, node, context)
+            elif op == OP_DIV:
+                right = pop()
+                left = stack[-1]
+                if type(left) is Number and type(right) is Number:
+                    if right.value == 0:
+                        raise RTErrorSignal(
+                            RTError(
+                                node.right_node.pos_start,
+                                node.right_node.pos_end,
+                                "शून्येन विभागः | shunyen vibhagah",
+                                context,
+                            )
+                        )
+                    stack[-1] = make_number(left.value / right.value)
+                else:
+                    stack[-1] = binary_op(op, left, right, node, context)
+            elif op == OP_LT:
+                right = pop()
+                left = stack[-1]
+                if type(left) is Number and type(right) is Number:
+                    stack[-1] = (
+                        Number.true if left.value < right.value else Number.false
+                    )
+                else:
+                    stack[-1] = binary_op(op, left, right, node, context)
+            elif op == OP_GT:
+                right = pop()
+                left = stack[-1]
+                if type(left) is Number and type(right) is Number:
+                    stack[-1] = (
+                        Number.true if left.value > right.value else Number.false
+                    )
+                else:
+                    stack[-1] = binary_op(op, left, right, node, context)
+            elif op == OP_EE:
+                right = pop()
+                left = stack[-1]
+                if type(left) is Number and type(right) is Number:
+                    stack[-1] = (
+                        Number.true if left.value == right.value else Number.false
+                    )
+                else:
+                    stack[-1] = binary_op(op, left, right, node, context)
+            elif op == OP_CALL:
+                args = stack[len(stack) - arg :]
+                del stack[len(stack) - arg :]
+                try:
+                    stack[-1] = self.call(stack[-1], args, node, context)
+                except (BreakSignal, ContinueSignal) as signal:
+                    handler = code.handlers.get(pc - 1)
+                    if handler is None:
+                        raise
+                    if type(signal) is BreakSignal:
+                        del stack[handler[1] :]
+                        pc = handler[0]
+                    else:
+                        del stack[handler[3] :]
+                        pc = handler[2]
+            elif op == OP_RETURN:
+                return pop()
+            elif op == OP_JUMP_TRUNC:
+                del stack[arg[1] :]
+                pc = arg[0]
+            elif op == OP_ACC_APPEND:
+                value = pop()
+                stack[-arg].append(value)
+            elif op == OP_FOR_PREP:
+                step_value = pop()
+                end_value = pop()
+                start_value = pop()
+                counter = loop_counter(
+                    start_value.value, end_value.value, step_value.value
+                )
+                push(iter(counter))
+            elif op == OP_BUILD_ACC:
+                push([])
+            elif op == OP_END_ACC:
+                stack[-1] = List(stack[-1])
+            elif op == OP_NEG:
+                value = stack[-1]
+                if type(value) is Number:
+                    stack[-1] = make_number(-value.value)
+                else:
+                    negated = value.multiplied_by(make_number(-1))
+                    stack[-1] = check(negated, node, context)
+            elif op == OP_NOT:
+                value = stack[-1]
+                if type(value) is Number:
+                    stack[-1] = Number.true if value.value == 0 else Number.false
+                else:
+                    stack[-1] = check(value.notted(), node, context)
+            elif op == OP_BUILD_LIST:
+                elements = stack[len(stack) - arg :]
+                del stack[len(stack) - arg :]
+                push(List(elements))
+            elif op == OP_MAKE_FUNCTION:
+                func_name, arg_names, should_auto_return, func_code = arg
+                func_value = Function(
+                    func_name, node.body_node, arg_names, should_auto_return
+                )
+                func_value.code = func_code
+                push(func_value)
+            elif op == OP_EXIT_LOOP:
+                raise arg()
+            else:
+                right = pop()
+                left = stack[-1]
+                if type(left) is Number and type(right) is Number:
+                    stack[-1] = make_number(NUMBER_OPS[op](left.value, right.value))
+                else:
+                    stack[-1] = binary_op(op, left, right, node, context)
+
+    def call(self, value_to_call, args, node, context):
+        if type(value_to_call) is not Function:
+            return call_value(value_to_call, args, node, context)
+        arg_names = value_to_call.arg_names
+        if len(args) != len(arg_names):
+            check_arity(arg_names, args, node, context)
+        if value_to_call.code is None:
+            value_to_call.code = Compiler(True).compile_function(
+                value_to_call.name,
+                value_to_call.body_node,
+                value_to_call.should_auto_return,
+            )
+        symbols = dict(zip(arg_names, args))
+        exec_ctx = CallContext(value_to_call.name, context, node.pos_start, symbols)
+        return self.execute(value_to_call.code, exec_ctx)
 
 
-# Interpreter
-class Interpreter:
-    def visit(self, node, context):
-        method_name = f"visit_{type(node).__name__}"
-        method = getattr(self, method_name, self.no_visit_method)
-        return method(node, context)
+# Closure compiler
+# Inside a function body, locals are read and written by slot index in the
+# call's Frame. Top level code keeps its variables in the program's table.
+class ClosureCompiler:
+    def __init__(self):
+        self.layout = None
 
-    def no_visit_method(self, node, context):
-        raise Exception(f"No visit_{type(node).__name__} method defined")
+    def compile_program(self, node):
+        body = self.compile(node, True)
 
-    def visit_ifNode(self, node, context):
-        res = RTresult()
-        i = 0
-        for condition, expr, should_return_null in node.cases:
-            i += 1
+        def program(context):
+            try:
+                return body(context)
+            except (ReturnSignal, BreakSignal, ContinueSignal):
+                # The interpreter yields no program value when these escape
+                return None
 
-            condition_value = res.register(self.visit(condition, context))
-            if res.should_return():
-                return res
-            if condition_value.is_true():
-                expr_value = res.register(self.visit(expr, context))
-                if res.should_return():
-                    return res
-                return res.success(Number.null if should_return_null else expr_value)
-        if node.else_case:
-            expr, should_return_null = node.else_case
-            else_value = res.register(self.visit(expr, context))
-            if res.should_return():
-                return res
-            return res.success(Number.null if should_return_null else else_value)
-        return res.success(Number.null)
+        return program
+
+    def compile_function(self, body_node, arg_names, should_auto_return):
+        layout = resolve_locals(body_node, arg_names)
+        outer_layout = self.layout
+        self.layout = layout
+        try:
+            body = self.compile(body_node, should_auto_return)
+        finally:
+            self.layout = outer_layout
+        padding = [None] * (len(layout) - len(arg_names))
+        # Repeated parameter names share a slot and the last argument wins
+        indexes = None
+        if len(set(arg_names)) < len(arg_names):
+            indexes = [layout[arg_name] for arg_name in arg_names]
+
+        def function(name, args, context, pos_start):
+            if indexes is None:
+                slots = args + padding
+            else:
+                slots = [None] * len(layout)
+                for index, arg in zip(indexes, args):
+                    slots[index] = arg
+            exec_ctx = Context(name, context, pos_start)
+            exec_ctx.symbol_table = Frame(layout, slots, context.symbol_table)
+            try:
+                value = body(exec_ctx)
+            except ReturnSignal as signal:
+                return signal.value
+            return value if should_auto_return else Number.null
 
-    def visit_ForNode(self, node, context):
-        res = RTresult()
-        elements = []
-        start_value = res.register(self.visit(node.start_value_node, context))
-        if res.should_return():
-            return res
-        end_value = res.register(self.visit(node.end_value_node, context))
-        if node.step_value_node:
-            step_value = res.register(self.visit(node.step_value_node, context))
-            if res.should_return():
-                return res
-        else:
-            step_value = Number(1)
-        i = start_value.value
-        if step_value.value >= 0:
-            condition = lambda: i < end_value.value
-        else:
-            condition = lambda: i > end_value.value
-        while condition():
-            context.symbol_table.set(node.var_name_tok.value, Number(i))
-            i += step_value.value
-            value = res.register(self.visit(node.body_node, context))
-            if (
-                res.should_return()
-                and res.loop_should_continue == False
-                and res.loop_should_break == False
-            ):
-                return res
-            if res.loop_should_continue:
-                continue
-            if res.loop_should_break:
-                break
-            elements.append(value)
-
-        return res.success(
-            Number.null
-            if node.should_return_null
-            else List(elements)
-            .set_context(context)
-            .set_pos(node.pos_start, node.pos_end)
-        )
+        return function
 
-    def visit_WhileNode(self, node, context):
-        res = RTresult()
-        elements = []
-        while True:
-            condition = res.register(self.visit(node.condition_node, context))
-            if res.should_return():
-                return res
-            if not condition.is_true():
-                break
-            value = res.register(self.visit(node.body_node, context))
-            if (
-                res.should_return()
-                and res.loop_should_continue == False
-                and res.loop_should_break == False
-            ):
-                return res
-            if res.loop_should_continue:
-                continue
-            if res.loop_should_break:
-                break
-            elements.append(value)
-        return res.success(
-            Number.null
-            if node.should_return_null
-            else List(elements)
-            .set_context(context)
-            .set_pos(node.pos_start, node.pos_end)
-        )
+    def compile(self, node, want_value):
+        method_name = f"compile_{type(node).__name__}"
+        method = getattr(self, method_name, self.no_compile_method)
+        return method(node, want_value)
 
-    def visit_ListNode(self, node, context):
-        res = RTresult()
-        elements = []
-        for element_node in node.element_nodes:
-            elements.append(res.register(self.visit(element_node, context)))
-            if res.should_return():
-                return res
-        return res.success(
-            List(elements).set_context(context).set_pos(node.pos_start, node.pos_end)
-        )
+    def no_compile_method(self, node, want_value):
+        raise Exception(f"No compile_{type(node).__name__} method defined")
 
-    def visit_VarAccessNode(self, node, context):
-        res = RTresult()
+    def compile_NumberNode(self, node, want_value):
+        value = node.value
+        return lambda context: value
+
+    def compile_StringNode(self, node, want_value):
+        value = String(node.tok.value, node.tok.type)
+        return lambda context: value
+
+    def compile_ListNode(self, node, want_value):
+        element_fns = [
+            self.compile(element_node, want_value)
+            for element_node in node.element_nodes
+        ]
+        if not want_value:
+
+            def block(context):
+                for element_fn in element_fns:
+                    element_fn(context)
+
+            return block
+
+        def list_(context):
+            return List([element_fn(context) for element_fn in element_fns])
+
+        return list_
+
+    def compile_VarAccessNode(self, node, want_value):
         var_name = node.var_name_tok.value
-        value = context.symbol_table.get(var_name)
+        layout = self.layout
 
-        if not value:
-            return res.failure(
+        def undefined(context):
+            return RTErrorSignal(
                 RTError(
                     node.pos_start,
                     node.pos_end,
@@ -2226,139 +3623,862 @@ class Interpreter:
                     context,
                 )
             )
-        value = value.copy().set_pos(node.pos_start, node.pos_end).set_context(context)
-        return res.success(value)
 
-    def visit_VarAssignNode(self, node, context):
-        res = RTresult()
-        var_name = node.var_name_tok.value
-        value = res.register(self.visit(node.value_node, context))
-        if res.should_return():
-            return res
-        context.symbol_table.set(var_name, value)
-        return res.success(value)
+        if layout is None:
 
-    def visit_NumberNode(self, node, context):
-        return RTresult().success(
-            Number(node.tok.value)
-            .set_context(context)
-            .set_pos(node.pos_start, node.pos_end)
-        )
+            def lookup(context):
+                return context.symbol_table.get(var_name)
 
-    def visit_StringNode(self, node, context):
-        return RTresult().success(
-            String(node.tok.value, node.tok.type)
-            .set_context(context)
-            .set_pos(node.pos_start, node.pos_end)
-        )
+        elif var_name in layout:
+            index = layout[var_name]
 
-    def visit_BinaryOpNode(self, node, context):
-        res = RTresult()
-        left = res.register(self.visit(node.left_node, context))
-        if res.should_return():
-            return res
-        right = res.register(self.visit(node.right_node, context))
-        if res.should_return():
-            return res
+            def lookup(context):
+                frame = context.symbol_table
+                value = frame.slots[index]
+                if value is None:
+                    # Not assigned in this call yet, so it is the caller's
+                    return frame.parent.get(var_name)
+                return value
 
-        result, error = None, None
-        if node.op_tok.type == TT_PLUS:
-            result, error = left.added_to(right)
-        elif node.op_tok.type == TT_MINUS:
-            result, error = left.subtracted_from(right)
-        elif node.op_tok.type == TT_MUL:
-            result, error = left.multiplied_by(right)
-        elif node.op_tok.type == TT_DIV:
-            result, error = left.divided_by(right)
-        elif node.op_tok.type == TT_POW:
-            result, error = left.to_power(right)
-        elif node.op_tok.type == TT_EE:
-            result, error = left.get_comp_eq(right)
-        elif node.op_tok.type == TT_NE:
-            result, error = left.get_comp_ne(right)
-        elif node.op_tok.type == TT_LT:
-            result, error = left.get_comp_lt(right)
-        elif node.op_tok.type == TT_GT:
-            result, error = left.get_comp_gt(right)
-        elif node.op_tok.type == TT_LTE:
-            result, error = left.get_comp_lte(right)
-        elif node.op_tok.type == TT_GTE:
-            result, error = left.get_comp_gte(right)
-        elif node.op_tok.matches(TT_KEYWORD, "tatha", "tathA"):
-            result, error = left.anded_by(right)
-        elif node.op_tok.matches(TT_KEYWORD, "va", "vA"):
-            result, error = left.ored_by(right)
-        if error:
-            return res.failure(error)
         else:
-            return res.success(result.set_pos(node.pos_start, node.pos_end))
 
-    def visit_UnaryOpNode(self, node, context):
-        res = RTresult()
-        number = res.register(self.visit(node.node, context))
-        if res.should_return():
-            return res
-        error = None
+            def lookup(context):
+                if var_name in FRAME_LOCAL_NAMES:
+                    return context.symbol_table.get(var_name)
+                return context.symbol_table.globals.get(var_name)
+
+        def var_access(context):
+            value = lookup(context)
+            if value is None:
+                raise undefined(context)
+            if type(value) is String and value.type != TT_STRING_D:
+                value = value.copy()
+            return value
+
+        return var_access
+
+    # Where an assignment stores a name: the frame's slot list and the name's
+    # index inside a function, the table's dict and the name at top level
+    def store_target(self, var_name):
+        if self.layout is None:
+            return False, var_name
+        return True, self.layout[var_name]
+
+    def compile_VarAssignNode(self, node, want_value):
+        in_frame, key = self.store_target(node.var_name_tok.value)
+        value_fn = self.compile(node.value_node, True)
+
+        def var_assign(context):
+            value = value_fn(context)
+            table = context.symbol_table
+            (table.slots if in_frame else table.symbols)[key] = value
+            return value
+
+        return var_assign
+
+    def compile_BinaryOpNode(self, node, want_value):
+        left_fn = self.compile(node.left_node, True)
+        right_fn = self.compile(node.right_node, True)
+        op_tok = node.op_tok
+        if op_tok.matches(TT_KEYWORD, "tatha", "tathA"):
+            op = OP_AND
+        elif op_tok.matches(TT_KEYWORD, "va", "vA"):
+            op = OP_OR
+        else:
+            op = BINARY_OPS[op_tok.type]
+
+        if op == OP_ADD:
+
+            def binary(context):
+                left = left_fn(context)
+                right = right_fn(context)
+                if type(left) is Number and type(right) is Number:
+                    return make_number(left.value + right.value)
+                return binary_op(op, left, right, node, context)
+
+        elif op == OP_SUB:
+
+            def binary(context):
+                left = left_fn(context)
+                right = right_fn(context)
+                if type(left) is Number and type(right) is Number:
+                    return make_number(left.value - right.value)
+                return binary_op(op, left, right, node, context)
+
+        elif op == OP_MUL:
+
+            def binary(context):
+                left = left_fn(context)
+                right = right_fn(context)
+                if type(left) is Number and type(right) is Number:
+                    return make_number(left.value * right.value)
+                return binary_op(op, left, right, node, context)
+
+        elif op == OP_DIV:
+
+            def binary(context):
+                left = left_fn(context)
+                right = right_fn(context)
+                if type(left) is Number and type(right) is Number:
+                    if right.value == 0:
+                        raise RTErrorSignal(
+                            RTError(
+                                node.right_node.pos_start,
+                                node.right_node.pos_end,
+                                "शून्येन विभागः | shunyen vibhagah",
+                                context,
+                            )
+                        )
+                    return make_number(left.value / right.value)
+                return binary_op(op, left, right, node, context)
+
+        elif op == OP_LT:
+
+            def binary(context):
+                left = left_fn(context)
+                right = right_fn(context)
+                if type(left) is Number and type(right) is Number:
+                    return Number.true if left.value < right.value else Number.false
+                return binary_op(op, left, right, node, context)
+
+        elif op == OP_GT:
+
+            def binary(context):
+                left = left_fn(context)
+                right = right_fn(context)
+                if type(left) is Number and type(right) is Number:
+                    return Number.true if left.value > right.value else Number.false
+                return binary_op(op, left, right, node, context)
+
+        elif op == OP_EE:
+
+            def binary(context):
+                left = left_fn(context)
+                right = right_fn(context)
+                if type(left) is Number and type(right) is Number:
+                    return Number.true if left.value == right.value else Number.false
+                return binary_op(op, left, right, node, context)
+
+        else:
+            kernel = NUMBER_OPS[op]
+
+            def binary(context):
+                left = left_fn(context)
+                right = right_fn(context)
+                if type(left) is Number and type(right) is Number:
+                    return make_number(kernel(left.value, right.value))
+                return binary_op(op, left, right, node, context)
+
+        return binary
+
+    def compile_UnaryOpNode(self, node, want_value):
+        operand_fn = self.compile(node.node, True)
         if node.op_tok.type == TT_MINUS:
-            number, error = number.multiplied_by(Number(-1))
+
+            def unary(context):
+                value = operand_fn(context)
+                if type(value) is Number:
+                    return make_number(-value.value)
+                return check(value.multiplied_by(make_number(-1)), node, context)
+
         elif node.op_tok.matches(TT_KEYWORD, "nahi"):
-            number, error = number.notted()
-        if error:
-            return res.failure(error)
+
+            def unary(context):
+                value = operand_fn(context)
+                if type(value) is Number:
+                    return Number.true if value.value == 0 else Number.false
+                return check(value.notted(), node, context)
+
         else:
-            return res.success(number.set_pos(node.pos_start, node.pos_end))
+            return operand_fn
+        return unary
+
+    def compile_ifNode(self, node, want_value):
+        cases = [
+            (
+                self.compile(condition, True),
+                self.compile(expr, want_value and not should_return_null),
+                should_return_null,
+            )
+            for condition, expr, should_return_null in node.cases
+        ]
+        else_fn = None
+        else_returns_null = False
+        if node.else_case:
+            expr, else_returns_null = node.else_case
+            else_fn = self.compile(expr, want_value and not else_returns_null)
+
+        def if_(context):
+            for condition_fn, expr_fn, should_return_null in cases:
+                if condition_fn(context).is_true():
+                    value = expr_fn(context)
+                    return Number.null if should_return_null else value
+            if else_fn:
+                value = else_fn(context)
+                return Number.null if else_returns_null else value
+            return Number.null
+
+        return if_
+
+    def compile_ForNode(self, node, want_value):
+        in_frame, key = self.store_target(node.var_name_tok.value)
+        collect = want_value and not node.should_return_null
+        start_fn = self.compile(node.start_value_node, True)
+        end_fn = self.compile(node.end_value_node, True)
+        step_fn = (
+            self.compile(node.step_value_node, True) if node.step_value_node else None
+        )
+        body_fn = self.compile(node.body_node, collect)
+
+        def for_(context):
+            table = context.symbol_table
+            store = table.slots if in_frame else table.symbols
+            elements = []
+            start = start_fn(context).value
+            end = end_fn(context).value
+            step = step_fn(context).value if step_fn else 1
+            for i in loop_counter(start, end, step):
+                store[key] = make_number(i)
+                try:
+                    value = body_fn(context)
+                except ContinueSignal:
+                    continue
+                except BreakSignal:
+                    break
+                if collect:
+                    elements.append(value)
+            if not collect:
+                return Number.null
+            return List(elements)
+
+        return for_
+
+    def compile_WhileNode(self, node, want_value):
+        collect = want_value and not node.should_return_null
+        condition_fn = self.compile(node.condition_node, True)
+        body_fn = self.compile(node.body_node, collect)
+
+        def while_(context):
+            elements = []
+            while condition_fn(context).is_true():
+                try:
+                    value = body_fn(context)
+                except ContinueSignal:
+                    continue
+                except BreakSignal:
+                    break
+                if collect:
+                    elements.append(value)
+            if not collect:
+                return Number.null
+            return List(elements)
 
-    def visit_FuncDefNode(self, node, context):
-        res = RTresult()
+        return while_
+
+    def compile_BreakNode(self, node, want_value):
+        def break_(context):
+            raise BreakSignal()
+
+        return break_
+
+    def compile_ContinueNode(self, node, want_value):
+        def continue_(context):
+            raise ContinueSignal()
+
+        return continue_
+
+    def compile_ReturnNode(self, node, want_value):
+        if not node.node_to_return:
+
+            def return_null(context):
+                raise ReturnSignal(Number.null)
+
+            return return_null
+        value_fn = self.compile(node.node_to_return, True)
+
+        def return_(context):
+            raise ReturnSignal(value_fn(context))
+
+        return return_
+
+    def compile_FuncDefNode(self, node, want_value):
         func_name = node.var_name_tok.value if node.var_name_tok else None
-        body_node = node.body_node
-        arg_names = [arg_names.value for arg_names in node.arg_name_tok]
-        func_value = (
-            Function(func_name, body_node, arg_names, node.should_auto_return)
-            .set_context(context)
-            .set_pos(node.pos_start, node.pos_end)
+        arg_names = [arg_name.value for arg_name in node.arg_name_tok]
+        body_fn = self.compile_function(
+            node.body_node, arg_names, node.should_auto_return
         )
-        if node.var_name_tok:
-            context.symbol_table.set(func_name, func_value)
-        return res.success(func_value)
+        if func_name:
+            in_frame, key = self.store_target(func_name)
 
-    def visit_CallNode(self, node, context):
-        res = RTresult()
+        def func_def(context):
+            func_value = Function(
+                func_name, node.body_node, arg_names, node.should_auto_return
+            )
+            func_value.closure = body_fn
+            if func_name:
+                table = context.symbol_table
+                (table.slots if in_frame else table.symbols)[key] = func_value
+            return func_value
+
+        return func_def
+
+    def compile_CallNode(self, node, want_value):
+        callee_fn = self.compile(node.node_to_call, True)
+        arg_fns = [self.compile(arg_node, True) for arg_node in node.arg_nodes]
+
+        def call(context):
+            value_to_call = callee_fn(context)
+            args = [arg_fn(context) for arg_fn in arg_fns]
+            if type(value_to_call) is not Function:
+                return call_value(value_to_call, args, node, context)
+            arg_names = value_to_call.arg_names
+            check_arity(arg_names, args, node, context)
+            if value_to_call.closure is None:
+                value_to_call.closure = self.compile_function(
+                    value_to_call.body_node,
+                    arg_names,
+                    value_to_call.should_auto_return,
+                )
+            return value_to_call.closure(
+                value_to_call.name, args, context, node.pos_start
+            )
 
-        args = []
-        value_to_call = res.register(self.visit(node.node_to_call, context))
-        if res.should_return():
-            return res
-        value_to_call = value_to_call.copy().set_pos(node.pos_start, node.pos_end)
-        for arg_node in node.arg_nodes:
-            args.append(res.register(self.visit(arg_node, context)))
-            if res.should_return():
-                return res
-        return_value = res.register(value_to_call.execute(args))
-        if res.should_return():
-            return res
-        return_value = (
-            return_value.copy()
-            .set_pos(node.pos_start, node.pos_end)
-            .set_context(context)
+        return call
+
+
+# Python transpiler
+PYTHON_NUMBER_OPS = {
+    OP_ADD: "{a}.value + {b}.value",
+    OP_SUB: "{a}.value - {b}.value",
+    OP_MUL: "{a}.value * {b}.value",
+    OP_DIV: "{a}.value / {b}.value",
+    OP_POW: "{a}.value ** {b}.value",
+    OP_EE: "int({a}.value == {b}.value)",
+    OP_NE: "int({a}.value != {b}.value)",
+    OP_LT: "int({a}.value < {b}.value)",
+    OP_GT: "int({a}.value > {b}.value)",
+    OP_LTE: "int({a}.value <= {b}.value)",
+    OP_GTE: "int({a}.value >= {b}.value)",
+    OP_AND: "int({a}.value and {b}.value)",
+    OP_OR: "int({a}.value or {b}.value)",
+}
+
+# Nodes whose value can never be a single quoted String
+PYTHON_NON_STRING_NODES = (
+    NumberNode,
+    UnaryOpNode,
+    ListNode,
+    ForNode,
+    WhileNode,
+    FuncDefNode,
+)
+
+# Taller expressions are split over several lines, as Python's parser limits
+# how deeply parentheses can nest on one
+PYTHON_EXPR_HEIGHT = 12
+
+
+# Scoping is dynamic, so a function's locals live in Python variables that
+# are also written to the call's table whenever the body calls anything that
+# could read them. Top level variables live only in the program's table, where
+# functions and other programs sharing it see them as soon as they change.
+class PythonScope:
+    def __init__(self, parent, arg_names=(), shares=False):
+        self.parent = parent
+        self.arg_names = set(arg_names)
+        self.local_names = set(arg_names)
+        self.shares = shares
+        self.loop_depth = 0
+
+
+class Transpiler:
+    def __init__(self):
+        self.lines = []
+        self.level = 0
+        self.names = {}
+        self.temp_count = 0
+        self.scope = None
+        self.shapes = {}
+
+    def transpile_program(self, node):
+        self.scope = PythonScope(None)
+        self.line("def program(symbols):")
+        self.level += 1
+        self.line("results = []")
+        for element_node in node.element_nodes:
+            self.line(f"results.append({self.expr(element_node)})")
+        self.line("return List(results)")
+        return "\n".join(self.lines) + "\n", self.names
+
+    def line(self, text):
+        self.lines.append("    " * self.level + text)
+
+    def temp(self):
+        self.temp_count += 1
+        return f"t{self.temp_count}"
+
+    def ref(self, value, prefix="n"):
+        name = f"{prefix}{len(self.names)}"
+        self.names[name] = value
+        return name
+
+    def collect_locals(self, node, scope):
+        if isinstance(node, (VarAssignNode, ForNode)):
+            scope.local_names.add(node.var_name_tok.value)
+        if isinstance(node, FuncDefNode):
+            if node.var_name_tok:
+                scope.local_names.add(node.var_name_tok.value)
+            return
+        for child in self.children(node):
+            self.collect_locals(child, scope)
+
+    def children(self, node):
+        if isinstance(node, ListNode):
+            return node.element_nodes
+        if isinstance(node, BinaryOpNode):
+            return [node.left_node, node.right_node]
+        if isinstance(node, UnaryOpNode):
+            return [node.node]
+        if isinstance(node, VarAssignNode):
+            return [node.value_node]
+        if isinstance(node, ifNode):
+            children = []
+            for condition, expr, _ in node.cases:
+                children += [condition, expr]
+            if node.else_case:
+                children.append(node.else_case[0])
+            return children
+        if isinstance(node, ForNode):
+            children = [node.start_value_node, node.end_value_node]
+            if node.step_value_node:
+                children.append(node.step_value_node)
+            return children + [node.body_node]
+        if isinstance(node, WhileNode):
+            return [node.condition_node, node.body_node]
+        if isinstance(node, CallNode):
+            return [node.node_to_call] + node.arg_nodes
+        if isinstance(node, ReturnNode):
+            return [node.node_to_return] if node.node_to_return else []
+        return []
+
+    # Whether node calls anything outside of the bodies of functions it defines
+    def has_call(self, node):
+        if isinstance(node, CallNode):
+            return True
+        return any(self.has_call(child) for child in self.children(node))
+
+    # Whether node can be written inside an expression, and its height
+    def shape(self, node):
+        shape = self.shapes.get(id(node))
+        if shape is not None:
+            return shape
+        if isinstance(
+            node,
+            (
+                ifNode,
+                ForNode,
+                WhileNode,
+                FuncDefNode,
+                VarAssignNode,
+                ReturnNode,
+                BreakNode,
+                ContinueNode,
+            ),
+        ):
+            shape = (False, 1)
+        else:
+            simple, height = True, 0
+            for child in self.children(node):
+                child_simple, child_height = self.shape(child)
+                simple = simple and child_simple
+                height = max(height, child_height)
+            shape = (simple, height + 1)
+        self.shapes[id(node)] = shape
+        return shape
+
+    # Evaluates node now and returns an expression that is safe to use later
+    def value(self, node):
+        expr = self.expr(node)
+        if expr.isidentifier() and not expr.startswith("v_"):
+            return expr
+        temp = self.temp()
+        self.line(f"{temp} = {expr}")
+        return temp
+
+    # An operand that is not simple or too tall is evaluated on a line of its
+    # own, and so are the ones before it to keep their order. An ancestor of a
+    # tall node is taller still, so it has already done the same.
+    def operands(self, nodes):
+        for node in nodes:
+            simple, height = self.shape(node)
+            if not simple or height >= PYTHON_EXPR_HEIGHT:
+                return [self.value(node) for node in nodes]
+        return [self.expr(node) for node in nodes]
+
+    def expr(self, node):
+        method_name = f"expr_{type(node).__name__}"
+        method = getattr(self, method_name, None)
+        if method:
+            return method(node)
+        target = self.temp()
+        self.stmt(node, target)
+        return target
+
+    def stmt(self, node, target=None):
+        method_name = f"stmt_{type(node).__name__}"
+        method = getattr(self, method_name, None)
+        if method:
+            return method(node, target)
+        expr = self.expr(node)
+        self.line(f"{target} = {expr}" if target else expr)
+
+    def store(self, name, expr, node):
+        if isinstance(node, PYTHON_NON_STRING_NODES) or (
+            isinstance(node, BinaryOpNode) and node.op_tok.type != TT_DIV
+        ):
+            self.assign(name, expr)
+            return
+        temp = self.temp()
+        self.line(f"{temp} = {expr}")
+        self.assign(name, f"dq({temp}) if type({temp}) is String else {temp}")
+
+    def assign(self, name, expr):
+        if not self.scope.parent:
+            self.line(f"symbols[{name!r}] = {expr}")
+            return
+        self.line(f"v_{name} = {expr}")
+        if self.scope.shares:
+            self.line(f"symbols[{name!r}] = v_{name}")
+
+    def expr_NumberNode(self, node):
+        return self.ref(node.value, "k")
+
+    def expr_StringNode(self, node):
+        return self.ref(String(node.tok.value, node.tok.type), "k")
+
+    def expr_ListNode(self, node):
+        elements = self.operands(node.element_nodes)
+        return f"List([{', '.join(elements)}])"
+
+    def stmt_ListNode(self, node, target):
+        for element_node in node.element_nodes:
+            self.stmt(element_node)
+        if target:
+            self.line(f"{target} = null")
+
+    def expr_VarAccessNode(self, node):
+        name = node.var_name_tok.value
+        if name in self.scope.arg_names:
+            return f"v_{name}"
+        if name in self.scope.local_names:
+            return (
+                f"(v_{name} if v_{name} is not None"
+                f" else lookup({name!r}, {self.ref(node)}, CTX))"
+            )
+        if self.scope.parent:
+            return f"lookup({name!r}, {self.ref(node)}, CTX, TABLE)"
+        a = self.temp()
+        return (
+            f"({a} if type({a} := symbols.get({name!r})) is Number"
+            f" else lookup({name!r}, {self.ref(node)}, CTX))"
         )
-        return res.success(return_value)
 
-    def visit_ReturnNode(self, node, context):
-        res = RTresult()
-        if node.node_to_return:
-            value = res.register(self.visit(node.node_to_return, context))
-            if res.should_return():
-                return res
+    def stmt_VarAssignNode(self, node, target):
+        name = node.var_name_tok.value
+        expr = self.expr(node.value_node)
+        if target:
+            self.line(f"{target} = {expr}")
+            expr = target
+        self.store(name, expr, node.value_node)
+
+    def expr_BinaryOpNode(self, node):
+        left, right = self.operands([node.left_node, node.right_node])
+        op_tok = node.op_tok
+        if op_tok.matches(TT_KEYWORD, "tatha", "tathA"):
+            op = OP_AND
+        elif op_tok.matches(TT_KEYWORD, "va", "vA"):
+            op = OP_OR
         else:
-            value = Number.null
-        return res.succes_return(value)
+            op = BINARY_OPS[op_tok.type]
+        a, b = self.temp(), self.temp()
+        condition = f"(type({a} := {left}) is Number) & (type({b} := {right}) is Number)"
+        if op == OP_DIV:
+            condition += f" and {b}.value != 0"
+        fast = PYTHON_NUMBER_OPS[op].format(a=a, b=b)
+        slow = f"binary_op({op!r}, {a}, {b}, {self.ref(node)}, CTX)"
+        return f"(make_number({fast}) if {condition} else {slow})"
+
+    def expr_UnaryOpNode(self, node):
+        (operand,) = self.operands([node.node])
+        if node.op_tok.type == TT_MINUS:
+            fast, slow = "-{a}.value", "negate"
+        elif node.op_tok.matches(TT_KEYWORD, "nahi"):
+            fast, slow = "int({a}.value == 0)", "logical_not"
+        else:
+            return operand
+        a = self.temp()
+        return (
+            f"(make_number({fast.format(a=a)}) if type({a} := {operand}) is Number"
+            f" else {slow}({a}, {self.ref(node)}, CTX))"
+        )
 
-    def visit_ContinueNode(self, node, context):
-        return RTresult().success_continue()
+    def truth(self, node):
+        condition = self.expr(node)
+        a = self.temp()
+        return f"({a}.value != 0 if type({a} := {condition}) is Number else {a}.is_true())"
+
+    def stmt_ifNode(self, node, target):
+        cases = list(node.cases)
+        opened = 0
+        for index, (condition, expr, should_return_null) in enumerate(cases):
+            self.line(f"if {self.truth(condition)}:")
+            self.level += 1
+            self.branch(expr, should_return_null, target)
+            self.level -= 1
+            self.line("else:")
+            self.level += 1
+            opened += 1
+        if node.else_case:
+            expr, should_return_null = node.else_case
+            self.branch(expr, should_return_null, target)
+        else:
+            self.line(f"{target} = null" if target else "pass")
+        self.level -= opened
+
+    def branch(self, expr, should_return_null, target):
+        if should_return_null or not target:
+            self.stmt(expr)
+            if target:
+                self.line(f"{target} = null")
+        else:
+            self.stmt(expr, target)
+
+    def stmt_ForNode(self, node, target):
+        collect = target and not node.should_return_null
+        elements = self.temp()
+        if collect:
+            self.line(f"{elements} = []")
+        start, end = self.operands([node.start_value_node, node.end_value_node])
+        i, end_value, step_value = self.temp(), self.temp(), self.temp()
+        self.line(f"{i} = {start}.value")
+        self.line(f"{end_value} = {end}.value")
+        if node.step_value_node:
+            self.line(f"{step_value} = {self.expr(node.step_value_node)}.value")
+        else:
+            self.line(f"{step_value} = 1")
+        self.line(f"for {i} in loop_counter({i}, {end_value}, {step_value}):")
+        self.level += 1
+        self.assign(node.var_name_tok.value, f"make_number({i})")
+        self.loop_body(node.body_node, collect and elements)
+        self.level -= 1
+        self.end_loop(node, target, collect, elements)
+
+    def stmt_WhileNode(self, node, target):
+        collect = target and not node.should_return_null
+        elements = self.temp()
+        if collect:
+            self.line(f"{elements} = []")
+        simple, height = self.shape(node.condition_node)
+        if simple and height < PYTHON_EXPR_HEIGHT:
+            self.line(f"while {self.truth(node.condition_node)}:")
+            self.level += 1
+        else:
+            self.line("while True:")
+            self.level += 1
+            self.line(f"if not {self.truth(node.condition_node)}:")
+            self.line("    break")
+        self.loop_body(node.body_node, collect and elements)
+        self.level -= 1
+        self.end_loop(node, target, collect, elements)
+
+    def loop_body(self, body_node, elements):
+        self.scope.loop_depth += 1
+        # A virAmaH or anuvartanam outside of a loop in a called function ends
+        # or continues this loop
+        catches = self.has_call(body_node)
+        if catches:
+            self.line("try:")
+            self.level += 1
+        if elements:
+            self.line(f"{elements}.append({self.expr(body_node)})")
+        else:
+            self.stmt(body_node)
+        if catches:
+            self.level -= 1
+            self.line("except BreakSignal:")
+            self.line("    break")
+            self.line("except ContinueSignal:")
+            self.line("    continue")
+        self.scope.loop_depth -= 1
+
+    def end_loop(self, node, target, collect, elements):
+        if collect:
+            self.line(f"{target} = List({elements})")
+        elif target:
+            self.line(f"{target} = null")
+
+    def stmt_BreakNode(self, node, target):
+        self.line("break" if self.scope.loop_depth else "raise BreakSignal()")
+
+    def stmt_ContinueNode(self, node, target):
+        self.line("continue" if self.scope.loop_depth else "raise ContinueSignal()")
+
+    def stmt_ReturnNode(self, node, target):
+        value = self.expr(node.node_to_return) if node.node_to_return else "null"
+        if self.scope.parent:
+            self.line(f"return {value}")
+        else:
+            self.line(f"raise ReturnSignal({value})")
 
-    def visit_BreakNode(self, node, context):
-        return RTresult().success_break()
+    def stmt_FuncDefNode(self, node, target):
+        func_name = node.var_name_tok.value if node.var_name_tok else None
+        arg_names = [arg_name.value for arg_name in node.arg_name_tok]
+        python_name = self.temp()
+        outer_scope = self.scope
+        shares = self.has_call(node.body_node)
+        self.scope = PythonScope(outer_scope, arg_names, shares)
+        self.collect_locals(node.body_node, self.scope)
+        FRAME_LOCAL_NAMES.update(self.scope.local_names)
+        # CTX is the call's own context, which make_function's caller creates
+        # A repeated parameter takes the last argument given for it, as it
+        # does when the arguments are put in the call's table
+        params = "".join(
+            f", v_{name}" if name not in arg_names[index + 1 :] else f", _{index}"
+            for index, name in enumerate(arg_names)
+        )
+        self.line(f"def {python_name}(CTX{params}):")
+        self.level += 1
+        if shares:
+            self.line("symbols = CTX.symbols")
+        for name in arg_names:
+            self.line(f"if type(v_{name}) is String:")
+            self.line(f"    v_{name} = dq(v_{name})")
+        for name in sorted(self.scope.local_names - self.scope.arg_names):
+            self.line(f"v_{name} = None")
+        if node.should_auto_return:
+            self.line(f"return {self.expr(node.body_node)}")
+        else:
+            self.stmt(node.body_node)
+            self.line("return null")
+        self.level -= 1
+        self.scope = outer_scope
+        value = f"make_function({self.ref(node)}, {python_name})"
+        if func_name:
+            temp = self.temp()
+            self.line(f"{temp} = {value}")
+            self.assign(func_name, temp)
+            value = temp
+        if target:
+            self.line(f"{target} = {value}")
+
+    def expr_CallNode(self, node):
+        callee, *args = self.operands([node.node_to_call] + node.arg_nodes)
+        return f"call({callee}, [{', '.join(args)}], {self.ref(node)}, CTX)"
+
+
+# A function reads a name no function keeps locally straight from the table
+# of the program, as no caller can hide it
+def python_lookup(name, node, context, table=None):
+    if table is None or name in FRAME_LOCAL_NAMES:
+        table = context.symbol_table
+    value = table.get(name)
+    if value is None:
+        raise RTErrorSignal(
+            RTError(
+                node.pos_start,
+                node.pos_end,
+                f"'{name}' न विवक्षितम् | {name} na vivakshitam",
+                context,
+            )
+        )
+    return python_dq(value) if type(value) is String else value
+
+
+def python_dq(value):
+    return value.copy() if value.type != TT_STRING_D else value
+
+
+def python_negate(value, node, context):
+    return check(value.multiplied_by(make_number(-1)), node, context)
+
+
+def python_logical_not(value, node, context):
+    return check(value.notted(), node, context)
+
+
+def python_make_function(node, python_function):
+    func_name = node.var_name_tok.value if node.var_name_tok else None
+    arg_names = [arg_name.value for arg_name in node.arg_name_tok]
+    func_value = Function(
+        func_name, node.body_node, arg_names, node.should_auto_return
+    )
+    func_value.pyfunc = python_function
+    return func_value
+
+
+def python_call(value_to_call, args, node, context):
+    if type(value_to_call) is Function and value_to_call.pyfunc:
+        arg_names = value_to_call.arg_names
+        if len(args) != len(arg_names):
+            check_arity(arg_names, args, node, context)
+        symbols = dict(zip(arg_names, args))
+        exec_ctx = CallContext(value_to_call.name, context, node.pos_start, symbols)
+        return value_to_call.pyfunc(exec_ctx, *args)
+    return call_value(value_to_call, args, node, context)
+
+
+PYTHON_RUNTIME = {
+    "Number": Number,
+    "make_number": make_number,
+    "loop_counter": loop_counter,
+    "String": String,
+    "List": List,
+    "null": Number.null,
+    "lookup": python_lookup,
+    "dq": python_dq,
+    "binary_op": binary_op,
+    "negate": python_negate,
+    "logical_not": python_logical_not,
+    "make_function": python_make_function,
+    "call": python_call,
+    "ReturnSignal": ReturnSignal,
+    "BreakSignal": BreakSignal,
+    "ContinueSignal": ContinueSignal,
+}
+
+# Compiled programs keyed by a hash of their file name and source text
+python_code_cache = {}
+PYTHON_CODE_CACHE_SIZE = 256
+
+
+def run_python(file_name, text, context, strip_debug_info=False, use_cache=True):
+    key = hashlib.sha256(
+        f"{file_name}\0{strip_debug_info:d}\0{text}".encode("utf8")
+    ).hexdigest()
+    if key not in python_code_cache:
+        ast, error = load_ast(file_name, text, strip_debug_info, use_cache)
+        if error:
+            return None, error
+        try:
+            source, names = Transpiler().transpile_program(ast)
+            code = compile(source, f"<sans {file_name}>", "exec")
+        except (SyntaxError, RecursionError):
+            # Nested too deeply for Python, so the interpreter runs it
+            code, names = None, ast
+        if len(python_code_cache) >= PYTHON_CODE_CACHE_SIZE:
+            del python_code_cache[next(iter(python_code_cache))]
+        python_code_cache[key] = (code, names)
+    code, names = python_code_cache[key]
+    if code is None:
+        return run_ast(names, context)
+    namespace = dict(PYTHON_RUNTIME, CTX=context, TABLE=context.symbol_table, **names)
+    exec(code, namespace)
+    try:
+        return namespace["program"](context.symbol_table.symbols), None
+    except RTErrorSignal as signal:
+        return None, signal.error
+    except (ReturnSignal, BreakSignal, ContinueSignal):
+        return None, None
 
 
 global_symbol_table = SymbolTable()
@@ -2381,6 +4501,14 @@ global_symbol_table.set("apanayati", BuiltinFunction.pop)
 global_symbol_table.set("prasArayati", BuiltinFunction.extend)
 global_symbol_table.set("parimANam", BuiltinFunction.len)
 global_symbol_table.set("dhAvayati", BuiltinFunction.run)
+global_symbol_table.set("dhAvayati_sUchiH", BuiltinFunction.run_cache)
+global_symbol_table.set("dhAvayati_vismarati", BuiltinFunction.clear_run_cache)
+global_symbol_table.set("aMkasUchiH", BuiltinFunction.array)
+global_symbol_table.set("kramaH", BuiltinFunction.range)
+global_symbol_table.set("yogaH", BuiltinFunction.sum)
+global_symbol_table.set("nyUnatamaH", BuiltinFunction.min)
+global_symbol_table.set("adhikatamaH", BuiltinFunction.max)
+global_symbol_table.set("madhyamAnam", BuiltinFunction.mean)
 global_symbol_table.set("shunya", Number.null)
 global_symbol_table.set("satya", Number.true)
 global_symbol_table.set("asatya", Number.false)
@@ -2400,12 +4528,222 @@ global_symbol_table.set("apanayati", BuiltinFunction.pop)
 global_symbol_table.set("prasarayati", BuiltinFunction.extend)
 global_symbol_table.set("parimanam", BuiltinFunction.len)
 global_symbol_table.set("dhavayati", BuiltinFunction.run)
+global_symbol_table.set("dhavayati_suchih", BuiltinFunction.run_cache)
+global_symbol_table.set("dhavayati_vismarati", BuiltinFunction.clear_run_cache)
+global_symbol_table.set("ankasuchih", BuiltinFunction.array)
+global_symbol_table.set("kramah", BuiltinFunction.range)
+global_symbol_table.set("yogah", BuiltinFunction.sum)
+global_symbol_table.set("nyunatamah", BuiltinFunction.min)
+global_symbol_table.set("adhikatamah", BuiltinFunction.max)
+global_symbol_table.set("madhyamanam", BuiltinFunction.mean)
+
+
+# Optimizer
+# Runs once over a parsed program before any engine sees it. Operators whose
+# operands are literals are folded into literals, yadi branches with a known
+# condition are dropped, and statements whose value is never used are removed
+# when they cannot do anything else. Names are never folded, not even pi or
+# satya, as any of them can be assigned by a later program sharing the table.
+
+# Limits on what is folded, so a dead branch cannot build a huge value
+FOLD_MAX_EXPONENT = 64
+FOLD_MAX_STRING = 4096
+
+# Nodes after which the rest of a block never runs
+JUMP_NODES = (ReturnNode, BreakNode, ContinueNode)
+
+
+def constant_value(node):
+    if type(node) is NumberNode:
+        return node.value
+    if type(node) is StringNode:
+        return String(node.tok.value, node.tok.type)
+    return None
+
+
+def literal_node(value, node):
+    if type(value) is Number:
+        tok_type = TT_INT if isinstance(value.value, int) else TT_FLOAT
+        literal = NumberNode(Token(tok_type, value.value, node.pos_start, node.pos_end))
+        literal.value = value
+        return literal
+    if type(value) is String and len(value.value) <= FOLD_MAX_STRING:
+        return StringNode(Token(value.type, value.value, node.pos_start, node.pos_end))
+    return None
+
+
+def is_pure(node):
+    if type(node) in (NumberNode, StringNode):
+        return True
+    if type(node) is FuncDefNode:
+        return node.var_name_tok is None
+    if type(node) is ListNode:
+        return all(is_pure(element_node) for element_node in node.element_nodes)
+    return False
+
+
+class Optimizer:
+    def optimize(self, node, want_value):
+        method = getattr(self, f"optimize_{type(node).__name__}", None)
+        return method(node, want_value) if method else node
+
+    def optimize_VarAssignNode(self, node, want_value):
+        node.value_node = self.optimize(node.value_node, True)
+        return node
+
+    def optimize_BinaryOpNode(self, node, want_value):
+        node.left_node = self.optimize(node.left_node, True)
+        node.right_node = self.optimize(node.right_node, True)
+        left = constant_value(node.left_node)
+        right = constant_value(node.right_node)
+        if left is None or right is None:
+            return node
+        op_tok = node.op_tok
+        if op_tok.type == TT_KEYWORD:
+            op = OP_AND if op_tok.value in ("tatha", "tathA") else OP_OR
+        else:
+            op = BINARY_OPS[op_tok.type]
+        if op == OP_POW and type(right) is Number:
+            if abs(right.value) > FOLD_MAX_EXPONENT:
+                return node
+        if op == OP_MUL and type(left) is String and type(right) is Number:
+            if len(left.value) * right.value > FOLD_MAX_STRING:
+                return node
+        try:
+            result, error = getattr(left, BINARY_OP_METHODS[op])(right)
+        except Exception:
+            # Left for the engine to raise when, and if, it runs
+            return node
+        if error:
+            return node
+        return literal_node(result, node) or node
+
+    def optimize_UnaryOpNode(self, node, want_value):
+        node.node = self.optimize(node.node, True)
+        value = constant_value(node.node)
+        if value is None:
+            return node
+        error = None
+        if node.op_tok.type == TT_MINUS:
+            value, error = value.multiplied_by(make_number(-1))
+        elif node.op_tok.matches(TT_KEYWORD, "nahi"):
+            value, error = value.notted()
+        if error:
+            return node
+        return literal_node(value, node) or node
+
+    def optimize_ListNode(self, node, want_value):
+        element_nodes = []
+        for element_node in node.element_nodes:
+            element_node = self.optimize(element_node, want_value)
+            if not want_value and is_pure(element_node):
+                continue
+            element_nodes.append(element_node)
+            if type(element_node) in JUMP_NODES:
+                break
+        node.element_nodes = element_nodes
+        return node
+
+    def optimize_ifNode(self, node, want_value):
+        cases = []
+        else_case = node.else_case
+        for condition, expr, should_return_null in node.cases:
+            condition = self.optimize(condition, True)
+            value = constant_value(condition)
+            if value is not None and not value.is_true():
+                continue
+            expr = self.optimize(expr, want_value and not should_return_null)
+            if value is None:
+                cases.append((condition, expr, should_return_null))
+                continue
+            # Known to be taken, so no later case or else can run
+            else_case = (expr, should_return_null)
+            break
+        else:
+            if else_case:
+                expr, should_return_null = else_case
+                expr = self.optimize(expr, want_value and not should_return_null)
+                else_case = (expr, should_return_null)
+        if not cases:
+            if not else_case:
+                return literal_node(Number.null, node)
+            expr, should_return_null = else_case
+            if not want_value or not should_return_null:
+                return expr
+            cases = [(literal_node(Number.true, expr), expr, True)]
+            else_case = None
+        node.cases = cases
+        node.else_case = else_case
+        return node
+
+    def optimize_ForNode(self, node, want_value):
+        if not want_value:
+            # Its value is unused, so the engines need not collect one
+            node.should_return_null = True
+        node.start_value_node = self.optimize(node.start_value_node, True)
+        node.end_value_node = self.optimize(node.end_value_node, True)
+        if node.step_value_node:
+            node.step_value_node = self.optimize(node.step_value_node, True)
+        want_body = want_value and not node.should_return_null
+        node.body_node = self.optimize(node.body_node, want_body)
+        return node
+
+    def optimize_WhileNode(self, node, want_value):
+        node.condition_node = self.optimize(node.condition_node, True)
+        value = constant_value(node.condition_node)
+        if value is not None and not value.is_true():
+            if want_value and not node.should_return_null:
+                return ListNode([], node.pos_start, node.pos_end)
+            return literal_node(Number.null, node)
+        if not want_value:
+            node.should_return_null = True
+        want_body = want_value and not node.should_return_null
+        node.body_node = self.optimize(node.body_node, want_body)
+        return node
+
+    def optimize_FuncDefNode(self, node, want_value):
+        node.body_node = self.optimize(node.body_node, node.should_auto_return)
+        return node
+
+    def optimize_CallNode(self, node, want_value):
+        node.node_to_call = self.optimize(node.node_to_call, True)
+        node.arg_nodes = [self.optimize(arg_node, True) for arg_node in node.arg_nodes]
+        return node
+
+    def optimize_ReturnNode(self, node, want_value):
+        if node.node_to_return:
+            node.node_to_return = self.optimize(node.node_to_return, True)
+        return node
+
+
+Optimizer.shared = Optimizer()
+
+
+def optimize(ast):
+    return Optimizer.shared.optimize(ast, True)
 
 
 # Run
-def Run(text, file_name):
-    converted_text = str(transliterate(text, sanscript.DEVANAGARI, sanscript.ITRANS))
-    lexer = Lexer(file_name, converted_text)
+# Devanagari, Devanagari Extended and Vedic Extensions blocks
+DEVANAGARI_RE = re.compile("[\u0900-\u097f\ua8e0-\ua8ff\u1cd0-\u1cff]")
+
+
+@functools.lru_cache(maxsize=4096)
+def transliterate_line(line):
+    return str(transliterate(line, sanscript.DEVANAGARI, sanscript.ITRANS))
+
+
+def to_itrans(text):
+    if not DEVANAGARI_RE.search(text):
+        return text
+    return "\n".join(
+        transliterate_line(line) if DEVANAGARI_RE.search(line) else line
+        for line in text.split("\n")
+    )
+
+
+def make_ast(file_name, text, strip_debug_info=False):
+    lexer = Lexer(file_name, text, strip_debug_info)
     tokens, error = lexer.make_tokens()
     if error:
         return None, error
@@ -2413,8 +4751,168 @@ def Run(text, file_name):
     ast = parser.parse()
     if ast.error:
         return None, ast.error
-    interpreter = Interpreter()
+    return optimize(ast.node), None
+
+
+# Program cache
+# Parsed programs are kept in __sanscache__ next to their source file. Each
+# entry starts with a key line hashing the interpreter and the source text,
+# so editing either one invalidates it.
+SANSC_DIR = "__sanscache__"
+
+
+@functools.lru_cache(maxsize=None)
+def interpreter_version():
+    with open(__file__, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def sansc_path(file_name, strip_debug_info):
+    directory, base_name = os.path.split(os.path.abspath(file_name))
+    stem = os.path.splitext(base_name)[0]
+    suffix = ".stripped.sansc" if strip_debug_info else ".sansc"
+    return os.path.join(directory, SANSC_DIR, stem + suffix)
+
+
+def sansc_key(text, strip_debug_info):
+    key = f"{interpreter_version()}\0{strip_debug_info:d}\0{text}"
+    return hashlib.sha256(key.encode("utf8")).hexdigest().encode("ascii")
+
+
+def read_sansc(path, key):
+    gc_enabled = gc.isenabled()
+    try:
+        with open(path, "rb") as f:
+            if f.readline().rstrip(b"\n") != key:
+                return None
+            # The tree holds no cycles, so collecting while it loads is wasted
+            gc.disable()
+            return pickle.load(f)
+    except Exception:
+        return None
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+def write_sansc(path, key, entry):
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(temp_path, "wb") as f:
+            f.write(key + b"\n")
+            pickle.dump(entry, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def shift_positions(node, delta):
+    seen = set()
+    stack = [node]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, (list, tuple)):
+            stack.extend(item)
+        elif hasattr(item, "pos_start") and id(item) not in seen:
+            seen.add(id(item))
+            if item.pos_start is not None:
+                item.pos_start += delta
+            if item.pos_end is not None:
+                item.pos_end += delta
+            slots = type(item).__slots__
+            stack.extend(getattr(item, name, None) for name in slots)
+
+
+def load_ast(file_name, text, strip_debug_info=False, use_cache=True):
+    if not use_cache or not os.path.isfile(file_name):
+        return make_ast(file_name, to_itrans(text), strip_debug_info)
+    path = sansc_path(file_name, strip_debug_info)
+    key = sansc_key(text, strip_debug_info)
+    entry = read_sansc(path, key)
+    if entry:
+        converted_text, base, ast = entry
+        # Offsets in the cached tree belong to the source map of the process
+        # that wrote it, so keep its base unless that range is taken
+        new_base = source_map.add(file_name, converted_text, base).base
+        if new_base != base:
+            shift_positions(ast, new_base - base)
+        return ast, None
+    converted_text = to_itrans(text)
+    ast, error = make_ast(file_name, converted_text, strip_debug_info)
+    if not error:
+        base = source_map.add(file_name, converted_text).base
+        write_sansc(path, key, (converted_text, base, ast))
+    return ast, error
+
+
+# Programs run by dhAvayati, keyed by absolute path and checked against the
+# file's size and modification time on every call
+module_cache = {}
+
+# Builtins see no context, so Run sets this for the program it runs and a run
+# without __sanscache__ writes none for its modules either
+module_use_cache = True
+
+
+def load_module(file_name):
+    path = os.path.abspath(file_name)
+    stat = os.stat(file_name)
+    entry = module_cache.get(path)
+    if entry and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+        return entry[2], None
+    with open(path, "r", encoding="utf8") as f:
+        script = f.read()
+    ast, error = load_ast(file_name, script, use_cache=module_use_cache)
+    if not error:
+        module_cache[path] = (stat.st_size, stat.st_mtime_ns, ast)
+    return ast, error
+
+
+def Run(
+    text,
+    file_name,
+    engine="interpreter",
+    strip_debug_info=False,
+    use_cache=True,
+    profiler=None,
+):
+    global module_use_cache
     context = Context("<कार्यक्रम> | <karyakram>")
     context.symbol_table = global_symbol_table
-    result = interpreter.visit(ast.node, context)
+    outer_use_cache = module_use_cache
+    module_use_cache = use_cache
+    try:
+        if engine == "python" and profiler is None and gettrace() is None:
+            return run_python(file_name, text, context, strip_debug_info, use_cache)
+        ast, error = load_ast(file_name, text, strip_debug_info, use_cache)
+        if error:
+            return None, error
+        return run_ast(ast, context, engine, profiler)
+    finally:
+        module_use_cache = outer_use_cache
+
+
+def run_ast(ast, context, engine="interpreter", profiler=None):
+    if profiler is not None:
+        if engine != "interpreter":
+            raise Exception(f"The '{engine}' engine cannot be profiled")
+        return profiler.run(ast, context)
+    if engine != "interpreter" and gettrace() is not None:
+        raise Exception(f"The '{engine}' engine cannot be traced")
+    if engine == "vm":
+        code = Compiler().compile_program(ast)
+        return VM().run(code, context)
+    if engine == "signals":
+        return SignalInterpreter.shared.run(ast, context)
+    if engine == "closure":
+        program = ClosureCompiler().compile_program(ast)
+        try:
+            return program(context), None
+        except RTErrorSignal as signal:
+            return None, signal.error
+    if engine != "interpreter":
+        raise Exception(f"No engine named '{engine}'")
+    result = Interpreter.shared.visit(ast, context)
     return result.value, result.error
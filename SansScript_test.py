@@ -0,0 +1,614 @@
+import os
+import tempfile
+import unittest
+import SansScript
+
+ENGINES = ("interpreter", "signals", "vm", "closure", "python")
+
+
+def new_context():
+    context = SansScript.Context("<test>")
+    context.symbol_table = SansScript.SymbolTable(SansScript.global_symbol_table)
+    return context
+
+
+def run(text, engine, context=None):
+    if context is None:
+        context = new_context()
+    if engine == "python":
+        return SansScript.run_python("<test>", text, context, use_cache=False)
+    ast, error = SansScript.load_ast("<test>", text, use_cache=False)
+    if error:
+        return None, error
+    return SansScript.run_ast(ast, context, engine)
+
+
+class EngineTestCase(unittest.TestCase):
+    # Runs each program on every engine and checks the repr of the value of
+    # its last statement
+    def assertResults(self, expected, *programs):
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                context = new_context()
+                for text in programs:
+                    value, error = run(text, engine, context)
+                    self.assertIsNone(error, error and error.as_string())
+                self.assertEqual(repr(value.elements[-1]), expected)
+
+    def assertRunError(self, details, text):
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                value, error = run(text, engine)
+                self.assertIsNotNone(error)
+                self.assertIn(details, error.details)
+
+
+class FoldingTest(EngineTestCase):
+    def test_folds_literal_operators(self):
+        ast, error = SansScript.make_ast("<test>", "1 + 2 * 3")
+        self.assertIsNone(error)
+        node = ast.element_nodes[0]
+        self.assertIs(type(node), SansScript.NumberNode)
+        self.assertEqual(node.value.value, 7)
+
+    def test_drops_dead_branches(self):
+        ast, error = SansScript.make_ast("<test>", "yadi 0: mudrayati(1)\n2")
+        self.assertIsNone(error)
+        self.assertIs(type(ast.element_nodes[0]), SansScript.NumberNode)
+
+    def test_constants_can_be_rebound(self):
+        self.assertResults("3", "niyoga fpi(): pi", "charah pi = 3", "fpi()")
+        self.assertResults("[0, 5]", "charah satya = 5\n[asatya, satya]")
+
+    def test_unfoldable_operands_fail_at_run_time(self):
+        ast, error = SansScript.make_ast("<test>", "niyoga q(): 2 ^ 'a'")
+        self.assertIsNone(error)
+        self.assertRunError("avaidh kriya", "2 ^ 'a'")
+
+
+class ListTest(EngineTestCase):
+    def test_operators_leave_the_operand_unchanged(self):
+        self.assertResults(
+            "[[1, 2, 3], [1, 2, 3, 4], [1, 3], [1, 2, 3, 5]]",
+            "charah a = [1, 2, 3]\n[a, a + 4, a - 1, a * 5]",
+        )
+
+    def test_float_indexes_are_rejected(self):
+        for text in ("[1, 2, 3] - 2.0", "[1, 2, 3] - 1.0", "[1, 2, 3] / 2.0"):
+            self.assertRunError("avaidh sthanam", text)
+
+    def test_shared_tails_stay_independent(self):
+        self.assertResults(
+            "[[1, 2], [1, 2, 3], [1, 2, 4]]",
+            "charah a = [1, 2]\ncharah b = a + 3\ncharah c = a + 4\n[a, b, c]",
+        )
+
+    def test_builtins_still_change_the_list_in_place(self):
+        self.assertResults(
+            "[[1, 2, 3], [1, 2, 3]]",
+            "charah a = [1, 2]\ncharah b = a\nsamyojayati(b, 3)\n[a, b]",
+        )
+
+    def test_growing_a_list_in_a_loop(self):
+        self.assertResults(
+            "[1000, 999]",
+            "charah l = []\n"
+            "krrite i = 0 ityasmai 1000:\n"
+            "    charah l = l + i\n"
+            "aMta\n"
+            "[parimANam(l), l / -1]",
+        )
+
+
+@unittest.skipIf(SansScript.numpy is None, "numpy is not installed")
+class ArrayTest(EngineTestCase):
+    def test_builtins(self):
+        self.assertResults(
+            "[[1, 2, 3], [0, 1, 2, 3], 6, 1, 3, 2.0]",
+            "charah l = [1, 2, 3]\n"
+            "[aMkasUchiH(l), kramaH(0, 4), yogaH(l), nyUnatamaH(l),"
+            " adhikatamaH(aMkasUchiH(l)), madhyamAnam(l)]",
+        )
+
+    def test_builtins_reject_bad_lists(self):
+        self.assertRunError("avaidh suchi", "aMkasUchiH([1, 'a'])")
+        self.assertRunError("avaidh suchi", "nyUnatamaH([])")
+        self.assertRunError("avaidh ankah", "kramaH(0, 'a')")
+
+    def test_broadcasting(self):
+        self.assertResults(
+            "[[3, 4, 5], [9, 8, 7], [4, 10, 18], [1, 0, 0], [0.5, 1.0, 1.5]]",
+            "charah a = aMkasUchiH([1, 2, 3])\n"
+            "[a + 2, 10 - a, a * aMkasUchiH([4, 5, 6]), a < 2, a / 2]",
+        )
+        self.assertRunError("avaidh parimanam", "aMkasUchiH([1, 2]) + aMkasUchiH([1])")
+
+    def test_divide_by_zero(self):
+        self.assertRunError("shunyen vibhagah", "aMkasUchiH([1, 2]) / 0")
+        self.assertRunError(
+            "shunyen vibhagah", "aMkasUchiH([1, 2]) / aMkasUchiH([1, 0])"
+        )
+
+    def test_integers_do_not_wrap(self):
+        self.assertResults("[%d, %d]" % (2**70, 3**70), "aMkasUchiH([2, 3]) ^ 70")
+        self.assertResults("[%d]" % 2**63, "aMkasUchiH([9223372036854775807]) + 1")
+        self.assertResults(
+            "[%d, %d]" % (-(2**63) - 1, 2**64 - 2),
+            "charah big = 9223372036854775807\n"
+            "[nyUnatamaH(aMkasUchiH([1, big]) * -1 - 2), yogaH([big, big])]",
+        )
+        self.assertResults("[2, %d]" % (2**70 + 1), "aMkasUchiH([1, 2 ^ 70]) + 1")
+
+    def test_without_numpy(self):
+        numpy = SansScript.numpy
+        SansScript.numpy = None
+        try:
+            for name in ("aMkasUchiH([1])", "kramaH(0, 2)", "yogaH([1])"):
+                value, error = run(name, "interpreter")
+                self.assertIn("numpy anupalabdham", error.details)
+        finally:
+            SansScript.numpy = numpy
+
+
+class StringTest(EngineTestCase):
+    def test_long_strings_are_built_from_pieces(self):
+        value, error = run("charah s = 'x' * 300\ns + 'y'", "interpreter")
+        self.assertIsNone(error)
+        rope = value.elements[-1]
+        self.assertIsNone(rope.text)
+        self.assertEqual(rope.value, "x" * 300 + "y")
+        self.assertIsNone(rope.pieces)
+
+    def test_strings_sharing_pieces_stay_independent(self):
+        self.assertResults(
+            '["%sX", "%sY", "%sXZ"]' % ("ab" * 200, "ab" * 200, "ab" * 200),
+            "charah s = ''\n"
+            "krrite i = 0 ityasmai 200:\n"
+            "    charah s = s + 'ab'\n"
+            "aMta\n"
+            "charah t = s + 'X'\n"
+            "charah u = s + 'Y'\n"
+            "[t, u, t + 'Z']",
+        )
+
+    def test_short_strings(self):
+        self.assertResults("[\"ab\", '']", "['a' + 'b', '' + '']")
+
+
+class ScopeTest(EngineTestCase):
+    def test_free_names_are_read_from_the_caller(self):
+        self.assertResults(
+            "[10, 20]",
+            "charah g = 10\n"
+            "niyoga f(): g\n"
+            "niyoga h():\n"
+            "    charah g = 20\n"
+            "    pratyavartanam f()\n"
+            "aMta\n"
+            "[f(), h()]",
+        )
+
+    def test_functions_see_top_level_assignments_at_once(self):
+        self.assertResults("5", "niyoga gx(): xx", "charah xx = 5\ngx()")
+        self.assertResults(
+            "[5, 6]",
+            "niyoga gx(): xx",
+            "charah xx = 5\ncharah a = gx()\ncharah xx = 6\n[a, gx()]",
+        )
+
+    def test_function_locals_do_not_leak(self):
+        self.assertResults(
+            "[3, 1]",
+            "charah loc = 1\n"
+            "niyoga rec(n):\n"
+            "    charah loc = n\n"
+            "    yadi n > 0: rec(n - 1)\n"
+            "    pratyavartanam loc\n"
+            "aMta\n"
+            "[rec(3), loc]",
+        )
+
+    def test_repeated_parameters_take_the_last_argument(self):
+        self.assertResults("2", "niyoga f(a, a): a\nf(1, 2)")
+
+
+class DeepExpressionTest(EngineTestCase):
+    def test_long_sums(self):
+        for count in (67, 250):
+            self.assertResults(
+                str(count), "charah x = 1\n" + " + ".join(["x"] * count)
+            )
+
+    def test_nested_factors_and_calls(self):
+        self.assertResults(
+            str(2**90), "charah x = 1\n" + " * ".join(["(x + 1)"] * 90)
+        )
+        self.assertResults("99", "niyoga f(a): a + 1\n" + "f(" * 99 + "0" + ")" * 99)
+
+    def test_operands_keep_their_order(self):
+        self.assertResults(
+            "[%s]" % ", ".join(map(str, range(30))),
+            "charah seen = []\n"
+            "niyoga f(a):\n"
+            "    saMyojayati(seen, a)\n"
+            "    pratyavartanam a\n"
+            "aMta\n"
+            + " + ".join(f"f({i})" for i in range(30))
+            + "\nseen",
+        )
+
+
+class LoopExitTest(EngineTestCase):
+    def test_break_in_a_called_function_ends_the_callers_loop(self):
+        self.assertResults(
+            "[1, [0, 1]]",
+            "niyoga brk():\n"
+            "    virAmaH\n"
+            "aMta\n"
+            "charah cnt = 0\n"
+            "krrite i = 0 ityasmai 5:\n"
+            "    charah cnt = cnt + 1\n"
+            "    brk()\n"
+            "aMta\n"
+            "[cnt, krrite i = 0 ityasmai 5: yadi i == 2: brk() uta: i]",
+        )
+
+    def test_continue_in_a_called_function_skips_the_rest_of_the_body(self):
+        self.assertResults(
+            "[0, [0, 1, 3]]",
+            "niyoga cont():\n"
+            "    anuvartanam\n"
+            "aMta\n"
+            "charah cnt = 0\n"
+            "krrite i = 0 ityasmai 5:\n"
+            "    cont()\n"
+            "    charah cnt = cnt + 1\n"
+            "aMta\n"
+            "[cnt, krrite i = 0 ityasmai 4: yadi i == 2: cont() uta: i]",
+        )
+
+    def test_loops_inside_the_callee_catch_their_own_break(self):
+        self.assertResults(
+            "[9, 9]",
+            "niyoga brk():\n"
+            "    virAmaH\n"
+            "aMta\n"
+            "niyoga inner():\n"
+            "    krrite k = 0 ityasmai 3: brk()\n"
+            "    pratyavartanam 9\n"
+            "aMta\n"
+            "krrite j = 0 ityasmai 2: inner()",
+        )
+
+    def test_break_outside_any_loop_ends_the_program(self):
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                text = "niyoga brk():\n    virAmaH\naMta\nbrk()\nmudrayati(1)"
+                self.assertEqual(run(text, engine), (None, None))
+
+
+FACT_PROGRAM = (
+    "niyoga fact(n):\n"
+    "    yadi n < 2: pratyavartanam 1\n"
+    "    pratyavartanam n * fact(n - 1)\n"
+    "aMta\n"
+    "fact(2)\n"
+    "fact()"
+)
+
+
+class ProfilerTest(unittest.TestCase):
+    def test_counts_and_folded_stacks(self):
+        profiler = SansScript.Profiler()
+        ast, error = SansScript.load_ast(
+            "<test>", FACT_PROGRAM.replace("fact()", "fact(3)"), use_cache=False
+        )
+        value, error = SansScript.run_ast(ast, new_context(), profiler=profiler)
+        self.assertIsNone(error)
+        self.assertEqual(profiler.functions["fact"][0], 5)
+        self.assertEqual(profiler.functions["<test>"][0], 1)
+        self.assertEqual(profiler.lines[("<test>", 2)][0], 5)
+        report = profiler.report().splitlines()
+        self.assertTrue(report[0].startswith("function"))
+        self.assertIn("<test>:3", profiler.report())
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "fact.folded")
+            profiler.write_folded(path)
+            with open(path, encoding="utf8") as f:
+                stacks = [line.rsplit(" ", 1)[0] for line in f.read().splitlines()]
+        self.assertEqual(
+            stacks,
+            ["<test>", "<test>;fact", "<test>;fact;fact", "<test>;fact;fact;fact"],
+        )
+
+    def test_runs_accumulate(self):
+        profiler = SansScript.Profiler()
+        context = new_context()
+        for text in ("niyoga g(): 1", "g()", "g()"):
+            ast, error = SansScript.load_ast("<test>", text, use_cache=False)
+            SansScript.run_ast(ast, context, profiler=profiler)
+        self.assertEqual(profiler.functions["g"][0], 2)
+        self.assertEqual(profiler.functions["<test>"][0], 3)
+
+
+class TraceTest(unittest.TestCase):
+    def tearDown(self):
+        SansScript.settrace(None)
+
+    def trace(self, text):
+        events = []
+
+        def hook(event, name, position, arg):
+            line = position.line if position else None
+            events.append((event, name, line, arg))
+
+        SansScript.settrace(hook)
+        self.assertIs(SansScript.gettrace(), hook)
+        value, error = run(text, "interpreter")
+        SansScript.settrace(None)
+        return events, error
+
+    def test_events(self):
+        events, error = self.trace(FACT_PROGRAM)
+        self.assertIsNotNone(error)
+        self.assertEqual(
+            [event[:3] for event in events],
+            [
+                ("line", "<test>", 0),
+                ("line", "<test>", 4),
+                ("call", "fact", 4),
+                ("line", "fact", 1),
+                ("line", "fact", 2),
+                ("call", "fact", 2),
+                ("line", "fact", 1),
+                ("return", "fact", 2),
+                ("return", "fact", 4),
+                ("line", "<test>", 5),
+                ("call", "fact", 5),
+                ("return", "fact", 5),
+                ("exception", "<test>", 5),
+            ],
+        )
+        self.assertEqual(repr(events[2][3]), "[2]")
+        self.assertEqual(repr(events[8][3]), "2")
+        self.assertIsNone(events[11][3])
+        self.assertIs(events[12][3], error)
+        self.assertIsNone(SansScript.gettrace())
+
+    def test_removing_the_hook_mid_run(self):
+        events = []
+
+        def hook(event, name, position, arg):
+            events.append(event)
+            if event == "call":
+                SansScript.settrace(None)
+
+        SansScript.settrace(hook)
+        value, error = run("niyoga f(): 1\nf()\nf()", "interpreter")
+        self.assertIsNone(error)
+        self.assertEqual(events, ["line", "line", "call"])
+
+    def test_a_hook_that_raises_is_removed(self):
+        def hook(event, name, position, arg):
+            if event == "call":
+                raise ValueError(name)
+
+        SansScript.settrace(hook)
+        with self.assertRaises(ValueError):
+            run(FACT_PROGRAM, "interpreter")
+        self.assertIsNone(SansScript.gettrace())
+        value, error = run("niyoga f(): 1\nf()", "interpreter")
+        self.assertEqual(repr(value.elements[-1]), "1")
+
+    def test_other_engines_refuse_to_run_traced(self):
+        SansScript.settrace(lambda event, name, position, arg: None)
+        for engine in ENGINES[1:]:
+            with self.subTest(engine=engine), self.assertRaises(Exception):
+                SansScript.Run("1", "<test>", engine=engine, use_cache=False)
+
+
+class CacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.file_name = os.path.join(self.directory.name, "prog.sans")
+        self.cache_path = SansScript.sansc_path(self.file_name, False)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def load(self, text):
+        with open(self.file_name, "w", encoding="utf8") as f:
+            f.write(text)
+        return SansScript.load_ast(self.file_name, text)
+
+    def load_cached(self, text):
+        # Fails the test if the tree is parsed instead of read from the cache
+        make_ast = SansScript.make_ast
+        SansScript.make_ast = None
+        try:
+            return self.load(text)
+        finally:
+            SansScript.make_ast = make_ast
+
+    def result(self, ast):
+        value, error = SansScript.run_ast(ast, new_context())
+        return error if error else repr(value.elements[-1])
+
+    def test_reads_the_tree_it_wrote(self):
+        self.load("1 + 2\n3 * 4")
+        self.assertTrue(os.path.isfile(self.cache_path))
+        ast, error = self.load_cached("1 + 2\n3 * 4")
+        self.assertIsNone(error)
+        self.assertEqual(self.result(ast), "12")
+
+    def test_changed_text_is_parsed_again(self):
+        self.load("1 + 2")
+        ast, error = self.load("5 * 5")
+        self.assertEqual(self.result(ast), "25")
+        self.assertEqual(self.result(self.load_cached("5 * 5")[0]), "25")
+
+    def test_entries_with_another_key_are_ignored(self):
+        self.load("1 + 2")
+        with open(self.cache_path, "rb") as f:
+            data = f.read()
+        with open(self.cache_path, "wb") as f:
+            f.write(b"0" * 64 + data[data.index(b"\n") :])
+        with self.assertRaises(TypeError):
+            self.load_cached("1 + 2")
+        self.assertEqual(self.result(self.load("1 + 2")[0]), "3")
+
+    def test_corrupt_or_partial_entries_are_ignored(self):
+        self.load("1 + 2")
+        with open(self.cache_path, "rb") as f:
+            data = f.read()
+        key = data[: data.index(b"\n") + 1]
+        for broken in (key + b"not a pickle", data[: len(data) // 2], b""):
+            with open(self.cache_path, "wb") as f:
+                f.write(broken)
+            ast, error = self.load("1 + 2")
+            self.assertIsNone(error)
+            self.assertEqual(self.result(ast), "3")
+
+    def test_cached_trees_move_to_a_free_base(self):
+        text = "charah a = 1\na / 0"
+        self.load(text)
+        source_map = SansScript.source_map
+        # A new process whose source map already uses the written range
+        SansScript.source_map = SansScript.SourceMap()
+        try:
+            SansScript.source_map.add("<other>", "x" * (source_map.next_base + 10))
+            ast, error = self.load_cached(text)
+            error = self.result(ast)
+            self.assertIn("pankti 2", error.as_string())
+            self.assertIn("a / 0", error.as_string())
+        finally:
+            SansScript.source_map = source_map
+
+    def test_runs_without_the_cache_write_none_for_modules(self):
+        module = os.path.join(self.directory.name, "module.sans")
+        with open(module, "w", encoding="utf8") as f:
+            f.write("1")
+        program = f"dhAvayati({module!r})"
+        value, error = SansScript.Run(program, "<test>", use_cache=False)
+        self.assertIsNone(error)
+        self.assertFalse(os.path.exists(SansScript.sansc_path(module, False)))
+        SansScript.module_cache.clear()
+        SansScript.Run(program, "<test>")
+        self.assertTrue(os.path.exists(SansScript.sansc_path(module, False)))
+
+
+class ModuleCacheTest(unittest.TestCase):
+    def setUp(self):
+        SansScript.module_cache.clear()
+        self.directory = tempfile.TemporaryDirectory()
+        self.module = os.path.join(self.directory.name, "module.sans")
+        self.loads = 0
+        self.load_ast = SansScript.load_ast
+
+        def counting_load_ast(file_name, *args, **kwargs):
+            if file_name == self.module:
+                self.loads += 1
+            return self.load_ast(file_name, *args, **kwargs)
+
+        SansScript.load_ast = counting_load_ast
+
+    def tearDown(self):
+        SansScript.load_ast = self.load_ast
+        SansScript.module_cache.clear()
+        SansScript.global_symbol_table.symbols.pop("module_value", None)
+        self.directory.cleanup()
+
+    def write(self, text, mtime_ns=None):
+        with open(self.module, "w", encoding="utf8") as f:
+            f.write(text)
+        if mtime_ns is not None:
+            os.utime(self.module, ns=(mtime_ns, mtime_ns))
+
+    def run_module(self):
+        text = f"dhAvayati({self.module!r})\nmodule_value"
+        value, error = run(text, "interpreter")
+        self.assertIsNone(error)
+        return repr(value.elements[-1])
+
+    def test_reloads_only_changed_files(self):
+        self.write("charah module_value = 1", 10**18)
+        self.assertEqual(self.run_module(), "1")
+        self.assertEqual(self.run_module(), "1")
+        self.assertEqual(self.loads, 1)
+        # A new size
+        self.write("charah module_value = 22", 10**18)
+        self.assertEqual(self.run_module(), "22")
+        self.assertEqual(self.loads, 2)
+        # The same size, but a new modification time
+        self.write("charah module_value = 33", 2 * 10**18)
+        self.assertEqual(self.run_module(), "33")
+        self.assertEqual(self.loads, 3)
+
+    def test_listing_and_clearing_the_cache(self):
+        self.write("charah module_value = 1")
+        self.run_module()
+        value, error = run(
+            "[dhAvayati_sUchiH(), dhAvayati_vismarati(), dhAvayati_sUchiH()]",
+            "interpreter",
+        )
+        self.assertIsNone(error)
+        paths, count, empty = value.elements[-1].elements
+        self.assertEqual([path.value for path in paths.elements], [self.module])
+        self.assertEqual(repr(count), "1")
+        self.assertEqual(repr(empty), "[]")
+        self.run_module()
+        self.assertEqual(self.loads, 2)
+
+
+class SourceMapTest(unittest.TestCase):
+    def test_keeps_texts_up_to_the_limit(self):
+        source_map = SansScript.SourceMap()
+        limit = SansScript.SOURCE_TEXT_LIMIT
+        SansScript.SOURCE_TEXT_LIMIT = 100
+        try:
+            first = source_map.add("<test>", "a" * 60)
+            for index in range(10):
+                source_map.add("<test>", str(index) * 60)
+        finally:
+            SansScript.SOURCE_TEXT_LIMIT = limit
+        self.assertEqual(len(source_map.by_text), 1)
+        self.assertLessEqual(source_map.text_size, 100)
+        pos_start, _ = source_map.resolve(first.base + 1, first.base + 2)
+        self.assertEqual(pos_start.file_name, "<test>")
+        self.assertIsNone(pos_start.file_text)
+        # A dropped range is not handed out again
+        source = source_map.add("<test>", "b", first.base)
+        self.assertNotEqual(source.base, first.base)
+
+    def test_errors_from_dropped_sources_name_the_file(self):
+        context = new_context()
+        run("niyoga bad(): 1 / 0", "interpreter", context)
+        limit = SansScript.SOURCE_TEXT_LIMIT
+        SansScript.SOURCE_TEXT_LIMIT = 0
+        try:
+            value, error = run("bad()", "interpreter", context)
+        finally:
+            SansScript.SOURCE_TEXT_LIMIT = limit
+        self.assertIn("<<test>>", error.as_string())
+        self.assertNotIn("pankti", error.as_string())
+
+
+class InterpreterTest(unittest.TestCase):
+    def test_loop_bodies_go_through_an_overridden_visit(self):
+        seen = []
+
+        class CountingInterpreter(SansScript.Interpreter):
+            def visit(self, node, context):
+                seen.append(type(node).__name__)
+                return super().visit(node, context)
+
+        ast, error = SansScript.load_ast(
+            "<test>", "krrite i = 0 ityasmai 3: i * 2", use_cache=False
+        )
+        result = CountingInterpreter().visit(ast, new_context())
+        self.assertIsNone(result.error)
+        self.assertEqual(seen.count("BinaryOpNode"), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
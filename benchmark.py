@@ -0,0 +1,431 @@
+import sys
+import time
+import tracemalloc
+import SansScript
+
+LOOP_PROGRAM = """charah s = 0
+krrite i = 0 ityasmai 20000:
+    charah s = s + i * 2 - 1
+aMta
+"""
+
+CALL_PROGRAM = """niyoga fib(n):
+    yadi n < 2: pratyavartanam n
+    pratyavartanam fib(n - 1) + fib(n - 2)
+aMta
+fib(16)
+"""
+
+
+def generate_program(lines):
+    statements = []
+    for i in range(lines):
+        statements.append(
+            f"charah v{i % 50} = ({i} + v{(i + 1) % 50} * 2) - [{i}, 'a']"
+        )
+    return "".join(f"charah v{i} = {i}\n" for i in range(50)) + "\n".join(statements)
+
+
+def best_of(function, repeat=5):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def parse(text):
+    ast, error = SansScript.make_ast("<benchmark>", text)
+    if error:
+        raise Exception(error.as_string())
+    return ast
+
+
+def count_allocations(classes, function):
+    counts = dict.fromkeys(classes, 0)
+    originals = {cls: cls.__dict__.get("__init__") for cls in classes}
+
+    def patch(cls):
+        init = cls.__init__
+
+        def counting_init(self, *args, **kwargs):
+            counts[cls] += 1
+            init(self, *args, **kwargs)
+
+        cls.__init__ = counting_init
+
+    for cls in classes:
+        patch(cls)
+    try:
+        function()
+    finally:
+        for cls, init in originals.items():
+            if init is None:
+                del cls.__init__
+            else:
+                cls.__init__ = init
+    return counts
+
+
+def new_context():
+    context = SansScript.Context("<benchmark>")
+    context.symbol_table = SansScript.SymbolTable(SansScript.global_symbol_table)
+    return context
+
+
+# Dispatch as it was done before the handler table
+class GetattrInterpreter(SansScript.Interpreter):
+    def visit(self, node, context):
+        method_name = f"visit_{type(node).__name__}"
+        method = getattr(self, method_name, self.no_visit_method)
+        return method(node, context)
+
+
+def bench_dispatch():
+    node = parse("1").element_nodes[0]
+    context = new_context()
+    visits = 200000
+    ast = parse(LOOP_PROGRAM)
+    print(f"{'interpreter':<12} {'ns/visit':>10} {'overhead':>10} {'loop ms':>10}")
+    for name, interpreter in (
+        ("getattr", GetattrInterpreter()),
+        ("table", SansScript.Interpreter()),
+    ):
+        direct = interpreter.visit_NumberNode
+        visit = interpreter.visit
+
+        def run_direct():
+            for _ in range(visits):
+                direct(node, context)
+
+        def run_visit():
+            for _ in range(visits):
+                visit(node, context)
+
+        def run_loop():
+            interpreter.visit(ast, new_context())
+
+        per_visit = best_of(run_visit) / visits * 1e9
+        overhead = per_visit - best_of(run_direct) / visits * 1e9
+        loop = best_of(run_loop, 3) * 1000
+        print(f"{name:<12} {per_visit:>10.0f} {overhead:>10.0f} {loop:>10.1f}")
+
+
+def bench_control_flow():
+    classes = (
+        SansScript.RTresult,
+        SansScript.Number,
+        SansScript.List,
+        SansScript.Function,
+        SansScript.Context,
+        SansScript.CallContext,
+        SansScript.SymbolTable,
+    )
+    header = "".join(f"{cls.__name__:>12}" for cls in classes)
+    print(f"{'program':<8} {'engine':<12} {'ms':>8}{header}")
+    for program, text in (("loop", LOOP_PROGRAM), ("calls", CALL_PROGRAM)):
+        ast = parse(text)
+        for engine in ("interpreter", "signals"):
+
+            def run():
+                value, error = SansScript.run_ast(ast, new_context(), engine)
+                if error:
+                    raise Exception(error.as_string())
+
+            counts = count_allocations(classes, run)
+            elapsed = best_of(run, 3) * 1000
+            columns = "".join(f"{counts[cls]:>12}" for cls in classes)
+            print(f"{program:<8} {engine:<12} {elapsed:>8.1f}{columns}")
+
+
+def bench_lists():
+    print(f"{'elements':>10} {'engine':<12} {'ms':>8} {'us/append':>10}")
+    for count in (2500, 5000, 10000, 20000):
+        text = (
+            "charah l = []\n"
+            f"krrite i = 0 ityasmai {count}:\n"
+            "    charah l = l + i\n"
+            "aMta\n"
+        )
+        ast = parse(text)
+        for engine in ("interpreter", "vm"):
+
+            def run():
+                value, error = SansScript.run_ast(ast, new_context(), engine)
+                if error:
+                    raise Exception(error.as_string())
+
+            elapsed = best_of(run, 3)
+            per_append = elapsed / count * 1e6
+            print(f"{count:>10} {engine:<12} {elapsed * 1000:>8.1f} {per_append:>10.2f}")
+
+
+def bench_arrays():
+    print(f"{'elements':>10} {'kind':<8} {'ms':>8}")
+    for count in (1000, 10000):
+        for kind, text in (
+            (
+                "list",
+                "charah l = []\n"
+                f"krrite i = 0 ityasmai {count}:\n"
+                "    charah l = l + (i * 2 + 1)\n"
+                "aMta\n",
+            ),
+            ("array", f"charah a = kramah(0, {count}) * 2 + 1\n"),
+        ):
+            ast = parse(text)
+
+            def run():
+                value, error = SansScript.run_ast(ast, new_context(), "interpreter")
+                if error:
+                    raise Exception(error.as_string())
+
+            elapsed = best_of(run, 3) * 1000
+            print(f"{count:>10} {kind:<8} {elapsed:>8.2f}")
+
+
+def bench_scopes():
+    # A global read and a local loop counter at the bottom of a deep call stack
+    print(f"{'depth':>6} {'engine':<12} {'ms':>8}")
+    for depth in (1, 25, 50):
+        text = (
+            "charah g = 1\n"
+            "niyoga down(n):\n"
+            "    yadi n > 0: pratyavartanam down(n - 1)\n"
+            "    charah s = 0\n"
+            "    krrite i = 0 ityasmai 2000:\n"
+            "        charah s = s + g + i\n"
+            "    aMta\n"
+            "    pratyavartanam s\n"
+            "aMta\n"
+            f"down({depth})\n"
+        )
+        ast = parse(text)
+        for engine in ("signals", "closure"):
+
+            def run():
+                value, error = SansScript.run_ast(ast, new_context(), engine)
+                if error:
+                    raise Exception(error.as_string())
+
+            elapsed = best_of(run, 3) * 1000
+            print(f"{depth:>6} {engine:<12} {elapsed:>8.2f}")
+
+
+FOLDING_PROGRAM = """charah s = 0
+krrite i = 0 ityasmai 20000:
+    yadi 0: mudrayati("debug " + "trace")
+    charah s = s + i * (60 * 60 * 24) / (2 ^ 10) - pi * 2
+    "disabled"
+aMta
+"""
+
+
+def bench_folding():
+    tokens, error = SansScript.Lexer("<benchmark>", FOLDING_PROGRAM).make_tokens()
+    print(f"{'ast':<10} {'engine':<12} {'ms':>8}")
+    for name, ast in (
+        ("parsed", SansScript.Parser(tokens).parse().node),
+        ("optimized", parse(FOLDING_PROGRAM)),
+    ):
+        for engine in ("interpreter", "closure"):
+
+            def run():
+                value, error = SansScript.run_ast(ast, new_context(), engine)
+                if error:
+                    raise Exception(error.as_string())
+
+            elapsed = best_of(run, 3) * 1000
+            print(f"{name:<10} {engine:<12} {elapsed:>8.1f}")
+
+
+LOOP_MEMORY_PROGRAM = """niyoga count(n):
+    charah i = 0
+    sopanah i < n: charah i = i + 1
+    krrite j = 0 ityasmai n: j * 1000
+    pratyavartanam i
+aMta
+count(100000)
+"""
+
+
+def bench_loop_memory():
+    ast = parse(LOOP_MEMORY_PROGRAM)
+    print(f"{'engine':<12} {'peak KiB':>10}")
+    for engine in ("interpreter", "signals", "vm", "closure"):
+        tracemalloc.start()
+        try:
+            value, error = SansScript.run_ast(ast, new_context(), engine)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        if error:
+            raise Exception(error.as_string())
+        print(f"{engine:<12} {peak / 1024:>10.0f}")
+
+
+def bench_counting():
+    count = 100000
+    ast = parse(f"krrite i = 0 ityasmai {count} charana 1:\n    i\naMta\n")
+    print(f"{'engine':<12} {'ms':>8} {'ns/iteration':>14}")
+
+    def native():
+        for i in range(count):
+            pass
+
+    timings = [("python", best_of(native))]
+    for engine in ("interpreter", "signals", "vm", "closure"):
+
+        def run():
+            value, error = SansScript.run_ast(ast, new_context(), engine)
+            if error:
+                raise Exception(error.as_string())
+
+        timings.append((engine, best_of(run, 3)))
+    for engine, elapsed in timings:
+        print(f"{engine:<12} {elapsed * 1000:>8.1f} {elapsed / count * 1e9:>14.0f}")
+
+
+def bench_calls():
+    ast = parse(CALL_PROGRAM)
+    calls = 3193
+    print(f"{'engine':<12} {'ms':>8} {'us/call':>10}")
+    for engine in ("interpreter", "signals", "vm", "closure"):
+
+        def run():
+            value, error = SansScript.run_ast(ast, new_context(), engine)
+            if error:
+                raise Exception(error.as_string())
+
+        elapsed = best_of(run, 7)
+        print(f"{engine:<12} {elapsed * 1000:>8.1f} {elapsed / calls * 1e6:>10.2f}")
+
+
+def bench_builtins():
+    count = 20000
+    ast = parse(
+        "charah l = [1, 2, 3]\n"
+        f"krrite i = 0 ityasmai {count}:\n"
+        "    sUchiH_vA(l)\n"
+        "    aMkaH_vA(i)\n"
+        "aMta\n"
+    )
+    print(f"{'engine':<12} {'ms':>8} {'us/call':>10}")
+    for engine in ("interpreter", "signals", "vm", "closure"):
+
+        def run():
+            value, error = SansScript.run_ast(ast, new_context(), engine)
+            if error:
+                raise Exception(error.as_string())
+
+        elapsed = best_of(run, 3)
+        print(f"{engine:<12} {elapsed * 1000:>8.1f} {elapsed / count / 2 * 1e6:>10.2f}")
+
+
+def bench_strings():
+    print(f"{'pieces':>8} {'engine':<12} {'ms':>8} {'us/append':>10}")
+    for count in (10000, 20000, 40000):
+        ast = parse(
+            "charah s = ''\n"
+            f"krrite i = 0 ityasmai {count}:\n"
+            "    charah s = s + 'line of report text\\n'\n"
+            "aMta\n"
+        )
+        for engine in ("interpreter", "closure"):
+
+            def run():
+                value, error = SansScript.run_ast(ast, new_context(), engine)
+                if error:
+                    raise Exception(error.as_string())
+
+            elapsed = best_of(run, 3)
+            per_append = elapsed / count * 1e6
+            print(f"{count:>8} {engine:<12} {elapsed * 1000:>8.1f} {per_append:>10.2f}")
+
+
+def bench_tracing():
+    def hook(event, name, position, arg):
+        pass
+
+    print(f"{'program':<8} {'hook':<10} {'ms':>8}")
+    for program, text in (("loop", LOOP_PROGRAM), ("calls", CALL_PROGRAM)):
+        ast = parse(text)
+        # "removed" sets a hook and unsets it again before the run
+        for name, settings in (
+            ("none", ()),
+            ("removed", (hook, None)),
+            ("no-op", (hook,)),
+        ):
+            for setting in settings:
+                SansScript.settrace(setting)
+
+            def run():
+                value, error = SansScript.run_ast(ast, new_context(), "interpreter")
+                if error:
+                    raise Exception(error.as_string())
+
+            try:
+                elapsed = best_of(run, 5) * 1000
+            finally:
+                SansScript.settrace(None)
+            print(f"{program:<8} {name:<10} {elapsed:>8.1f}")
+
+
+def measure(function):
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = function()
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return result, after - before
+
+
+def bench_memory():
+    text = generate_program(5000)
+    tokens, token_bytes = measure(
+        lambda: SansScript.Lexer("<benchmark>", text).make_tokens()[0]
+    )
+    nodes = count_allocations(
+        SansScript.NODE_CLASSES, lambda: SansScript.Parser(tokens).parse()
+    )
+    ast, node_bytes = measure(lambda: SansScript.Parser(tokens).parse().node)
+    numbers = 100000
+    _, number_bytes = measure(
+        lambda: [SansScript.Number(i + 1000) for i in range(numbers)]
+    )
+    node_count = sum(nodes.values())
+    print(f"{'object':<8} {'count':>10} {'bytes':>12} {'bytes/object':>14}")
+    for name, count, size in (
+        ("token", len(tokens), token_bytes),
+        ("node", node_count, node_bytes),
+        ("number", numbers, number_bytes),
+    ):
+        print(f"{name:<8} {count:>10} {size:>12} {size / count:>14.1f}")
+
+
+BENCHMARKS = {
+    "dispatch": bench_dispatch,
+    "control_flow": bench_control_flow,
+    "memory": bench_memory,
+    "lists": bench_lists,
+    "arrays": bench_arrays,
+    "scopes": bench_scopes,
+    "folding": bench_folding,
+    "loop_memory": bench_loop_memory,
+    "counting": bench_counting,
+    "calls": bench_calls,
+    "builtins": bench_builtins,
+    "strings": bench_strings,
+    "tracing": bench_tracing,
+}
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        print(f"== {name}")
+        BENCHMARKS[name]()
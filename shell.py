@@ -1,10 +1,47 @@
+import sys
 import SansScript
 
+# sans-script [--profile] [--trace] [file]
+args = sys.argv[1:]
+profile = "--profile" in args
+if profile:
+    args.remove("--profile")
+
+
+def trace(event, name, position, arg):
+    where = f"{position.file_name}:{position.line + 1}" if position else ""
+    print(f"[{event}] {name} {where}", file=sys.stderr)
+
+
+if "--trace" in args:
+    args.remove("--trace")
+    SansScript.settrace(trace)
+
+
+# One profiler covers the whole file or REPL session
+profiler = SansScript.Profiler() if profile else None
+
+
+def run(text, file_name, use_cache=True):
+    return SansScript.Run(text, file_name, use_cache=use_cache, profiler=profiler)
+
+
+if args:
+    with open(args[0], "r", encoding="utf8") as f:
+        result, error = run(f.read(), args[0])
+    if profiler:
+        print(profiler.report())
+        profiler.write_folded(f"{args[0]}.folded")
+    if error:
+        print(error.as_string())
+        sys.exit(1)
+    sys.exit(0)
+
 while True:
     try:
         text = str(input("SansScript>> "))
         if text.strip() == "" : continue
-        result, error = SansScript.Run(text, "test.sans")
+        result, error = run(text, "test.sans", use_cache=False)
 
         if error:
             print(error.as_string())
@@ -13,7 +50,9 @@ while True:
                 print(repr(result.elements[0]))
             else:
                 print(repr(result))
-    except KeyboardInterrupt:
+    except (KeyboardInterrupt, EOFError):
         print("\nExiting SansScript Shell...")
+        if profiler:
+            print(profiler.report())
         break
     # main()